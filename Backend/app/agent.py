@@ -1,17 +1,36 @@
 from __future__ import annotations
 import asyncio
+import itertools
 import logging
+import time
 from dataclasses import dataclass
 import uuid
 from typing import Optional, Dict, Callable, Awaitable, Any
 
-from livekit import rtc, api
+from livekit import api, rtc
 from livekit.agents import Agent, AgentSession
+from livekit.agents.llm import ChatContext
 from livekit.agents.voice.room_io import RoomOutputOptions
-from livekit.plugins import silero, openai, deepgram, cartesia
 
 from .config import get_settings
+from .utils.livekit import mint_agent_token
 from .utils.persistence import schedule_ingest
+from .utils.providers import create_llm, create_stt, create_tts, load_vad
+from .utils.recorder import create_recorder
+from .utils.endpointing import AdaptiveEndpointing, parse_bounds
+from .utils.capacity import record_provider_error
+from .utils.loop_monitor import current_session_id
+from .utils.session_directory import SessionDirectory
+from .utils.snapshots import SnapshotStore
+from .utils.metrics import (
+    ACTIVE_SESSIONS,
+    RECOVERY_SECONDS,
+    SESSIONS_RECOVERED,
+    SESSIONS_STARTED,
+    SESSIONS_STOPPED,
+    observe_agent_metrics,
+    observe_provider_error,
+)
 
 logger = logging.getLogger("voice-agent")
 logger.setLevel(logging.INFO)
@@ -23,13 +42,25 @@ class SessionHandle:
     task: asyncio.Task[None]
     room: rtc.Room
     http_session: any = None
+    endpointing: Optional[AdaptiveEndpointing] = None
+    room_name: str = ""
+    # static part of the crash-recovery snapshot; chat history is added at write time
+    snapshot: Optional[Dict[str, Any]] = None
+    snapshot_dirty: bool = True
 
 
 class SimpleVoiceAgent(Agent):
-    def __init__(self, instructions: str) -> None:
-        super().__init__(instructions=instructions)
+    def __init__(self, instructions: str, chat_ctx: Optional[ChatContext] = None, resumed: bool = False) -> None:
+        super().__init__(instructions=instructions, chat_ctx=chat_ctx)
+        self._resumed = resumed
 
     async def on_enter(self):
+        if self._resumed:
+            # restored from a snapshot: pick the conversation back up instead of greeting again
+            self.session.generate_reply(
+                instructions="You were briefly disconnected. Say you are back and continue where the conversation left off."
+            )
+            return
         # greet once at session start using the system instructions directly
         # avoids hard-coded prompt and keeps initialization consistent
         self.session.generate_reply(instructions=self.instructions)
@@ -41,18 +72,53 @@ class AgentManager:
     def __init__(self) -> None:
         self._sessions: Dict[str, SessionHandle] = {}
         self._broadcast_cb: Callable[[str, dict], Awaitable[None] | None] | None = None
+        self._directory: Optional[SessionDirectory] = None
+        # transcript deliveries not yet completed (flushed on drain)
+        self._pending_broadcasts: set[asyncio.Task[Any]] = set()
+        self._snapshots: Optional[SnapshotStore] = None
 
     def set_transcript_broadcaster(
         self, cb: Callable[[str, dict], Awaitable[None] | None]
     ) -> None:
         self._broadcast_cb = cb
 
+    def set_session_directory(self, directory: SessionDirectory) -> None:
+        """Register sessions in a shared directory and accept stops forwarded through it."""
+        self._directory = directory
+        directory.set_stop_handler(self.stop_session)
+
+    def set_snapshot_store(self, store: SnapshotStore) -> None:
+        self._snapshots = store
+
+    def _unregister(self, session_id: str) -> None:
+        if self._directory is None and self._snapshots is None:
+            return
+
+        async def _run() -> None:
+            if self._directory is not None:
+                try:
+                    await self._directory.unregister(session_id)
+                except Exception:
+                    logger.warning(f"Could not unregister session {session_id} from the session directory")
+            if self._snapshots is not None:
+                # ended on purpose: nothing to resume
+                try:
+                    await self._snapshots.delete(session_id)
+                except Exception:
+                    logger.warning(f"Could not delete snapshot of session {session_id}")
+
+        asyncio.create_task(_run())
+
     async def start_session(
         self,
         room_name: str,
         instructions: str,
         user_id: Optional[str] = None,
-        user_preferences: Optional[Dict] = None
+        user_preferences: Optional[Dict] = None,
+        session_id: Optional[str] = None,
+        room: Optional[rtc.Room] = None,
+        connect: Optional[Callable[[], Awaitable[None]]] = None,
+        resume: Optional[Dict[str, Any]] = None,
     ) -> str:
         """
         Start a voice agent session.
@@ -65,17 +131,22 @@ class AgentManager:
                 - preferred_voice: TTS voice identifier
                 - preferred_language: Language code
                 - system_prompt_override: Custom system prompt
+            session_id: Session id assigned by the caller (worker mode); generated if omitted
+            room: Room to run in (a worker job's room); a new one is created if omitted
+            connect: Coroutine that connects `room` (e.g. JobContext.connect);
+                by default the agent joins with a self-minted token
+            resume: Snapshot of a session whose process died; its chat
+                history is restored and the agent continues instead of greeting
                 
         Returns:
             session_id: Unique session identifier
         """
         settings = get_settings()
+        started = time.monotonic()
 
         # Build pipeline: STT -> LLM -> TTS with VAD turn detection, with provider selection via env
-        if settings.stt_provider.lower() == "deepgram" and settings.deepgram_api_key:
-            stt_engine = deepgram.STT(api_key=settings.deepgram_api_key)
-        else:
-            stt_engine = openai.STT(api_key=settings.openai_api_key)
+        # (plugins are imported on first use, see utils/providers.py)
+        stt_engine = create_stt(settings)
 
         # Determine TTS voice (user preference takes precedence)
         tts_voice = settings.tts_voice
@@ -83,19 +154,12 @@ class AgentManager:
             tts_voice = user_preferences['preferred_voice']
             logger.info(f"Using user preferred voice: {tts_voice}")
 
-        if settings.tts_provider.lower() == "cartesia" and settings.cartesia_api_key:
-            tts_engine = cartesia.TTS(api_key=settings.cartesia_api_key, voice=tts_voice or None)
-        else:
-            tts_engine = openai.TTS(api_key=settings.openai_api_key, voice=tts_voice or None)
-
-        llm_engine = openai.LLM(api_key=settings.openai_api_key, model="gpt-4o-mini")
+        tts_engine = create_tts(settings, voice=tts_voice)
+        llm_engine = create_llm(settings)
 
+        vad = load_vad(settings)
         session = AgentSession(
-            vad=silero.VAD.load(
-                min_speech_duration=settings.vad_min_speech_duration,
-                min_silence_duration=settings.vad_min_silence_duration,
-                padding_duration=settings.vad_padding_duration,
-            ),
+            vad=vad,
             stt=stt_engine,
             llm=llm_engine,
             tts=tts_engine,
@@ -104,12 +168,20 @@ class AgentManager:
             false_interruption_timeout=1.0,
         )
 
-        agent = SimpleVoiceAgent(instructions=instructions)
+        chat_ctx: Optional[ChatContext] = None
+        if resume is not None:
+            chat_ctx = ChatContext.from_dict(resume.get("chat") or {"items": []})
+            # instructions are re-applied by the agent; do not restore stale system messages
+            chat_ctx.items = [
+                item for item in chat_ctx.items if getattr(item, "role", None) not in ("system", "developer")
+            ]
+        agent = SimpleVoiceAgent(instructions=instructions, chat_ctx=chat_ctx, resumed=resume is not None)
 
         # Start a background task that joins the room and runs the session
-        room = rtc.Room()
+        if room is None:
+            room = rtc.Room()
         # assign a UUID session id (required by Django persistence schema)
-        session_id = str(uuid.uuid4())
+        session_id = session_id or str(uuid.uuid4())
 
         # metadata sent to Django persistence service
         session_meta = {
@@ -119,6 +191,14 @@ class AgentManager:
             "user_id": user_id  # Will be None for anonymous sessions
         }
         
+        recorder = create_recorder(settings, session_id)
+
+        # per-session ingest sequence numbers (Django skips a seq it already stored, so retries are safe).
+        # A resumed session starts a new generation in the high bits so it never reuses the numbers its
+        # previous process may have sent after the last snapshot.
+        ingest_generation = resume.get("ingest_generation", 0) + 1 if resume is not None else 0
+        ingest_seq = itertools.count(ingest_generation << 32)
+
         # Log session type
         if user_id:
             logger.info(f"Starting authenticated session {session_id} for user {user_id}")
@@ -131,11 +211,58 @@ class AgentManager:
             try:
                 res = self._broadcast_cb(session_id, payload)
                 if asyncio.iscoroutine(res):
-                    asyncio.create_task(res)
+                    task = asyncio.create_task(res)
+                    self._pending_broadcasts.add(task)
+                    task.add_done_callback(self._pending_broadcasts.discard)
             except Exception:
                 pass
             # persistence (fire-and-forget)
-            schedule_ingest(session_meta, [payload])
+            schedule_ingest(session_meta, [{**payload, "seq": next(ingest_seq), "ts": time.time()}])
+
+        endpointing: Optional[AdaptiveEndpointing] = None
+        if settings.endpointing_mode.lower() == "adaptive":
+            endpointing = AdaptiveEndpointing(
+                min_silence=settings.vad_min_silence_duration,
+                min_speech=settings.vad_min_speech_duration,
+                silence_bounds=parse_bounds(settings.endpointing_silence_bounds, (0.2, 1.2)),
+                speech_bounds=parse_bounds(settings.endpointing_speech_bounds, (0.05, 0.5)),
+            )
+
+            def _apply_endpointing(changed: bool) -> None:
+                if changed:
+                    # this VAD instance belongs to this session only
+                    vad.update_options(
+                        min_silence_duration=endpointing.min_silence,
+                        min_speech_duration=endpointing.min_speech,
+                    )
+
+            @session.on("user_state_changed")
+            def _on_user_state(ev: Any) -> None:
+                try:
+                    now = time.monotonic()
+                    if ev.new_state == "speaking":
+                        _apply_endpointing(endpointing.on_user_speaking(now))
+                    elif ev.new_state == "listening" and ev.old_state == "speaking":
+                        _apply_endpointing(endpointing.on_user_listening(now))
+                except Exception:
+                    pass
+
+            @session.on("agent_state_changed")
+            def _on_agent_state(ev: Any) -> None:
+                try:
+                    if ev.new_state in ("thinking", "speaking"):
+                        endpointing.on_agent_responding()
+                    elif ev.old_state == "speaking":
+                        _apply_endpointing(endpointing.on_turn_settled(time.monotonic()))
+                except Exception:
+                    pass
+
+            @session.on("agent_false_interruption")
+            def _on_false_interruption(ev: Any) -> None:
+                try:
+                    _apply_endpointing(endpointing.on_false_interruption())
+                except Exception:
+                    pass
 
         # user transcript (interim + final)
         @session.on("user_input_transcribed")
@@ -145,7 +272,12 @@ class AgentManager:
                 if text:
                     final = bool(getattr(ev, "is_final", False))
                     # include is_final flag expected by Django API
-                    _emit({"role": "user", "text": text, "is_final": final})
+                    payload = {"role": "user", "text": text, "is_final": final}
+                    if final and endpointing is not None:
+                        # record the windows this turn was endpointed with
+                        endpointing.on_final_transcript()
+                        payload["endpointing"] = endpointing.record_turn()
+                    _emit(payload)
             except Exception:
                 pass
 
@@ -153,6 +285,9 @@ class AgentManager:
         @session.on("conversation_item_added")
         def _on_item_added(ev: Any) -> None:
             try:
+                handle = self._sessions.get(session_id)
+                if handle is not None:
+                    handle.snapshot_dirty = True
                 item = getattr(ev, "item", None)
                 if item is None:
                     return
@@ -193,29 +328,31 @@ class AgentManager:
             except Exception:
                 pass
 
+        @session.on("metrics_collected")
+        def _on_metrics_collected(ev: Any) -> None:
+            try:
+                observe_agent_metrics(ev.metrics)
+            except Exception:
+                pass
+
+        @session.on("error")
+        def _on_error(ev: Any) -> None:
+            try:
+                record_provider_error(observe_provider_error(ev.error, ev.source))
+            except Exception:
+                pass
+
         async def _run_session() -> None:
-            # connect this server-side agent participant to the room
-            if not settings.livekit_url or not settings.livekit_api_key or not settings.livekit_api_secret:
-                raise RuntimeError("LiveKit credentials not configured")
-
-            token = (
-                api.AccessToken(settings.livekit_api_key, settings.livekit_api_secret)
-                .with_identity(f"voice-agent-{id(session)}")
-                .with_kind("agent")
-                .with_grants(
-                    api.VideoGrants(
-                        room_join=True,
-                        room=room_name,
-                        can_publish=True,
-                        can_subscribe=True,
-                        can_publish_data=True,
-                        can_update_own_metadata=True,
-                    )
-                )
-                .to_jwt()
-            )
+            if connect is not None:
+                await connect()
+            else:
+                # connect this server-side agent participant to the room
+                if not settings.livekit_url or not settings.livekit_api_key or not settings.livekit_api_secret:
+                    raise RuntimeError("LiveKit credentials not configured")
 
-            await room.connect(settings.livekit_url, token)
+                token = mint_agent_token(room=room_name, identity=f"voice-agent-{id(session)}")
+
+                await room.connect(settings.livekit_url, token)
 
             # Run until disconnect or task cancelled
             try:
@@ -227,6 +364,16 @@ class AgentManager:
                         transcription_enabled=True,
                     ),
                 )
+                if resume is not None:
+                    RECOVERY_SECONDS.observe(time.monotonic() - started)
+                    logger.info(
+                        f"Resumed session {session_id} in room {room_name} "
+                        f"({time.time() - resume.get('saved_at', time.time()):.1f}s after its last snapshot)"
+                    )
+                if recorder is not None:
+                    recorder.attach(session)
+                    # registered on the Django session with the next ingest
+                    session_meta["metadata"] = {"recording_path": recorder.path}
 
                 done = asyncio.Event()
 
@@ -246,6 +393,19 @@ class AgentManager:
                     pass
                 except Exception:
                     pass
+                if endpointing is not None:
+                    # final windows and per-turn history, kept on the Django session for auditing and tuning
+                    schedule_ingest({**session_meta, "metadata": {"endpointing": endpointing.summary()}}, [])
+                if recorder is not None:
+                    try:
+                        stats = await asyncio.shield(recorder.aclose())
+                        schedule_ingest(
+                            {**session_meta, "metadata": {"recording_path": recorder.path, "recording": stats}}, []
+                        )
+                    except asyncio.CancelledError:
+                        pass
+                    except Exception:
+                        logger.exception(f"Failed to finalize recording for session {session_id}")
                 try:
                     await room.disconnect()
                 except asyncio.CancelledError:
@@ -253,14 +413,161 @@ class AgentManager:
                 except Exception:
                     pass
 
-        job = asyncio.create_task(_run_session(), name=f"agent_session_{room_name}")
-        self._sessions[session_id] = SessionHandle(session=session, task=job, room=room)
+        # registered before the task starts so an early exit cannot leave a stale entry
+        if self._directory is not None:
+            try:
+                await self._directory.register(session_id, room_name)
+            except Exception:
+                logger.warning(f"Could not register session {session_id} in the session directory")
+
+        # tag the session task (and every task it spawns) for the loop watchdog
+        ctx_token = current_session_id.set(session_id)
+        try:
+            job = asyncio.create_task(_run_session(), name=f"agent_session_{room_name}")
+        finally:
+            current_session_id.reset(ctx_token)
+        self._sessions[session_id] = SessionHandle(
+            session=session,
+            task=job,
+            room=room,
+            endpointing=endpointing,
+            room_name=room_name,
+            snapshot={
+                "session_id": session_id,
+                "room": room_name,
+                "instructions": instructions,
+                "user_id": user_id,
+                "user_preferences": user_preferences,
+                "tts_voice": tts_voice,
+                "ingest_generation": ingest_generation,
+            },
+        )
+        SESSIONS_STARTED.inc()
+        ACTIVE_SESSIONS.set(len(self._sessions))
+
+        def _on_job_done(_: asyncio.Task[None]) -> None:
+            # session ended on its own (room disconnected or failed to connect)
+            if self._sessions.pop(session_id, None) is not None:
+                SESSIONS_STOPPED.labels(reason="ended").inc()
+                ACTIVE_SESSIONS.set(len(self._sessions))
+                self._unregister(session_id)
+
+        job.add_done_callback(_on_job_done)
         return session_id
 
-    async def stop_session(self, session_id: str) -> bool:
+    async def run_snapshots(self, interval: float, recover: bool, max_age: float) -> None:
+        """
+        Snapshot loop: write sessions whose chat changed, keep this process'
+        snapshots marked alive, and (when `recover` is set) resume sessions
+        orphaned by a dead process. Runs until cancelled.
+        """
+        store = self._snapshots
+        if store is None:
+            return
+        while True:
+            for session_id, handle in list(self._sessions.items()):
+                if handle.snapshot_dirty:
+                    handle.snapshot_dirty = False
+                    await self._save_snapshot(session_id, handle)
+            try:
+                await store.touch()
+                if recover:
+                    await self.recover_sessions(stale_after=interval * 3, max_age=max_age)
+            except Exception:
+                logger.exception("Snapshot maintenance failed")
+            await asyncio.sleep(interval)
+
+    async def _save_snapshot(self, session_id: str, handle: SessionHandle) -> None:
+        started = time.perf_counter()
+        try:
+            snapshot = {
+                **handle.snapshot,
+                "chat": handle.session.history.to_dict(exclude_timestamp=False),
+                "saved_at": time.time(),
+            }
+            await self._snapshots.save(
+                session_id, handle.room_name, snapshot, build_seconds=time.perf_counter() - started
+            )
+        except Exception:
+            handle.snapshot_dirty = True
+            logger.warning(f"Could not snapshot session {session_id}")
+            return
+        if session_id not in self._sessions:
+            # ended while we were writing: do not leave a resumable snapshot behind
+            await self._snapshots.delete(session_id)
+
+    async def recover_sessions(self, stale_after: float, max_age: float) -> int:
+        """Resume sessions whose owning process stopped touching their snapshots; returns how many."""
+        resumed = 0
+        for orphan in await self._snapshots.orphans(stale_after):
+            session_id = orphan["session_id"]
+            snapshot = await self._snapshots.claim(session_id, orphan["node_id"])
+            if snapshot is None:
+                continue  # another process got it first
+            if time.time() - orphan["updated_at"] > max_age:
+                outcome = "expired"
+            elif not await _room_has_users(orphan["room"]):
+                outcome = "room_empty"
+            else:
+                outcome = "resumed"
+            SESSIONS_RECOVERED.labels(outcome=outcome).inc()
+            if outcome != "resumed":
+                await self._snapshots.delete(session_id)
+                continue
+            await self.start_session(
+                room_name=snapshot["room"],
+                instructions=snapshot["instructions"],
+                user_id=snapshot.get("user_id"),
+                user_preferences=snapshot.get("user_preferences"),
+                session_id=session_id,
+                resume=snapshot,
+            )
+            resumed += 1
+        return resumed
+
+    @property
+    def active_session_count(self) -> int:
+        return len(self._sessions)
+
+    def session_ids(self) -> list[str]:
+        return list(self._sessions)
+
+    async def flush_transcripts(self, timeout: float) -> int:
+        """Wait for queued transcript deliveries; returns how many were still pending at the timeout."""
+        if not self._pending_broadcasts:
+            return 0
+        _, pending = await asyncio.wait(set(self._pending_broadcasts), timeout=timeout)
+        return len(pending)
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def endpointing_summary(self, session_id: str) -> Optional[dict]:
+        handle = self._sessions.get(session_id)
+        if handle is None or handle.endpointing is None:
+            return None
+        return handle.endpointing.summary()
+
+    async def wait_session(self, session_id: str) -> None:
+        """Wait until a session ends (room disconnected, failed, or stopped)."""
+        handle = self._sessions.get(session_id)
+        if handle is None:
+            return
+        try:
+            await asyncio.shield(handle.task)
+        except asyncio.CancelledError:
+            if not handle.task.done():
+                raise
+        except Exception:
+            pass
+
+    async def stop_session(self, session_id: str, reason: str = "requested") -> bool:
         handle = self._sessions.pop(session_id, None)
         if not handle:
             return False
+        SESSIONS_STOPPED.labels(reason=reason).inc()
+        ACTIVE_SESSIONS.set(len(self._sessions))
+        self._unregister(session_id)
         try:
             await handle.session.aclose()
         except asyncio.CancelledError:
@@ -283,3 +590,13 @@ class AgentManager:
             pass
         return True
 
+
+async def _room_has_users(room_name: str) -> bool:
+    """True if a non-agent participant is still in the room (worth rejoining)."""
+    settings = get_settings()
+    try:
+        async with api.LiveKitAPI(settings.livekit_url, settings.livekit_api_key, settings.livekit_api_secret) as lk:
+            res = await lk.room.list_participants(api.ListParticipantsRequest(room=room_name))
+    except Exception:
+        return False
+    return any(p.kind != api.ParticipantInfo.Kind.AGENT for p in res.participants)
@@ -22,6 +22,8 @@ class Settings(BaseModel):
 
     # CORS / server
     cors_origins: str = os.getenv("CORS_ORIGINS", "*")
+    # offer the binary (msgpack) transcript websocket subprotocol to clients that request it
+    transcript_ws_binary: bool = os.getenv("TRANSCRIPT_WS_BINARY", "true").lower() == "true"
 
     # Dynamic audio/LLM provider selection
     stt_provider: str = os.getenv("STT_PROVIDER", "openai")  # openai|deepgram
@@ -29,14 +31,88 @@ class Settings(BaseModel):
     llm_provider: str = os.getenv("LLM_PROVIDER", "openai")  # openai (default) - extensible
     tts_voice: str = os.getenv("TTS_VOICE", "alloy")  # voice name for TTS engine if supported
 
+    # LiveKit token minting
+    token_ttl_seconds: int = int(os.getenv("TOKEN_TTL_SECONDS", "21600"))  # LiveKit default: 6h
+    token_cache_size: int = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))  # 0 disables the cache
+    token_cache_refresh_margin: int = int(os.getenv("TOKEN_CACHE_REFRESH_MARGIN", "300"))  # re-mint this many seconds before exp
+    token_batch_max: int = int(os.getenv("TOKEN_BATCH_MAX", "500"))
+
+    # Transcript pub/sub transport: memory (single process) | redis (multi-worker / multi-replica)
+    transcript_bus: str = os.getenv("TRANSCRIPT_BUS", "memory")
+    transcript_bus_prefix: str = os.getenv("TRANSCRIPT_BUS_PREFIX", "transcript:")
+    redis_url: str | None = os.getenv("REDIS_URL")
+
+    # Where sessions run: local (inside this API process) | worker (dispatched to `python -m app.worker` processes)
+    session_dispatch: str = os.getenv("SESSION_DISPATCH", "local")
+    agent_name: str = os.getenv("AGENT_NAME", "voice-agent")  # explicit-dispatch name workers register under
+    worker_load_threshold: float = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75"))  # workers stop taking jobs above
+
+    # Session directory (session id -> owning node) so stops reach the right process: memory | sqlite | redis
+    session_directory: str = os.getenv("SESSION_DIRECTORY", "memory")
+    session_directory_path: str = os.getenv("SESSION_DIRECTORY_PATH", "session_directory.sqlite3")
+    session_directory_prefix: str = os.getenv("SESSION_DIRECTORY_PREFIX", "voice:")
+    node_name: str | None = os.getenv("NODE_NAME")  # defaults to the hostname; the pid is always appended
+    node_heartbeat_interval: float = float(os.getenv("NODE_HEARTBEAT_INTERVAL", "5"))
+    node_ttl: float = float(os.getenv("NODE_TTL", "15"))  # owners silent for longer are treated as dead
+
+    # Crash-recovery snapshots (chat context, instructions, voice, room) in a local SQLite file
+    snapshot_enabled: bool = os.getenv("SNAPSHOT_ENABLED", "false").lower() == "true"
+    snapshot_path: str = os.getenv("SNAPSHOT_PATH", "session_snapshots.sqlite3")
+    snapshot_interval: float = float(os.getenv("SNAPSHOT_INTERVAL", "2"))  # owners silent for 3 intervals are dead
+    snapshot_max_age: float = float(os.getenv("SNAPSHOT_MAX_AGE", "120"))  # older orphans are not resumed
+
+    # Graceful drain (SIGTERM or POST /admin/drain)
+    drain_timeout: float = float(os.getenv("DRAIN_TIMEOUT", "600"))  # wait this long for sessions to end
+    drain_flush_timeout: float = float(os.getenv("DRAIN_FLUSH_TIMEOUT", "10"))  # then for ingest/transcripts
+    drain_on_sigterm: bool = os.getenv("DRAIN_ON_SIGTERM", "true").lower() == "true"
+    admin_token: str | None = os.getenv("ADMIN_TOKEN")  # X-ADMIN-TOKEN for /admin endpoints; unset disables them
+
+    # Capacity / readiness (0 disables a check)
+    max_sessions: int = int(os.getenv("MAX_SESSIONS", "0"))
+    ready_max_loop_lag: float = float(os.getenv("READY_MAX_LOOP_LAG", "0.2"))
+    ready_max_cpu: float = float(os.getenv("READY_MAX_CPU", "85"))  # percent of the whole host
+    ready_max_provider_errors: int = int(os.getenv("READY_MAX_PROVIDER_ERRORS", "10"))  # per provider per minute
+
+    # Event-loop watchdog (lag sampling, slow callback detection, optional sampling profile)
+    loop_monitor_enabled: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    slow_callback_threshold: float = float(os.getenv("SLOW_CALLBACK_THRESHOLD", "0.05"))
+    loop_profile_on_lag: bool = os.getenv("LOOP_PROFILE_ON_LAG", "false").lower() == "true"
+    loop_profile_threshold: float = float(os.getenv("LOOP_PROFILE_THRESHOLD", "0.25"))
+    loop_profile_seconds: float = float(os.getenv("LOOP_PROFILE_SECONDS", "2.0"))
+    loop_profile_dir: str | None = os.getenv("LOOP_PROFILE_DIR")
+
     # Persistence service
     django_base_url: str | None = os.getenv("DJANGO_BASE_URL")
     ingest_token: str | None = os.getenv("INGEST_TOKEN")
+    # group commit: seconds records wait to be sent together to /api/ingest/bulk (0 = one request per record)
+    ingest_batch_interval: float = float(os.getenv("INGEST_BATCH_INTERVAL", "0.2"))
+    ingest_batch_max_events: int = int(os.getenv("INGEST_BATCH_MAX_EVENTS", "500"))  # send early once reached
+
+    # Call recording: opt-in, one stereo file per session (user left, agent right): ogg (Opus) | flac
+    recording_enabled: bool = os.getenv("RECORDING_ENABLED", "false").lower() == "true"
+    recording_dir: str = os.getenv("RECORDING_DIR", "recordings")
+    recording_format: str = os.getenv("RECORDING_FORMAT", "ogg")
+    recording_sample_rate: int = int(os.getenv("RECORDING_SAMPLE_RATE", "24000"))
+    recording_bitrate: int = int(os.getenv("RECORDING_BITRATE", "32000"))  # opus only
+    recording_queue_frames: int = int(os.getenv("RECORDING_QUEUE_FRAMES", "500"))  # frames dropped beyond this
 
     # VAD (Voice Activity Detection) settings
     vad_min_speech_duration: float = float(os.getenv("VAD_MIN_SPEECH_DURATION", "0.1"))
     vad_min_silence_duration: float = float(os.getenv("VAD_MIN_SILENCE_DURATION", "0.3"))
     vad_padding_duration: float = float(os.getenv("VAD_PADDING_DURATION", "0.1"))
+    # endpointing: static (global VAD windows) | adaptive (per-session tuning within bounds, "min,max" seconds)
+    endpointing_mode: str = os.getenv("ENDPOINTING_MODE", "static")
+    endpointing_silence_bounds: str = os.getenv("ENDPOINTING_SILENCE_BOUNDS", "0.2,1.2")
+    endpointing_speech_bounds: str = os.getenv("ENDPOINTING_SPEECH_BOUNDS", "0.05,0.5")
+    # where VAD inference runs: inline (per-session thread) | thread (shared pool) | process (worker processes)
+    # | batch (cross-session batched inference)
+    vad_execution: str = os.getenv("VAD_EXECUTION", "inline")
+    vad_pool_workers: int = int(os.getenv("VAD_POOL_WORKERS", "2"))
+    vad_pool_max_slots: int = int(os.getenv("VAD_POOL_MAX_SLOTS", "256"))
+    vad_batch_max_size: int = int(os.getenv("VAD_BATCH_MAX_SIZE", "32"))
+    vad_batch_max_delay_ms: float = float(os.getenv("VAD_BATCH_MAX_DELAY_MS", "4"))
+    # import the configured provider plugins and load the VAD model at startup instead of in the first session
+    prewarm_providers: bool = os.getenv("PREWARM_PROVIDERS", "false").lower() == "true"
 
 
 @lru_cache()
@@ -1,15 +1,39 @@
 from __future__ import annotations
+import time
+
+_import_started = time.perf_counter()
+
 import asyncio
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Query, Cookie
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Query, Cookie, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from typing import Dict, Optional
+import uuid
 
 from .config import get_settings
-from .models import TokenRequest, TokenResponse, SessionStartRequest, SessionStartResponse, SessionStopResponse
-from .utils.livekit import mint_token
+from .models import (
+    TokenRequest,
+    TokenResponse,
+    BatchTokenRequest,
+    BatchTokenResponse,
+    SessionStartRequest,
+    SessionStartResponse,
+    SessionStopResponse,
+)
+from .utils.livekit import mint_token, mint_token_with_expiry
 from .utils.persistence import get_ingest_stats
 from .utils.auth import validate_session_cookie
+from .utils.transcript_codec import select_codec, encode
+from .utils.pubsub import create_transcript_bus
+from .utils.metrics import WS_CLIENTS, render_latest
+from .utils.loop_monitor import get_loop_lag_sampler, get_loop_watchdog, start_loop_lag_sampler, start_loop_watchdog
+from .utils.capacity import evaluate_readiness, start_cpu_sampler
+from .utils.providers import prewarm, vad_pool_loaded, vad_pool_module
+from .utils.startup import mark_ready, record_phase, startup_report, timed_phase
+from .utils.dispatch import WorkerDispatcher
+from .utils.session_directory import create_session_directory
+from .utils.drain import DrainController, install_sigterm_drain
+from .utils.snapshots import create_snapshot_store
 from .agent import AgentManager
 
 app = FastAPI(title="Voice Agent Backend")
@@ -45,27 +69,176 @@ app.add_middleware(
 )
 
 agent_manager = AgentManager()
-_transcript_ws_rooms: Dict[str, set[WebSocket]] = {}
+# which node owns which session, so stops reach the owning process
+session_directory = create_session_directory(settings)
+agent_manager.set_session_directory(session_directory)
+drain = DrainController()
+snapshot_store = create_snapshot_store(settings, session_directory.node_id)
+_snapshot_task: Optional[asyncio.Task[None]] = None
+# SESSION_DISPATCH=worker: sessions run in agent worker processes, this process only dispatches
+dispatcher: Optional[WorkerDispatcher] = (
+    WorkerDispatcher(settings, session_directory) if settings.session_dispatch.lower() == "worker" else None
+)
+# session_id -> {websocket: codec negotiated for that socket}
+_transcript_ws_rooms: Dict[str, Dict[WebSocket, str]] = {}
 
 
 async def _broadcast_transcript(session_id: str, payload: dict) -> None:
     # send to all ws clients in this session
-    conns = list(_transcript_ws_rooms.get(session_id, set()))
+    conns = list(_transcript_ws_rooms.get(session_id, {}).items())
     if not conns:
         return
-    text = JSONResponse(content=payload).body.decode()
+    # encode once per codec, not once per socket
+    frames: Dict[str, str | bytes] = {}
     # best-effort; drop broken sockets
-    for ws in conns:
+    for ws, codec in conns:
+        frame = frames.get(codec)
+        if frame is None:
+            frame = frames[codec] = encode(payload, codec)
         try:
-            await ws.send_text(text)
+            if isinstance(frame, bytes):
+                await ws.send_bytes(frame)
+            else:
+                await ws.send_text(frame)
         except Exception:
             try:
-                _transcript_ws_rooms.get(session_id, set()).discard(ws)
+                _transcript_ws_rooms.get(session_id, {}).pop(ws, None)
             except Exception:
                 pass
 
 
-agent_manager.set_transcript_broadcaster(_broadcast_transcript)
+# agent sessions publish to the bus; the bus delivers to this process' websockets
+transcript_bus = create_transcript_bus(settings)
+transcript_bus.set_deliver(_broadcast_transcript)
+agent_manager.set_transcript_broadcaster(transcript_bus.publish)
+
+
+@app.on_event("startup")
+async def _start_transcript_bus() -> None:
+    with timed_phase("transcript_bus"):
+        await transcript_bus.start()
+
+
+@app.on_event("startup")
+async def _start_session_directory() -> None:
+    with timed_phase("session_directory"):
+        await session_directory.start()
+
+
+@app.on_event("startup")
+async def _start_snapshots() -> None:
+    global _snapshot_task
+    if snapshot_store is None:
+        return
+    agent_manager.set_snapshot_store(snapshot_store)
+    # in worker mode LiveKit re-dispatches jobs of dead workers; the worker resumes them
+    _snapshot_task = asyncio.create_task(
+        agent_manager.run_snapshots(
+            settings.snapshot_interval, recover=dispatcher is None, max_age=settings.snapshot_max_age
+        ),
+        name="session_snapshots",
+    )
+
+
+@app.on_event("startup")
+async def _start_loop_watchdog() -> None:
+    if settings.loop_monitor_enabled:
+        start_loop_watchdog(
+            threshold=settings.slow_callback_threshold,
+            profile_on_lag=settings.loop_profile_on_lag,
+            profile_threshold=settings.loop_profile_threshold,
+            profile_seconds=settings.loop_profile_seconds,
+            profile_dir=settings.loop_profile_dir,
+        )
+    else:
+        # no stall capture, but /metrics and /ready still need the lag
+        start_loop_lag_sampler()
+
+
+@app.on_event("startup")
+async def _start_cpu_sampler() -> None:
+    start_cpu_sampler()
+
+
+@app.on_event("startup")
+async def _start_vad_pool() -> None:
+    # spawn pooled VAD workers up front rather than inside the first session
+    if settings.vad_execution.lower() != "inline" and dispatcher is None:
+        with timed_phase("vad_pool"):
+            vad_pool_module().get_vad_pool(settings)
+
+
+@app.on_event("startup")
+async def _prewarm_providers() -> None:
+    # in worker mode sessions (and their providers) live in the worker processes
+    if settings.prewarm_providers and dispatcher is None:
+        prewarm(settings)
+
+
+def _start_drain(timeout: float) -> asyncio.Task[None]:
+    return drain.start(agent_manager, timeout=timeout, flush_timeout=settings.drain_flush_timeout)
+
+
+@app.on_event("startup")
+async def _install_sigterm_drain() -> None:
+    if settings.drain_on_sigterm and install_sigterm_drain(lambda: _start_drain(settings.drain_timeout)):
+        print(f"SIGTERM drains sessions for up to {settings.drain_timeout:.0f}s before shutdown")
+
+
+@app.on_event("startup")
+async def _report_startup() -> None:
+    # last startup hook: logs time-to-ready with the per-phase breakdown (also in /diagnostics)
+    report = mark_ready()
+    slowest = sorted(report["phases"], key=lambda p: p["seconds"], reverse=True)[:3]
+    print(
+        f"Ready {report['process_to_ready_seconds']:.2f}s after process start "
+        f"(imports {report['import_seconds']:.2f}s, init {report['init_seconds']:.2f}s; slowest: "
+        + ", ".join(f"{p['phase']} {p['seconds']:.2f}s" for p in slowest)
+        + ")"
+    )
+
+
+@app.on_event("shutdown")
+async def _drain_sessions() -> None:
+    # runs before the other shutdown hooks: sessions still need the VAD pool, bus and directory.
+    # Without a prior drain (e.g. Ctrl+C) sessions are stopped right away but still flushed.
+    _start_drain(0)
+    await drain.wait()
+
+
+@app.on_event("shutdown")
+async def _stop_snapshots() -> None:
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+
+
+@app.on_event("shutdown")
+async def _close_vad_pool() -> None:
+    if vad_pool_loaded():
+        vad_pool_module().close_vad_pool()
+
+
+@app.on_event("shutdown")
+async def _stop_loop_watchdog() -> None:
+    sampler = get_loop_lag_sampler()
+    if sampler is not None:
+        await sampler.stop()
+
+
+@app.on_event("shutdown")
+async def _close_transcript_bus() -> None:
+    await transcript_bus.close()
+
+
+@app.on_event("shutdown")
+async def _close_session_directory() -> None:
+    await session_directory.close()
+
+
+@app.on_event("shutdown")
+async def _close_dispatcher() -> None:
+    if dispatcher is not None:
+        await dispatcher.aclose()
 
 
 @app.get("/health")
@@ -73,6 +246,17 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness for new sessions. Returns 503 when this process should stop
+    receiving new calls; existing sessions keep running. `load` is a numeric
+    score for least-loaded placement (1.0 = some resource at its limit).
+    """
+    report = evaluate_readiness(agent_manager.active_session_count, draining=drain.draining)
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
+
+
 @app.get("/diagnostics")
 async def diagnostics():
     settings = get_settings()
@@ -94,19 +278,105 @@ async def diagnostics():
             "configured": ingest["configured"],
             "last_ingest_ts": ingest["last_ingest_ts"],
             "event_count": ingest["event_count"],
-            "session_ids": ingest["session_ids"],
+            "failure_count": ingest["failure_count"],
+            "pending": ingest["pending"],
         },
+        "sessions": {
+            "dispatch": "worker" if dispatcher is not None else "local",
+            "node_id": session_directory.node_id,
+            "directory": settings.session_directory.lower(),
+            "active": agent_manager.active_session_count,
+            "drain": drain.state,
+        },
+        "event_loop": _loop_diagnostics(),
+        "vad": _vad_diagnostics(),
+        "startup": startup_report(),
+    }
+
+
+def _vad_diagnostics() -> dict:
+    if settings.vad_execution.lower() == "inline":
+        return {"mode": "inline"}
+    if not vad_pool_loaded():
+        return {"mode": settings.vad_execution.lower(), "started": False}
+    return vad_pool_module().get_vad_pool(settings).stats()
+
+
+def _loop_diagnostics() -> dict:
+    watchdog = get_loop_watchdog()
+    if watchdog is None:
+        sampler = get_loop_lag_sampler()
+        if sampler is None:
+            return {"monitored": False}
+        return {"monitored": False, "last_lag": sampler.last_lag, "recent_max_lag": sampler.recent_max_lag}
+    return {
+        "monitored": True,
+        "last_lag": watchdog.last_lag,
+        "recent_max_lag": watchdog.recent_max_lag,
+        "slow_callbacks": watchdog.slow_callback_count,
+        "recent_slow_callbacks": list(watchdog.recent_slow_callbacks),
+        "last_profile_path": watchdog.last_profile_path,
     }
 
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of this process' metrics."""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/token", response_model=TokenResponse)
-def get_token(room: str = Query(...), identity: str = Query(...), name: str | None = Query(None)):
+def get_token(
+    room: str = Query(...),
+    identity: str = Query(...),
+    name: str | None = Query(None),
+    ttl: int | None = Query(None, gt=0),
+):
     if not settings.livekit_url or not settings.livekit_api_key or not settings.livekit_api_secret:
         raise HTTPException(status_code=500, detail="LiveKit credentials not configured")
-    token = mint_token(room=room, identity=identity, name=name)
+    token = mint_token(room=room, identity=identity, name=name, ttl=ttl)
     return {"token": token}
 
 
+@app.post("/tokens", response_model=BatchTokenResponse)
+def mint_tokens(req: BatchTokenRequest):
+    """Mint many client tokens in one call (load tests, multi-participant rooms)."""
+    if not settings.livekit_url or not settings.livekit_api_key or not settings.livekit_api_secret:
+        raise HTTPException(status_code=500, detail="LiveKit credentials not configured")
+    if len(req.tokens) > settings.token_batch_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.token_batch_max} tokens per request")
+    items = []
+    for t in req.tokens:
+        token, expires_at = mint_token_with_expiry(
+            room=t.room, identity=t.identity, name=t.name, ttl=req.ttl_seconds
+        )
+        items.append({"room": t.room, "identity": t.identity, "token": token, "expires_at": expires_at})
+    return {"tokens": items}
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not settings.admin_token or token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.post("/admin/drain")
+async def start_drain(
+    timeout_seconds: Optional[float] = Query(None, ge=0),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Stop accepting sessions and drain this process (the server keeps running)."""
+    _require_admin(x_admin_token)
+    _start_drain(settings.drain_timeout if timeout_seconds is None else timeout_seconds)
+    return drain.status()
+
+
+@app.get("/admin/drain")
+async def drain_status(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return drain.status()
+
+
 @app.options("/session")
 async def options_session():
     return {"message": "OK"}
@@ -119,6 +389,17 @@ async def start_session(req: SessionStartRequest, sessionid: Optional[str] = Coo
     If a session cookie is provided, validates it with Django and applies user preferences.
     Otherwise, creates an anonymous session with default settings.
     """
+    if drain.draining:
+        raise HTTPException(status_code=503, detail="Draining")
+
+    # in worker mode capacity is each worker's call (load-based job acceptance)
+    if (
+        dispatcher is None
+        and settings.max_sessions > 0
+        and agent_manager.active_session_count >= settings.max_sessions
+    ):
+        raise HTTPException(status_code=503, detail="At session capacity")
+
     user_data = None
     user_id = None
     user_preferences = None
@@ -135,6 +416,21 @@ async def start_session(req: SessionStartRequest, sessionid: Optional[str] = Coo
     if user_preferences and user_preferences.get('system_prompt_override'):
         instructions = user_preferences['system_prompt_override']
     
+    if dispatcher is not None:
+        # enqueue for an agent worker; the id is ours so clients can open the transcript socket right away
+        session_id = str(uuid.uuid4())
+        try:
+            await dispatcher.dispatch(
+                session_id,
+                room_name=req.room,
+                instructions=instructions,
+                user_id=user_id,
+                user_preferences=user_preferences,
+            )
+        except Exception:
+            raise HTTPException(status_code=503, detail="Could not dispatch session to agent workers")
+        return {"session_id": session_id}
+
     # Start session with user context
     session_id = await agent_manager.start_session(
         room_name=req.room,
@@ -148,18 +444,61 @@ async def start_session(req: SessionStartRequest, sessionid: Optional[str] = Coo
 
 @app.delete("/session/{session_id}", response_model=SessionStopResponse)
 async def stop_session(session_id: str):
-    stopped = await agent_manager.stop_session(session_id)
+    if agent_manager.has_session(session_id):
+        stopped = await agent_manager.stop_session(session_id)
+    else:
+        # owned by another process/host (or an agent worker job): forward through the directory
+        try:
+            stopped = await session_directory.request_stop(session_id)
+        except TimeoutError:
+            raise HTTPException(status_code=504, detail="Owning node did not stop the session in time")
+        if dispatcher is not None:
+            # also cancels a dispatch that no worker has picked up yet
+            stopped = await dispatcher.stop(session_id) or stopped
     if not stopped:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"stopped": True}
 
 
+@app.get("/session/{session_id}")
+async def session_status(session_id: str):
+    """
+    Session state and owning node; in worker mode the dispatch's job state
+    (queued/assigned/running/ended) as reported by LiveKit.
+    """
+    if dispatcher is not None:
+        status = await dispatcher.status(session_id)
+    elif agent_manager.has_session(session_id):
+        status = {"session_id": session_id, "state": "running", "node_id": session_directory.node_id}
+    else:
+        entry = await session_directory.lookup(session_id)
+        status = {"state": "running", **entry} if entry is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return status
+
+
+@app.get("/session/{session_id}/endpointing")
+async def session_endpointing(session_id: str):
+    """Current adaptive endpointing windows and per-turn history for a session."""
+    summary = agent_manager.endpointing_summary(session_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Session not found or adaptive endpointing disabled")
+    return summary
+
+
 @app.websocket("/ws/transcript/{session_id}")
 async def transcript_ws(ws: WebSocket, session_id: str):
-    await ws.accept()
+    # negotiate frame encoding: msgpack (binary) for clients that offer it, JSON otherwise
+    codec, subprotocol = select_codec(
+        ws.scope.get("subprotocols", []), allow_binary=settings.transcript_ws_binary
+    )
+    await ws.accept(subprotocol=subprotocol)
     # register client into session room
-    room = _transcript_ws_rooms.setdefault(session_id, set())
-    room.add(ws)
+    room = _transcript_ws_rooms.setdefault(session_id, {})
+    room[ws] = codec
+    WS_CLIENTS.inc()
+    await transcript_bus.subscribe(session_id)
     try:
         while True:
             # keep alive; messages are unidirectional from server -> client
@@ -168,6 +507,15 @@ async def transcript_ws(ws: WebSocket, session_id: str):
         pass
     finally:
         try:
-            _transcript_ws_rooms.get(session_id, set()).discard(ws)
+            room = _transcript_ws_rooms.get(session_id)
+            if room is not None:
+                room.pop(ws, None)
+                if not room:
+                    _transcript_ws_rooms.pop(session_id, None)
         except Exception:
             pass
+        WS_CLIENTS.dec()
+        await transcript_bus.unsubscribe(session_id)
+
+
+record_phase("app.main", "import", time.perf_counter() - _import_started)
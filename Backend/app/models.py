@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class TokenRequest(BaseModel):
     room: str
@@ -9,6 +9,19 @@ class TokenRequest(BaseModel):
 class TokenResponse(BaseModel):
     token: str
 
+class BatchTokenRequest(BaseModel):
+    tokens: List[TokenRequest] = Field(..., min_length=1)
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+
+class BatchTokenItem(BaseModel):
+    room: str
+    identity: str
+    token: str
+    expires_at: float
+
+class BatchTokenResponse(BaseModel):
+    tokens: List[BatchTokenItem]
+
 class SessionStartRequest(BaseModel):
     room: str
     identity: str
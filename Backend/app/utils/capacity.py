@@ -0,0 +1,103 @@
+"""
+Capacity / readiness evaluation used by GET /ready and POST /session.
+
+The load score is the worst of the normalized pressure signals (sessions vs
+capacity, recent event-loop lag vs budget, process CPU vs budget), so 1.0
+means "at the limit" for at least one resource. Routers can place new calls
+on the replica with the lowest score; load balancers only need the status.
+"""
+from __future__ import annotations
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+import psutil
+
+from ..config import get_settings
+from .loop_monitor import recent_loop_lag
+from .metrics import LOAD_SCORE
+
+_process = psutil.Process()
+_cpu_count = psutil.cpu_count() or 1
+_cpu_smoothed: float = 0.0
+
+_PROVIDER_ERROR_WINDOW = 60.0
+_provider_errors: Deque[Tuple[float, str]] = deque(maxlen=1000)
+
+
+def record_provider_error(provider: str) -> None:
+    _provider_errors.append((time.monotonic(), provider))
+
+
+def _recent_provider_errors() -> Dict[str, int]:
+    cutoff = time.monotonic() - _PROVIDER_ERROR_WINDOW
+    while _provider_errors and _provider_errors[0][0] < cutoff:
+        _provider_errors.popleft()
+    counts: Dict[str, int] = {}
+    for _, provider in _provider_errors:
+        counts[provider] = counts.get(provider, 0) + 1
+    return counts
+
+
+async def sample_cpu(interval: float = 2.0, alpha: float = 0.5) -> None:
+    """Keep a smoothed process CPU reading so probes never measure a tiny interval."""
+    global _cpu_smoothed
+    _process.cpu_percent(interval=None)  # prime: the first call always returns 0.0
+    while True:
+        await asyncio.sleep(interval)
+        # normalise to the whole host so 100 means every core is busy
+        sample = _process.cpu_percent(interval=None) / _cpu_count
+        _cpu_smoothed = alpha * sample + (1 - alpha) * _cpu_smoothed
+
+
+def start_cpu_sampler() -> asyncio.Task[None]:
+    return asyncio.create_task(sample_cpu(), name="cpu_sampler")
+
+
+def process_cpu_percent() -> float:
+    """Smoothed process CPU as a percentage of the whole host."""
+    return _cpu_smoothed
+
+
+def evaluate_readiness(active_sessions: int, draining: bool = False) -> Dict[str, Any]:
+    settings = get_settings()
+    lag = recent_loop_lag()
+    cpu = process_cpu_percent()
+    provider_errors = _recent_provider_errors()
+
+    components: Dict[str, float] = {}
+    if settings.max_sessions > 0:
+        components["sessions"] = active_sessions / settings.max_sessions
+    if settings.ready_max_loop_lag > 0:
+        components["loop_lag"] = lag / settings.ready_max_loop_lag
+    if settings.ready_max_cpu > 0:
+        components["cpu"] = cpu / settings.ready_max_cpu
+    load = max(components.values(), default=0.0)
+    LOAD_SCORE.set(load)
+
+    reasons = [f"{name}_saturated" for name, value in components.items() if value >= 1.0]
+    unhealthy = sorted(
+        provider
+        for provider, count in provider_errors.items()
+        if settings.ready_max_provider_errors > 0 and count >= settings.ready_max_provider_errors
+    )
+    if unhealthy:
+        reasons.append("provider_errors")
+    if draining:
+        reasons.append("draining")
+    if not (settings.livekit_url and settings.livekit_api_key and settings.livekit_api_secret):
+        reasons.append("livekit_not_configured")
+
+    return {
+        "ready": not reasons,
+        "reasons": reasons,
+        "load": round(load, 4),
+        "components": {name: round(value, 4) for name, value in components.items()},
+        "active_sessions": active_sessions,
+        "max_sessions": settings.max_sessions,
+        "loop_lag": round(lag, 4),
+        "cpu_percent": round(cpu, 2),
+        "provider_errors": provider_errors,
+        "unhealthy_providers": unhealthy,
+    }
@@ -0,0 +1,153 @@
+"""
+Worker-mode session dispatch (SESSION_DISPATCH=worker).
+
+POST /session does not run the agent in the API process: it creates an
+explicit LiveKit agent dispatch for AGENT_NAME carrying the session id and
+prompt in its metadata. Agent worker processes (`python -m app.worker start`)
+register with LiveKit and accept jobs based on their own load; the job runs
+the same AgentManager pipeline. Job state is read back from the dispatch, and
+a stop removes the job's agent participant from the room, which ends the job.
+
+The session's room and dispatch id are kept in the shared session directory,
+so any API replica (or the same one after a restart) can report or stop a
+dispatch; without a record, the owner entry the worker registered gives the
+room and the dispatch is found by the session id in its metadata.
+"""
+from __future__ import annotations
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from livekit import api
+from livekit.protocol.agent import JobStatus
+
+from ..config import Settings
+from .session_directory import SessionDirectory
+
+logger = logging.getLogger("voice-agent")
+
+_ACTIVE = (JobStatus.JS_PENDING, JobStatus.JS_RUNNING)
+
+
+class WorkerDispatcher:
+    def __init__(self, settings: Settings, directory: SessionDirectory) -> None:
+        self._settings = settings
+        self._directory = directory
+        self._api: Optional[api.LiveKitAPI] = None
+
+    def _client(self) -> api.LiveKitAPI:
+        # created lazily: the client binds to the running event loop
+        if self._api is None:
+            self._api = api.LiveKitAPI(
+                self._settings.livekit_url,
+                self._settings.livekit_api_key,
+                self._settings.livekit_api_secret,
+            )
+        return self._api
+
+    async def dispatch(
+        self,
+        session_id: str,
+        room_name: str,
+        instructions: str,
+        user_id: Optional[str] = None,
+        user_preferences: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Enqueue a session for the agent workers; returns the dispatch id."""
+        metadata = {
+            "session_id": session_id,
+            "instructions": instructions,
+            "user_id": user_id,
+            "user_preferences": user_preferences,
+        }
+        dispatch = await self._client().agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(
+                agent_name=self._settings.agent_name,
+                room=room_name,
+                metadata=json.dumps(metadata),
+            )
+        )
+        try:
+            await self._directory.put_dispatch(session_id, room_name, dispatch.id)
+        except Exception:
+            # status/stop can still find it through the worker's owner entry once a job runs
+            logger.warning(f"Could not record dispatch {dispatch.id} of session {session_id} in the session directory")
+        logger.info(f"Dispatched session {session_id} to agent workers ({dispatch.id})")
+        return dispatch.id
+
+    async def _find(self, session_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(room, dispatch_id) of a session; dispatch_id is None if only its room is known."""
+        record = await self._directory.get_dispatch(session_id)
+        if record is not None:
+            return record["room"], record["dispatch_id"]
+        entry = await self._directory.lookup(session_id)
+        if entry is None or not entry.get("room"):
+            return None
+        for dispatch in await self._client().agent_dispatch.list_dispatch(entry["room"]):
+            try:
+                if json.loads(dispatch.metadata or "{}").get("session_id") == session_id:
+                    return entry["room"], dispatch.id
+            except ValueError:
+                continue
+        return entry["room"], None
+
+    async def status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        found = await self._find(session_id)
+        if found is None:
+            return None
+        room_name, dispatch_id = found
+        if dispatch_id is None:
+            entry = await self._directory.lookup(session_id)
+            return {"state": "running", **entry} if entry is not None else None
+        dispatch = await self._client().agent_dispatch.get_dispatch(dispatch_id, room_name)
+        if dispatch is None:
+            return {"session_id": session_id, "room": room_name, "dispatch_id": dispatch_id, "state": "gone", "jobs": []}
+        jobs = [
+            {
+                "id": job.id,
+                "status": JobStatus.Name(job.state.status),
+                "worker_id": job.state.worker_id,
+                "participant_identity": job.state.participant_identity,
+                "error": job.state.error or None,
+            }
+            for job in dispatch.state.jobs
+        ]
+        if not jobs:
+            state = "queued"
+        elif any(job.state.status == JobStatus.JS_RUNNING for job in dispatch.state.jobs):
+            state = "running"
+        elif any(job.state.status == JobStatus.JS_PENDING for job in dispatch.state.jobs):
+            state = "assigned"
+        else:
+            state = "ended"
+        return {"session_id": session_id, "room": room_name, "dispatch_id": dispatch_id, "state": state, "jobs": jobs}
+
+    async def stop(self, session_id: str) -> bool:
+        found = await self._find(session_id)
+        if found is None or found[1] is None:
+            return False
+        room_name, dispatch_id = found
+        await self._directory.del_dispatch(session_id)
+        client = self._client()
+        dispatch = await client.agent_dispatch.get_dispatch(dispatch_id, room_name)
+        if dispatch is not None:
+            for job in dispatch.state.jobs:
+                if job.state.status in _ACTIVE and job.state.participant_identity:
+                    # the job shuts down once its agent participant leaves the room
+                    try:
+                        await client.room.remove_participant(
+                            api.RoomParticipantIdentity(room=room_name, identity=job.state.participant_identity)
+                        )
+                    except Exception:
+                        logger.warning(f"Could not remove agent from room {room_name} for session {session_id}")
+        try:
+            # stop a not-yet-assigned dispatch from starting a job later
+            await client.agent_dispatch.delete_dispatch(dispatch_id, room_name)
+        except Exception:
+            pass
+        return True
+
+    async def aclose(self) -> None:
+        if self._api is not None:
+            await self._api.aclose()
+            self._api = None
@@ -0,0 +1,128 @@
+"""
+Graceful drain for rolling deploys.
+
+Draining (SIGTERM or POST /admin/drain) makes this process refuse new sessions
+and report not-ready, waits for the active sessions to end on their own up to
+a deadline, stops whatever is left, then flushes queued transcript deliveries
+and in-flight ingest requests. On SIGTERM the normal server shutdown only
+proceeds once the drain is done; a second SIGTERM skips the wait.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import signal
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import DRAINING
+from .persistence import flush_ingest, get_ingest_stats
+
+logger = logging.getLogger("voice-agent")
+
+
+class DrainController:
+    def __init__(self) -> None:
+        self.state = "serving"  # serving | draining | drained
+        self._task: Optional[asyncio.Task[None]] = None
+        self._started_at: Optional[float] = None
+        self._deadline: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._sessions_at_start = 0
+        self._sessions_stopped = 0
+        self._transcripts_unflushed = 0
+        self._ingest_unflushed = 0
+        self._manager: Any = None
+
+    @property
+    def draining(self) -> bool:
+        return self.state != "serving"
+
+    def start(self, manager: Any, timeout: float, flush_timeout: float) -> asyncio.Task[None]:
+        """Begin draining (idempotent); returns the drain task."""
+        if self._task is None:
+            self.state = "draining"
+            DRAINING.set(1)
+            self._manager = manager
+            self._started_at = time.time()
+            self._deadline = time.monotonic() + timeout
+            self._sessions_at_start = manager.active_session_count
+            logger.info(f"Draining: {self._sessions_at_start} active sessions, deadline {timeout:.0f}s")
+            self._task = asyncio.create_task(self._run(flush_timeout), name="drain")
+        return self._task
+
+    async def _run(self, flush_timeout: float) -> None:
+        manager = self._manager
+        while manager.active_session_count and time.monotonic() < self._deadline:
+            await asyncio.sleep(0.5)
+        # deadline passed: end the stragglers cleanly (transcripts, recordings, ingest still complete)
+        for session_id in manager.session_ids():
+            if await manager.stop_session(session_id, reason="drain"):
+                self._sessions_stopped += 1
+        self._transcripts_unflushed = await manager.flush_transcripts(flush_timeout)
+        self._ingest_unflushed = await flush_ingest(flush_timeout)
+        self.state = "drained"
+        self._finished_at = time.time()
+        logger.info(
+            f"Drained: {self._sessions_stopped} sessions stopped at deadline, "
+            f"{self._transcripts_unflushed} transcript and {self._ingest_unflushed} ingest deliveries unflushed"
+        )
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def status(self) -> Dict[str, Any]:
+        active = self._manager.active_session_count if self._manager is not None else None
+        report: Dict[str, Any] = {"state": self.state, "active_sessions": active}
+        if self._started_at is None:
+            return report
+        report.update(
+            {
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+                "deadline_in": max(0.0, round(self._deadline - time.monotonic(), 1)) if self.state == "draining" else 0.0,
+                "sessions_at_start": self._sessions_at_start,
+                "sessions_finished": self._sessions_at_start - (active or 0) - self._sessions_stopped,
+                "sessions_stopped": self._sessions_stopped,
+                "ingest_pending": get_ingest_stats()["pending"],
+                "transcripts_unflushed": self._transcripts_unflushed,
+                "ingest_unflushed": self._ingest_unflushed,
+            }
+        )
+        return report
+
+
+def install_sigterm_drain(on_sigterm: Callable[[], asyncio.Task[None]]) -> bool:
+    """
+    Route SIGTERM through the drain before the server's own handler.
+
+    Must run on the main thread after the server installed its handlers (i.e.
+    from a startup hook). Returns False if there is no handler to chain to.
+    """
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return False
+
+    triggered = False
+
+    def _handler(signum: int, frame: Any) -> None:
+        nonlocal triggered
+        if triggered:
+            # second SIGTERM: stop waiting
+            previous(signum, frame)
+            return
+        triggered = True
+
+        def _begin() -> None:
+            task = on_sigterm()
+            task.add_done_callback(lambda _: previous(signum, None))
+
+        loop.call_soon_threadsafe(_begin)
+
+    try:
+        signal.signal(signal.SIGTERM, _handler)
+    except ValueError:
+        # not on the main thread
+        return False
+    return True
@@ -0,0 +1,150 @@
+"""
+Adaptive endpointing: per-session tuning of the VAD silence/speech windows.
+
+The global VAD_MIN_SILENCE_DURATION is one trade-off for everyone: too short
+cuts off hesitant speakers, too long makes fast talkers wait. In adaptive mode
+each session starts from the configured values and moves within configured
+bounds based on what it observes:
+
+- the user resumed speaking shortly after we detected end of speech (a pause
+  we mistook for end of turn) -> widen the silence window to cover that pause;
+- turns end cleanly and the user never resumes -> decay toward the shortest
+  window the observed pauses allow (snappier replies);
+- false interruptions and very short speech bursts (background noise) ->
+  require longer speech before treating it as the user talking.
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+def _clamp(value: float, bounds: Tuple[float, float]) -> float:
+    return max(bounds[0], min(bounds[1], value))
+
+
+class AdaptiveEndpointing:
+    def __init__(
+        self,
+        min_silence: float,
+        min_speech: float,
+        silence_bounds: Tuple[float, float],
+        speech_bounds: Tuple[float, float],
+        resume_window: float = 1.5,
+        noise_burst: float = 0.25,
+    ) -> None:
+        self.silence_bounds = silence_bounds
+        self.speech_bounds = speech_bounds
+        self.base_speech = _clamp(min_speech, speech_bounds)
+        self.min_silence = _clamp(min_silence, silence_bounds)
+        self.min_speech = self.base_speech
+        self.resume_window = resume_window
+        self.noise_burst = noise_burst
+
+        self._pauses: Deque[float] = deque(maxlen=20)
+        self._speech_started: Optional[float] = None
+        self._speech_ended: Optional[float] = None
+        self._agent_responded = False
+        self._transcribed = False
+        self._turn = 0
+        self.false_interruptions = 0
+        self.cutoffs = 0
+        self.turns: Deque[Dict[str, Any]] = deque(maxlen=200)
+
+    # observations -------------------------------------------------------
+
+    def on_user_speaking(self, now: float) -> bool:
+        """User started speaking. Returns True if the windows changed."""
+        changed = False
+        if self._speech_ended is not None:
+            gap = now - self._speech_ended
+            if gap <= self.resume_window:
+                # the full pause was our silence window plus the gap we waited after it
+                pause = self.min_silence + gap
+                self._pauses.append(pause)
+                if self._agent_responded:
+                    self.cutoffs += 1
+                    changed = self._set_silence(max(self.min_silence, pause * 1.15))
+        self._speech_started = now
+        self._speech_ended = None
+        self._agent_responded = False
+        self._transcribed = False
+        return changed
+
+    def on_user_listening(self, now: float) -> bool:
+        """VAD reported end of speech."""
+        changed = False
+        if self._speech_started is not None and not self._transcribed:
+            if now - self._speech_started - self.min_silence < self.noise_burst:
+                # short burst that produced no transcript: most likely noise
+                changed = self._set_speech(self.min_speech + 0.02)
+        self._speech_ended = now
+        self._speech_started = None
+        return changed
+
+    def on_agent_responding(self) -> None:
+        if self._speech_ended is not None:
+            self._agent_responded = True
+
+    def on_false_interruption(self) -> bool:
+        self.false_interruptions += 1
+        return self._set_speech(self.min_speech + 0.05)
+
+    def on_final_transcript(self) -> None:
+        self._transcribed = True
+
+    def on_turn_settled(self, now: float) -> bool:
+        """
+        Called once the agent has replied and the user did not resume within
+        the resume window: the endpoint was right, try a slightly shorter one.
+        """
+        if self._speech_ended is None or now - self._speech_ended < self.resume_window:
+            return False
+        self._speech_ended = None
+        floor = self.silence_bounds[0]
+        if len(self._pauses) >= 3:
+            # never go below what this speaker's typical pauses need
+            floor = max(floor, sorted(self._pauses)[int(len(self._pauses) * 0.8) - 1] * 1.15)
+        changed = self._set_silence(max(floor, self.min_silence * 0.9))
+        # noise sensitivity decays back toward the configured value
+        changed |= self._set_speech(self.base_speech + (self.min_speech - self.base_speech) * 0.8)
+        return changed
+
+    def record_turn(self) -> Dict[str, Any]:
+        self._turn += 1
+        entry = {"turn": self._turn, "min_silence": round(self.min_silence, 3), "min_speech": round(self.min_speech, 3)}
+        self.turns.append(entry)
+        return entry
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "min_silence": round(self.min_silence, 3),
+            "min_speech": round(self.min_speech, 3),
+            "cutoffs": self.cutoffs,
+            "false_interruptions": self.false_interruptions,
+            "turns": list(self.turns),
+        }
+
+    # internals ----------------------------------------------------------
+
+    def _set_silence(self, value: float) -> bool:
+        value = _clamp(value, self.silence_bounds)
+        if abs(value - self.min_silence) < 0.005:
+            return False
+        self.min_silence = value
+        return True
+
+    def _set_speech(self, value: float) -> bool:
+        value = _clamp(value, self.speech_bounds)
+        if abs(value - self.min_speech) < 0.005:
+            return False
+        self.min_speech = value
+        return True
+
+
+def parse_bounds(raw: str, default: Tuple[float, float]) -> Tuple[float, float]:
+    try:
+        lo, hi = (float(x) for x in raw.split(","))
+    except ValueError:
+        return default
+    return (min(lo, hi), max(lo, hi))
+
@@ -1,19 +1,113 @@
 from __future__ import annotations
-from typing import Optional
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import jwt
 from livekit import api
 from ..config import get_settings
 import uuid
 
+# (api_key, room, identity, name, kind, grants, ttl) -> (jwt, expires_at)
+_token_cache: "OrderedDict[Tuple[Any, ...], Tuple[str, float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
 
-def mint_token(room: str, identity: str, name: Optional[str] = None) -> str:
-    """Mint a LiveKit access token for a web client."""
+
+def _grants_key(grants: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in grants.items()))
+
+
+def _jwt_exp(token: str) -> float:
+    """The `exp` claim minted into a token (our own signature, so it is not re-verified)."""
+    return float(jwt.decode(token, options={"verify_signature": False})["exp"])
+
+
+def mint_token_with_expiry(
+    room: str,
+    identity: str,
+    name: Optional[str] = None,
+    ttl: Optional[int] = None,
+    kind: Optional[str] = None,
+    grants: Optional[Dict[str, Any]] = None,
+    cache: bool = True,
+) -> Tuple[str, float]:
+    """
+    Mint (or reuse) a LiveKit access token.
+
+    Tokens are cached per (room, identity, name, kind, grants, ttl) and reused
+    until `token_cache_refresh_margin` seconds before they expire, so reconnect
+    storms do not re-sign a JWT for every request. Pass cache=False for
+    one-off identities, which would only push reusable tokens out of the LRU.
+
+    Returns:
+        (jwt, expires_at) where expires_at is the token's `exp` claim (unix timestamp)
+    """
     s = get_settings()
-    grant = api.VideoGrants(room_join=True, room=room)
+    ttl = int(ttl or s.token_ttl_seconds)
+    grant_fields: Dict[str, Any] = {"room_join": True, "room": room}
+    if grants:
+        grant_fields.update(grants)
+    key = (s.livekit_api_key, room, identity, name, kind, _grants_key(grant_fields), ttl)
+
+    cache = cache and s.token_cache_size > 0
+    now = time.time()
+    if cache:
+        with _token_cache_lock:
+            cached = _token_cache.get(key)
+            if cached is not None and cached[1] - s.token_cache_refresh_margin > now:
+                _token_cache.move_to_end(key)
+                return cached
+
     at = api.AccessToken(s.livekit_api_key, s.livekit_api_secret)
-    at = at.with_grants(grant).with_identity(identity)
+    at = at.with_grants(api.VideoGrants(**grant_fields)).with_identity(identity)
+    at = at.with_ttl(datetime.timedelta(seconds=ttl))
     if name:
         at = at.with_name(name)
-    return at.to_jwt()
+    if kind:
+        at = at.with_kind(kind)
+    token = at.to_jwt()
+    # expires_at (reported and used for cache refresh) is the token's own exp claim
+    entry = (token, _jwt_exp(token))
+
+    if cache:
+        with _token_cache_lock:
+            _token_cache[key] = entry
+            _token_cache.move_to_end(key)
+            while len(_token_cache) > s.token_cache_size:
+                _token_cache.popitem(last=False)
+    return entry
+
+
+def mint_token(room: str, identity: str, name: Optional[str] = None, ttl: Optional[int] = None) -> str:
+    """Mint a LiveKit access token for a web client."""
+    return mint_token_with_expiry(room=room, identity=identity, name=name, ttl=ttl)[0]
+
+
+def mint_agent_token(room: str, identity: str) -> str:
+    """
+    Mint a LiveKit access token for the server-side agent participant.
+
+    Not cached: every session joins under its own identity, so the token is never reused.
+    """
+    token, _ = mint_token_with_expiry(
+        room=room,
+        identity=identity,
+        kind="agent",
+        grants={
+            "can_publish": True,
+            "can_subscribe": True,
+            "can_publish_data": True,
+            "can_update_own_metadata": True,
+        },
+        cache=False,
+    )
+    return token
+
+
+def clear_token_cache() -> None:
+    with _token_cache_lock:
+        _token_cache.clear()
 
 
 def new_session_id() -> str:
@@ -0,0 +1,294 @@
+"""
+Event-loop watchdog for the agent process.
+
+All sessions share one asyncio loop, so one blocking callback glitches audio
+for every call. The watchdog has two halves:
+
+- a heartbeat coroutine on the loop that wakes every `tick` seconds and
+  records how late it was woken (event-loop lag; `LoopLagSampler`, which runs
+  on its own when the watchdog is disabled, so /metrics and /ready still see
+  the lag);
+- a daemon thread that notices when the heartbeat goes stale, grabs the loop
+  thread's stack *while it is blocked*, and resolves the owning session from
+  the task that is currently running.
+
+When the heartbeat resumes after a stall longer than the threshold, the slow
+callback is logged with its duration, session and stack, and counted. With
+profiling enabled, a lag spike also triggers a short sampling profile of the
+loop thread written in collapsed-stack format (flamegraph.pl / speedscope).
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter as _Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .metrics import LOOP_LAG, LOOP_LAG_HIST, SLOW_CALLBACKS
+
+logger = logging.getLogger("voice-agent")
+
+# Set by AgentManager around session task creation; inherited by every task the
+# session spawns, which is how slow callbacks are attributed to a session.
+current_session_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "voice_session_id", default=None
+)
+
+_task_sessions: "weakref.WeakKeyDictionary[asyncio.Task[Any], str]" = weakref.WeakKeyDictionary()
+_sampler: Optional["LoopLagSampler"] = None
+_watchdog: Optional["LoopWatchdog"] = None
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """Record the owning session of every task at creation time."""
+    previous = loop.get_task_factory()
+
+    def factory(loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> asyncio.Task[Any]:
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        ctx = kwargs.get("context")
+        session_id = ctx.get(current_session_id) if ctx is not None else current_session_id.get()
+        if session_id is not None:
+            _task_sessions[task] = session_id
+        return task
+
+    loop.set_task_factory(factory)
+
+
+def _format_frame(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class LoopLagSampler:
+    """Heartbeat on the loop: wakes every `tick` seconds and records how late it was woken."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tick: float = 0.1, window_seconds: float = 10.0) -> None:
+        self._loop = loop
+        self._tick = tick
+        self._beat = time.perf_counter()
+        self._heartbeat_task: Optional[asyncio.Task[None]] = None
+        self._lags: Deque[float] = deque(maxlen=max(1, int(window_seconds / self._tick)))
+
+    def start(self) -> None:
+        self._beat = time.perf_counter()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat(), name="loop_lag_heartbeat")
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def recent_max_lag(self) -> float:
+        return max(self._lags, default=0.0)
+
+    @property
+    def last_lag(self) -> float:
+        return self._lags[-1] if self._lags else 0.0
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self._tick
+            self._beat = expected
+            await asyncio.sleep(self._tick)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            self._lags.append(lag)
+            LOOP_LAG.set(lag)
+            LOOP_LAG_HIST.observe(lag)
+            self._sampled(lag)
+
+    def _sampled(self, lag: float) -> None:
+        pass
+
+
+class LoopWatchdog(LoopLagSampler):
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        threshold: float = 0.05,
+        profile_on_lag: bool = False,
+        profile_threshold: float = 0.25,
+        profile_seconds: float = 2.0,
+        profile_interval: float = 0.005,
+        profile_cooldown: float = 60.0,
+        profile_dir: Optional[str] = None,
+        window_seconds: float = 10.0,
+    ) -> None:
+        super().__init__(loop, tick=max(0.01, threshold / 2), window_seconds=window_seconds)
+        self._threshold = threshold
+        self._profile_on_lag = profile_on_lag
+        self._profile_threshold = profile_threshold
+        self._profile_seconds = profile_seconds
+        self._profile_interval = profile_interval
+        self._profile_cooldown = profile_cooldown
+        self._profile_dir = profile_dir
+        self._last_profile = 0.0
+
+        self._loop_thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        # stack/session captured by the watchdog thread during the current stall
+        self._stall: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.slow_callback_count = 0
+        self.recent_slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self.last_profile_path: Optional[str] = None
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        _install_task_factory(self._loop)
+        super().start()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        await super().stop()
+
+    def _sampled(self, lag: float) -> None:
+        if lag >= self._threshold:
+            with self._lock:
+                stall, self._stall = self._stall, None
+            self._report(lag, stall)
+        elif self._stall is not None:
+            with self._lock:
+                self._stall = None
+
+    def _report(self, lag: float, stall: Optional[Dict[str, Any]]) -> None:
+        self.slow_callback_count += 1
+        SLOW_CALLBACKS.inc()
+        stall = stall or {}
+        entry = {
+            "ts": time.time(),
+            "duration": round(lag, 4),
+            "session_id": stall.get("session_id"),
+            "task": stall.get("task"),
+            "stack": stall.get("stack"),
+        }
+        self.recent_slow_callbacks.append(entry)
+        logger.warning(
+            "Event loop blocked for %.1f ms (session=%s task=%s)%s",
+            lag * 1000,
+            entry["session_id"] or "-",
+            entry["task"] or "-",
+            ("\n" + "".join(entry["stack"])) if entry["stack"] else "",
+        )
+
+    def _loop_frame(self) -> Any:
+        return sys._current_frames().get(self._loop_thread_id)
+
+    def _capture(self) -> Dict[str, Any]:
+        frame = self._loop_frame()
+        stack = traceback.format_stack(frame) if frame is not None else None
+        session_id = None
+        task_name = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            task = None
+        if task is not None:
+            session_id = _task_sessions.get(task)
+            task_name = task.get_name()
+        return {"stack": stack, "session_id": session_id, "task": task_name}
+
+    def _watch(self) -> None:
+        poll = self._tick / 2
+        while not self._stop.wait(poll):
+            stalled_for = time.perf_counter() - self._beat
+            if stalled_for < self._threshold:
+                continue
+            if self._stall is None:
+                captured = self._capture()
+                with self._lock:
+                    self._stall = captured
+            if (
+                self._profile_on_lag
+                and stalled_for >= self._profile_threshold
+                and time.monotonic() - self._last_profile >= self._profile_cooldown
+            ):
+                self._last_profile = time.monotonic()
+                self._sample_profile()
+
+    def _sample_profile(self) -> None:
+        """Sample the loop thread's stack for a short window; write collapsed stacks."""
+        counts: _Counter[str] = _Counter()
+        deadline = time.perf_counter() + self._profile_seconds
+        while time.perf_counter() < deadline and not self._stop.is_set():
+            frame = self._loop_frame()
+            frames: List[str] = []
+            while frame is not None:
+                frames.append(_format_frame(frame))
+                frame = frame.f_back
+            if frames:
+                counts[";".join(reversed(frames))] += 1
+            time.sleep(self._profile_interval)
+        if not counts:
+            return
+        directory = self._profile_dir or os.path.join(os.getcwd(), "loop-profiles")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"loop-profile-{int(time.time())}.folded")
+            with open(path, "w", encoding="utf-8") as fh:
+                for stack, n in counts.most_common():
+                    fh.write(f"{stack} {n}\n")
+            self.last_profile_path = path
+        except OSError:
+            path = None
+        top = "\n".join(f"  {n:5d}  {stack.rsplit(';', 1)[-1]}" for stack, n in counts.most_common(5))
+        logger.warning("Loop lag profile captured (%s samples) -> %s\n%s", sum(counts.values()), path, top)
+
+
+def start_loop_watchdog(**kwargs: Any) -> Optional[LoopWatchdog]:
+    global _sampler, _watchdog
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    _sampler = _watchdog = LoopWatchdog(loop, **kwargs)
+    _watchdog.start()
+    return _watchdog
+
+
+def start_loop_lag_sampler(**kwargs: Any) -> Optional[LoopLagSampler]:
+    """Lag sampling alone, for when the watchdog is disabled."""
+    global _sampler
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    _sampler = LoopLagSampler(loop, **kwargs)
+    _sampler.start()
+    return _sampler
+
+
+def get_loop_watchdog() -> Optional[LoopWatchdog]:
+    return _watchdog
+
+
+def get_loop_lag_sampler() -> Optional[LoopLagSampler]:
+    """The running lag sampler: the watchdog, or the plain sampler when the watchdog is disabled."""
+    return _sampler
+
+
+def last_loop_lag() -> float:
+    return _sampler.last_lag if _sampler is not None else 0.0
+
+
+def recent_loop_lag() -> float:
+    """Worst lag sample over the sampler's rolling window."""
+    return _sampler.recent_max_lag if _sampler is not None else 0.0
@@ -0,0 +1,187 @@
+"""
+Prometheus metrics for the voice backend, exposed on GET /metrics.
+
+Everything is registered on a dedicated registry so the endpoint only carries
+our own series (plus process CPU/memory), not whatever third-party libraries
+put on the global default registry. Label values are bounded (provider names,
+metric kinds, stop reasons) - never session ids.
+"""
+from __future__ import annotations
+from typing import Any
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    ProcessCollector,
+    generate_latest,
+    CONTENT_TYPE_LATEST,
+)
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+ProcessCollector(registry=REGISTRY)
+
+ACTIVE_SESSIONS = Gauge(
+    "voice_active_sessions", "Agent sessions currently running in this process", registry=REGISTRY
+)
+SESSIONS_STARTED = Counter(
+    "voice_sessions_started_total", "Agent sessions started", registry=REGISTRY
+)
+SESSIONS_STOPPED = Counter(
+    "voice_sessions_stopped_total", "Agent sessions stopped", ["reason"], registry=REGISTRY
+)
+WS_CLIENTS = Gauge(
+    "voice_transcript_ws_clients", "Connected transcript websocket clients", registry=REGISTRY
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "voice_ingest_queue_depth", "Ingest requests scheduled but not yet completed", registry=REGISTRY
+)
+INGEST_EVENTS = Counter(
+    "voice_ingest_events_total", "Transcript events accepted by the persistence service", registry=REGISTRY
+)
+INGEST_FAILURES = Counter(
+    "voice_ingest_failures_total", "Ingest requests that failed", ["reason"], registry=REGISTRY
+)
+LOOP_LAG = Gauge(
+    "voice_event_loop_lag_seconds", "Most recent asyncio event-loop lag sample", registry=REGISTRY
+)
+LOOP_LAG_HIST = Histogram(
+    "voice_event_loop_lag_hist_seconds",
+    "Distribution of asyncio event-loop lag samples",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    registry=REGISTRY,
+)
+SLOW_CALLBACKS = Counter(
+    "voice_slow_callbacks_total", "Event-loop stalls longer than the slow-callback threshold", registry=REGISTRY
+)
+DRAINING = Gauge(
+    "voice_draining", "1 while this process is draining (refusing new sessions)", registry=REGISTRY
+)
+LOAD_SCORE = Gauge(
+    "voice_load_score", "Readiness load score (1.0 = at capacity on some resource)", registry=REGISTRY
+)
+PROVIDER_ERRORS = Counter(
+    "voice_provider_errors_total", "Errors raised by STT/LLM/TTS providers", ["provider", "kind"], registry=REGISTRY
+)
+PROVIDER_LATENCY = Histogram(
+    "voice_provider_latency_seconds",
+    "Provider latency: stt duration, llm ttft/duration, tts ttfb/duration, eou delay",
+    ["provider", "kind", "metric"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+    registry=REGISTRY,
+)
+
+VAD_INFERENCE_SECONDS = Histogram(
+    "voice_vad_inference_seconds",
+    "Pooled Silero VAD inference time per window",
+    ["mode"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.032, 0.05, 0.1),
+    registry=REGISTRY,
+)
+VAD_QUEUE_WAIT_SECONDS = Histogram(
+    "voice_vad_queue_wait_seconds",
+    "Time a VAD window waited in the pool before inference",
+    ["mode"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.032, 0.05, 0.1),
+    registry=REGISTRY,
+)
+VAD_BATCH_SIZE = Histogram(
+    "voice_vad_batch_size",
+    "Windows per batched VAD inference call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+    registry=REGISTRY,
+)
+RECORDINGS_ACTIVE = Gauge(
+    "voice_recordings_active", "Session recordings currently being written", registry=REGISTRY
+)
+RECORDING_AUDIO_SECONDS = Counter(
+    "voice_recording_audio_seconds_total", "Audio written to session recordings", registry=REGISTRY
+)
+RECORDING_ENCODE_SECONDS = Counter(
+    "voice_recording_encode_seconds_total", "Recorder thread time spent mixing and encoding", registry=REGISTRY
+)
+RECORDING_TEE_SECONDS = Counter(
+    "voice_recording_tee_seconds_total", "Event-loop time spent handing frames to recorders", registry=REGISTRY
+)
+RECORDING_DROPPED_FRAMES = Counter(
+    "voice_recording_dropped_frames_total", "Audio frames dropped because a recorder queue was full", registry=REGISTRY
+)
+SNAPSHOT_SECONDS = Histogram(
+    "voice_snapshot_seconds",
+    "Session snapshot cost: encode (on the event loop) and write (sqlite, off the loop)",
+    ["phase"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+    registry=REGISTRY,
+)
+SNAPSHOT_BYTES = Histogram(
+    "voice_snapshot_bytes",
+    "Size of a session snapshot",
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576),
+    registry=REGISTRY,
+)
+SESSIONS_RECOVERED = Counter(
+    "voice_sessions_recovered_total", "Sessions resumed from a snapshot", ["outcome"], registry=REGISTRY
+)
+RECOVERY_SECONDS = Histogram(
+    "voice_session_recovery_seconds",
+    "Time from starting a resumed session to the agent being back in the room",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0),
+    registry=REGISTRY,
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "voice_startup_phase_seconds",
+    "Time spent in each startup phase (kind=import|init)",
+    ["phase", "kind"],
+    registry=REGISTRY,
+)
+
+# AgentMetrics.type -> (kind, [latency fields to observe])
+_LATENCY_FIELDS = {
+    "stt_metrics": ("stt", ("duration",)),
+    "llm_metrics": ("llm", ("ttft", "duration")),
+    "tts_metrics": ("tts", ("ttfb", "duration")),
+    "eou_metrics": ("eou", ("end_of_utterance_delay", "transcription_delay")),
+}
+
+
+def provider_name(obj: Any, default: str = "unknown") -> str:
+    """Short provider name from a plugin object or metrics label, e.g. 'openai', 'deepgram'."""
+    metadata = getattr(obj, "metadata", None)
+    provider = getattr(metadata, "model_provider", None)
+    if provider:
+        return str(provider).lower()
+    label = getattr(obj, "label", None) or type(obj).__module__
+    parts = str(label).split(".")
+    if "plugins" in parts and parts.index("plugins") + 1 < len(parts):
+        return parts[parts.index("plugins") + 1]
+    return default
+
+
+def observe_agent_metrics(metrics: Any) -> None:
+    """Record a livekit-agents AgentMetrics object (from the metrics_collected event)."""
+    spec = _LATENCY_FIELDS.get(getattr(metrics, "type", ""))
+    if spec is None:
+        return
+    kind, fields = spec
+    provider = provider_name(metrics, default="livekit") if kind != "eou" else "livekit"
+    for field in fields:
+        value = getattr(metrics, field, None)
+        # streaming STT reports 0.0 duration; negative values mean "not measured"
+        if isinstance(value, (int, float)) and value > 0:
+            PROVIDER_LATENCY.labels(provider=provider, kind=kind, metric=field).observe(value)
+
+
+def observe_provider_error(error: Any, source: Any) -> str:
+    """Count a provider error; returns the provider name it was attributed to."""
+    kind = "unknown"
+    error_type = getattr(error, "type", "")
+    if isinstance(error_type, str) and error_type.endswith("_error"):
+        kind = error_type[: -len("_error")]
+    provider = provider_name(source)
+    PROVIDER_ERRORS.labels(provider=provider, kind=kind).inc()
+    return provider
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
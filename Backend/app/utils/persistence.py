@@ -4,43 +4,148 @@ import httpx
 import time
 from typing import Any, Dict, List
 from ..config import get_settings
+from .metrics import INGEST_EVENTS, INGEST_FAILURES, INGEST_QUEUE_DEPTH
 
-# Simple async fire-and-forget ingestion. In production you might batch or queue.
+# Async fire-and-forget ingestion. With INGEST_BATCH_INTERVAL > 0 (default) records are group-committed:
+# queued records are sent together to /api/ingest/bulk, one request at a time, so they stay in order.
 
 _last_ingest_time: float | None = None
 _ingest_event_count: int = 0
-_ingest_session_ids: set[str] = set()
+_ingest_failure_count: int = 0
+_ingest_pending: int = 0
+# in-flight ingest tasks (kept referenced so they are not garbage collected, and so they can be flushed)
+_ingest_tasks: "set[asyncio.Task[None]]" = set()
+# records waiting for the next bulk request, and the task sending them (None when idle)
+_batch: List[Dict[str, Any]] = []
+_batch_events = 0
+_batch_full = asyncio.Event()
+_batcher: "asyncio.Task[None] | None" = None
 
-async def ingest_events(session_meta: Dict[str, Any], events: List[Dict[str, Any]]) -> None:
+
+def _note_failure(reason: str) -> None:
+    global _ingest_failure_count
+    _ingest_failure_count += 1
+    INGEST_FAILURES.labels(reason=reason).inc()
+
+
+def _note_delivered(records: List[Dict[str, Any]]) -> None:
+    global _last_ingest_time, _ingest_event_count
+    events = sum(len(r["events"]) for r in records)
+    _last_ingest_time = time.time()
+    _ingest_event_count += events
+    INGEST_EVENTS.inc(events)
+
+
+async def _post(path: str, payload: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
     settings = get_settings()
     if not settings.django_base_url or not settings.ingest_token:
         return  # persistence not configured
-    url = settings.django_base_url.rstrip('/') + '/api/ingest'
-    payload = {"session": session_meta, "events": events}
+    url = settings.django_base_url.rstrip('/') + path
     headers = {"X-INGEST-TOKEN": settings.ingest_token, "Content-Type": "application/json"}
     try:
         async with httpx.AsyncClient(timeout=5) as client:
             resp = await client.post(url, json=payload, headers=headers)
             if resp.status_code == 200:
-                global _last_ingest_time, _ingest_event_count, _ingest_session_ids
-                _last_ingest_time = time.time()
-                _ingest_event_count += len(events)
-                _ingest_session_ids.add(str(session_meta.get("id")))
+                _note_delivered(records)
+            else:
+                _note_failure("http_status")
     except Exception:
         # swallow errors to avoid impacting realtime path
-        pass
+        _note_failure("error")
+
+
+async def ingest_events(session_meta: Dict[str, Any], events: List[Dict[str, Any]]) -> None:
+    payload = {"session": session_meta, "events": events}
+    await _post('/api/ingest', payload, [payload])
+
+
+async def ingest_bulk(records: List[Dict[str, Any]]) -> None:
+    """Deliver {"session", "events"} records for any number of sessions in one request."""
+    await _post('/api/ingest/bulk', {"records": records}, records)
+
+
+async def _run_batcher(interval: float, max_events: int) -> None:
+    global _batcher, _batch_events, _ingest_pending
+    try:
+        while _batch:
+            if _batch_events < max_events:
+                try:
+                    await asyncio.wait_for(_batch_full.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+            _batch_full.clear()
+            # records queued while this request is in flight go out together in the next one
+            records = _batch[:]
+            del _batch[:]
+            _batch_events = 0
+            try:
+                await ingest_bulk(records)
+            finally:
+                _ingest_pending -= len(records)
+                INGEST_QUEUE_DEPTH.set(_ingest_pending)
+    finally:
+        _batcher = None
+
+
+def _enqueue(record: Dict[str, Any], interval: float, max_events: int) -> None:
+    global _batcher, _batch_events, _ingest_pending
+    if _batcher is None:
+        try:
+            _batcher = asyncio.create_task(_run_batcher(interval, max_events))
+        except RuntimeError:
+            # if no loop (rare), ignore
+            return
+        _ingest_tasks.add(_batcher)
+        _batcher.add_done_callback(_ingest_tasks.discard)
+    _batch.append(record)
+    _batch_events += len(record["events"])
+    _ingest_pending += 1
+    INGEST_QUEUE_DEPTH.set(_ingest_pending)
+    if _batch_events >= max_events:
+        _batch_full.set()
+
+
+async def _tracked_ingest(session_meta: Dict[str, Any], events: List[Dict[str, Any]]) -> None:
+    global _ingest_pending
+    try:
+        await ingest_events(session_meta, events)
+    finally:
+        _ingest_pending -= 1
+        INGEST_QUEUE_DEPTH.set(_ingest_pending)
+
 
 def schedule_ingest(session_meta: Dict[str, Any], events: List[Dict[str, Any]]):
+    global _ingest_pending
+    settings = get_settings()
+    if settings.ingest_batch_interval > 0:
+        _enqueue({"session": session_meta, "events": events}, settings.ingest_batch_interval, settings.ingest_batch_max_events)
+        return
     try:
-        asyncio.create_task( ingest_events(session_meta, events) )
+        task = asyncio.create_task( _tracked_ingest(session_meta, events) )
     except RuntimeError:
         # if no loop (rare), ignore
-        pass
+        return
+    _ingest_tasks.add(task)
+    task.add_done_callback(_ingest_tasks.discard)
+    _ingest_pending += 1
+    INGEST_QUEUE_DEPTH.set(_ingest_pending)
+
+
+async def flush_ingest(timeout: float) -> int:
+    """Wait for queued and in-flight ingest requests; returns how many were still pending at the timeout."""
+    if _batcher is not None:
+        # send the queued batch now rather than at the end of its window
+        _batch_full.set()
+    if not _ingest_tasks:
+        return 0
+    _, pending = await asyncio.wait(set(_ingest_tasks), timeout=timeout)
+    return len(pending)
 
 def get_ingest_stats() -> Dict[str, Any]:
     return {
         "configured": bool(get_settings().django_base_url and get_settings().ingest_token),
         "last_ingest_ts": _last_ingest_time,
         "event_count": _ingest_event_count,
-        "session_ids": list(_ingest_session_ids),
+        "failure_count": _ingest_failure_count,
+        "pending": _ingest_pending,
     }
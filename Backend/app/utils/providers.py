@@ -0,0 +1,111 @@
+"""
+Provider registry: STT/TTS/LLM plugins and the VAD are imported on first use.
+
+Only one STT and one TTS provider are used by a deployment, but importing
+every plugin (and the Silero VAD stack) up front costs seconds of cold start.
+Plugins are imported the first time a session needs them (timed into the
+startup report), or ahead of time by `prewarm` for the configured ones only.
+"""
+from __future__ import annotations
+import importlib
+import sys
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Tuple
+
+from ..config import Settings, get_settings
+from .startup import record_phase, timed_phase
+
+# name -> (plugin module, factory(module, settings, **options))
+Factory = Callable[..., Any]
+
+STT_PROVIDERS: Dict[str, Tuple[str, Factory]] = {
+    "openai": ("livekit.plugins.openai", lambda m, s: m.STT(api_key=s.openai_api_key)),
+    "deepgram": ("livekit.plugins.deepgram", lambda m, s: m.STT(api_key=s.deepgram_api_key)),
+}
+TTS_PROVIDERS: Dict[str, Tuple[str, Factory]] = {
+    "openai": ("livekit.plugins.openai", lambda m, s, voice=None: m.TTS(api_key=s.openai_api_key, voice=voice or None)),
+    "cartesia": (
+        "livekit.plugins.cartesia",
+        lambda m, s, voice=None: m.TTS(api_key=s.cartesia_api_key, voice=voice or None),
+    ),
+}
+LLM_PROVIDERS: Dict[str, Tuple[str, Factory]] = {
+    "openai": ("livekit.plugins.openai", lambda m, s: m.LLM(api_key=s.openai_api_key, model="gpt-4o-mini")),
+}
+
+
+def _plugin(module_name: str) -> ModuleType:
+    # livekit plugins register themselves on import, which must happen on the main thread
+    module = sys.modules.get(module_name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        record_phase(module_name, "import", time.perf_counter() - started)
+    return module
+
+
+def selected_providers(settings: Settings | None = None) -> Dict[str, str]:
+    """Providers a session will actually use (falls back to openai when a key is missing)."""
+    settings = settings or get_settings()
+    stt = settings.stt_provider.lower()
+    if stt not in STT_PROVIDERS or (stt == "deepgram" and not settings.deepgram_api_key):
+        stt = "openai"
+    tts = settings.tts_provider.lower()
+    if tts not in TTS_PROVIDERS or (tts == "cartesia" and not settings.cartesia_api_key):
+        tts = "openai"
+    llm = settings.llm_provider.lower()
+    if llm not in LLM_PROVIDERS:
+        llm = "openai"
+    return {"stt": stt, "tts": tts, "llm": llm}
+
+
+def create_stt(settings: Settings) -> Any:
+    module_name, factory = STT_PROVIDERS[selected_providers(settings)["stt"]]
+    return factory(_plugin(module_name), settings)
+
+
+def create_tts(settings: Settings, voice: str | None = None) -> Any:
+    module_name, factory = TTS_PROVIDERS[selected_providers(settings)["tts"]]
+    return factory(_plugin(module_name), settings, voice=voice)
+
+
+def create_llm(settings: Settings) -> Any:
+    module_name, factory = LLM_PROVIDERS[selected_providers(settings)["llm"]]
+    return factory(_plugin(module_name), settings)
+
+
+def vad_pool_module() -> ModuleType:
+    """The vad_pool module (imports the Silero/onnxruntime stack on first use)."""
+    return _plugin(f"{__package__}.vad_pool")
+
+
+def vad_pool_loaded() -> bool:
+    return f"{__package__}.vad_pool" in sys.modules
+
+
+def load_vad(settings: Settings) -> Any:
+    return vad_pool_module().load_vad(settings)
+
+
+def import_providers(settings: Settings | None = None) -> None:
+    """Import the configured STT/TTS/LLM plugins and the VAD stack (main thread only)."""
+    selected = selected_providers(settings)
+    for registry, kind in ((STT_PROVIDERS, "stt"), (TTS_PROVIDERS, "tts"), (LLM_PROVIDERS, "llm")):
+        _plugin(registry[selected[kind]][0])
+    vad_pool_module()
+
+
+def warm_vad(settings: Settings | None = None) -> None:
+    """Load the VAD model once (or start the VAD pool) so the first session does not pay for it."""
+    settings = settings or get_settings()
+    vad_pool = vad_pool_module()
+    with timed_phase("vad_model", "init"):
+        if vad_pool.get_vad_pool(settings) is None:
+            # inline mode: loads onnxruntime and the model file into the OS cache
+            vad_pool.load_vad(settings)
+
+
+def prewarm(settings: Settings | None = None) -> None:
+    import_providers(settings)
+    warm_vad(settings)
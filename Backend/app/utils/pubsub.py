@@ -0,0 +1,160 @@
+"""
+Transcript pub/sub transports.
+
+The agent side publishes transcript events per session; every API worker that
+holds websocket clients for a session subscribes to it and fans events out to
+its local sockets. The in-process transport is the default (single worker);
+the Redis transport lets any worker serve any websocket regardless of which
+process runs the AgentManager session.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..config import Settings, get_settings
+
+logger = logging.getLogger("voice-agent")
+
+Deliver = Callable[[str, dict], Awaitable[None]]
+
+
+class TranscriptBus:
+    """Base transport: publish events for a session, deliver them to local subscribers."""
+
+    def __init__(self) -> None:
+        self._deliver: Optional[Deliver] = None
+
+    def set_deliver(self, cb: Deliver) -> None:
+        self._deliver = cb
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, session_id: str, payload: dict) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, session_id: str) -> None:
+        pass
+
+    async def unsubscribe(self, session_id: str) -> None:
+        pass
+
+    async def _dispatch(self, session_id: str, payload: dict) -> None:
+        if self._deliver is None:
+            return
+        try:
+            await self._deliver(session_id, payload)
+        except Exception:
+            logger.exception("Transcript delivery failed for session %s", session_id)
+
+
+class InProcessTranscriptBus(TranscriptBus):
+    """Delivers straight to this process' websockets (single worker deployments)."""
+
+    async def publish(self, session_id: str, payload: dict) -> None:
+        await self._dispatch(session_id, payload)
+
+
+class RedisTranscriptBus(TranscriptBus):
+    """
+    Redis-protocol transport: one channel per session, `<prefix><session_id>`.
+
+    Works against any server speaking the Redis pub/sub protocol (Redis, Valkey,
+    KeyDB, or a local stand-in such as fakeredis in tests).
+    """
+
+    def __init__(self, url: str, prefix: str = "transcript:", client: Any = None) -> None:
+        super().__init__()
+        self._url = url
+        self._prefix = prefix
+        self._client = client
+        self._pubsub: Any = None
+        self._reader: Optional[asyncio.Task[None]] = None
+        self._subs: Dict[str, int] = {}
+
+    def _channel(self, session_id: str) -> str:
+        return f"{self._prefix}{session_id}"
+
+    async def start(self) -> None:
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self._url)
+        self._pubsub = self._client.pubsub()
+        self._reader = asyncio.create_task(self._read_loop(), name="transcript_bus_reader")
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except Exception:
+                pass
+
+    async def publish(self, session_id: str, payload: dict) -> None:
+        try:
+            await self._client.publish(self._channel(session_id), json.dumps(payload))
+        except Exception:
+            logger.warning("Transcript publish failed for session %s", session_id)
+
+    async def subscribe(self, session_id: str) -> None:
+        # reference-counted so several local sockets share one channel subscription
+        count = self._subs.get(session_id, 0)
+        self._subs[session_id] = count + 1
+        if count == 0:
+            await self._pubsub.subscribe(self._channel(session_id))
+
+    async def unsubscribe(self, session_id: str) -> None:
+        count = self._subs.get(session_id, 0)
+        if count <= 1:
+            self._subs.pop(session_id, None)
+            if count == 1:
+                await self._pubsub.unsubscribe(self._channel(session_id))
+        else:
+            self._subs[session_id] = count - 1
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not msg or msg.get("type") != "message":
+                    continue
+                channel = msg["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                session_id = channel[len(self._prefix):]
+                await self._dispatch(session_id, json.loads(msg["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Transcript bus reader error")
+                await asyncio.sleep(1.0)
+
+
+def create_transcript_bus(settings: Settings | None = None) -> TranscriptBus:
+    settings = settings or get_settings()
+    if settings.transcript_bus.lower() == "redis":
+        if not settings.redis_url:
+            raise RuntimeError("TRANSCRIPT_BUS=redis requires REDIS_URL")
+        return RedisTranscriptBus(settings.redis_url, prefix=settings.transcript_bus_prefix)
+    return InProcessTranscriptBus()
@@ -0,0 +1,325 @@
+"""
+Per-session call recording to a compressed file on disk (Opus/Ogg or FLAC).
+
+The recorder tees the session's audio input (user, left channel) and audio
+output (agent, right channel). The live path only stamps each frame with its
+position on the user timeline and puts it on a bounded queue; resampling,
+mixing and encoding happen on a dedicated thread that writes the file as it
+goes, so memory stays bounded by the queue size plus a few seconds of pending
+audio regardless of call length. When the queue is full frames are dropped
+(and counted) rather than slowing the call down.
+
+Agent audio is pushed slightly faster than real time and may be interrupted,
+so an interrupted segment is cut back to what was actually played out.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import av
+import numpy as np
+from livekit import rtc
+from livekit.agents import AgentSession
+from livekit.agents.voice import io
+
+from .metrics import (
+    RECORDINGS_ACTIVE,
+    RECORDING_AUDIO_SECONDS,
+    RECORDING_DROPPED_FRAMES,
+    RECORDING_ENCODE_SECONDS,
+    RECORDING_TEE_SECONDS,
+)
+
+logger = logging.getLogger("voice-agent")
+
+_USER = 0
+_AGENT = 1
+_SEGMENT_END = 2
+
+_FORMATS = {"ogg": ("ogg", "opus"), "flac": ("flac", "flac")}
+_INV_INT16 = 1.0 / 32768.0
+
+
+def _to_mono(frame: rtc.AudioFrame) -> np.ndarray:
+    samples = np.frombuffer(frame.data, dtype=np.int16, count=frame.samples_per_channel * frame.num_channels)
+    if frame.num_channels > 1:
+        return samples.reshape(-1, frame.num_channels).mean(axis=1, dtype=np.float32) * _INV_INT16
+    return samples.astype(np.float32) * _INV_INT16
+
+
+class _RecorderInput(io.AudioInput):
+    def __init__(self, recorder: "SessionRecorder", source: io.AudioInput) -> None:
+        super().__init__(label="Recorder", source=source)
+        self._recorder = recorder
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self.source.__anext__()
+        self._recorder._tee_user(frame)
+        return frame
+
+    def on_attached(self) -> None:
+        self.source.on_attached()
+
+    def on_detached(self) -> None:
+        self.source.on_detached()
+
+
+class _RecorderOutput(io.AudioOutput):
+    def __init__(self, recorder: "SessionRecorder", next_in_chain: io.AudioOutput) -> None:
+        super().__init__(
+            label="Recorder",
+            next_in_chain=next_in_chain,
+            sample_rate=next_in_chain.sample_rate,
+            capabilities=io.AudioOutputCapabilities(pause=True),
+        )
+        self._recorder = recorder
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        self._recorder._tee_agent(frame)
+        await self.next_in_chain.capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        self.next_in_chain.flush()
+
+    def clear_buffer(self) -> None:
+        self.next_in_chain.clear_buffer()
+
+    def on_playback_finished(
+        self,
+        *,
+        playback_position: float,
+        interrupted: bool,
+        synchronized_transcript: Optional[str] = None,
+    ) -> None:
+        super().on_playback_finished(
+            playback_position=playback_position,
+            interrupted=interrupted,
+            synchronized_transcript=synchronized_transcript,
+        )
+        self._recorder._segment_end(playback_position, interrupted)
+
+
+class SessionRecorder:
+    def __init__(
+        self,
+        session_id: str,
+        path: str,
+        fmt: str = "ogg",
+        sample_rate: int = 24000,
+        bitrate: int = 32000,
+        max_queue: int = 500,
+        chunk_seconds: float = 1.0,
+        max_pending_seconds: float = 5.0,
+    ) -> None:
+        if fmt not in _FORMATS:
+            raise ValueError(f"unsupported recording format: {fmt}")
+        self.session_id = session_id
+        self.path = path
+        self.format = fmt
+        self.sample_rate = sample_rate
+        self.bitrate = bitrate
+        self._queue: "queue.Queue[Optional[Tuple[int, Any, int]]]" = queue.Queue(maxsize=max_queue)
+        self._chunk = int(sample_rate * chunk_seconds)
+        self._max_pending = int(sample_rate * max_pending_seconds)
+        self._thread: Optional[threading.Thread] = None
+        self._failed = False
+
+        # loop-thread state
+        self._user_time = 0.0
+        self._frames = 0
+        self._dropped = 0
+        self._tee_seconds = 0.0
+
+        # encoder-thread state
+        self._buf = np.zeros((2, self._max_pending + self._chunk), dtype=np.float32)
+        self._emitted = 0
+        self._cursor = [0, 0]
+        self._segment_start: Optional[int] = None
+        self._resamplers: Dict[Tuple[int, int], rtc.AudioResampler] = {}
+        self._encode_seconds = 0.0
+
+    # live path ----------------------------------------------------------
+
+    def attach(self, session: AgentSession) -> None:
+        """Wrap the started session's audio input/output and start the encoder thread."""
+        if session.input.audio is not None:
+            session.input.audio = _RecorderInput(self, session.input.audio)
+        if session.output.audio is not None:
+            session.output.audio = _RecorderOutput(self, session.output.audio)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._encode_thread, name=f"recorder-{self.session_id[:8]}", daemon=True
+        )
+        self._thread.start()
+        RECORDINGS_ACTIVE.inc()
+
+    def _put(self, item: Tuple[int, Any, int]) -> None:
+        started = time.perf_counter()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._dropped += 1
+            RECORDING_DROPPED_FRAMES.inc()
+        self._tee_seconds += time.perf_counter() - started
+
+    def _tee_user(self, frame: rtc.AudioFrame) -> None:
+        if self._thread is None or self._failed:
+            return
+        stamp = int(self._user_time * self.sample_rate)
+        self._user_time += frame.samples_per_channel / frame.sample_rate
+        self._frames += 1
+        self._put((_USER, frame, stamp))
+
+    def _tee_agent(self, frame: rtc.AudioFrame) -> None:
+        if self._thread is None or self._failed:
+            return
+        self._frames += 1
+        self._put((_AGENT, frame, int(self._user_time * self.sample_rate)))
+
+    def _segment_end(self, played: float, interrupted: bool) -> None:
+        if self._thread is None or self._failed:
+            return
+        self._put((_SEGMENT_END, (played, interrupted), 0))
+
+    async def aclose(self) -> Dict[str, Any]:
+        if self._thread is not None:
+            # the queue may be full: wait for room off the event loop
+            await asyncio.to_thread(self._queue.put, None)
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+            RECORDINGS_ACTIVE.dec()
+            RECORDING_TEE_SECONDS.inc(self._tee_seconds)
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        duration = self._emitted / self.sample_rate
+        return {
+            "path": self.path,
+            "format": self.format,
+            "duration_seconds": round(duration, 3),
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "frames": self._frames,
+            "dropped_frames": self._dropped,
+            "failed": self._failed,
+            # overhead: time spent on the event loop vs. on the encoder thread
+            "tee_seconds": round(self._tee_seconds, 6),
+            "encode_seconds": round(self._encode_seconds, 6),
+        }
+
+    # encoder thread -----------------------------------------------------
+
+    def _encode_thread(self) -> None:
+        container_format, codec = _FORMATS[self.format]
+        closing = False
+        try:
+            with av.open(self.path, mode="w", format=container_format) as container:
+                stream = container.add_stream(codec, rate=self.sample_rate, layout="stereo")
+                if codec == "opus":
+                    stream.bit_rate = self.bitrate
+                while True:
+                    item = self._queue.get()
+                    if item is None:
+                        closing = True
+                        break
+                    started = time.perf_counter()
+                    self._handle(item)
+                    self._drain(container, stream, final=False)
+                    self._encode_seconds += time.perf_counter() - started
+                started = time.perf_counter()
+                for key in list(self._resamplers):
+                    self._place(key[0], self._resamplers.pop(key).flush(), 0)
+                self._drain(container, stream, final=True)
+                for packet in stream.encode(None):
+                    container.mux(packet)
+                self._encode_seconds += time.perf_counter() - started
+        except Exception:
+            self._failed = True
+            logger.exception("recording %s failed", self.session_id)
+            # unblock the live path: everything queued from now on is discarded, up to
+            # aclose()'s sentinel (unless the final flush failed after it was taken)
+            if not closing:
+                while self._queue.get() is not None:
+                    pass
+
+    def _handle(self, item: Tuple[int, Any, int]) -> None:
+        kind, payload, stamp = item
+        if kind == _SEGMENT_END:
+            self._end_segment(*payload)
+            return
+        frame: rtc.AudioFrame = payload
+        if frame.sample_rate != self.sample_rate:
+            key = (kind, frame.sample_rate, frame.num_channels)
+            resampler = self._resamplers.get(key)
+            if resampler is None:
+                resampler = self._resamplers[key] = rtc.AudioResampler(
+                    input_rate=frame.sample_rate, output_rate=self.sample_rate, num_channels=frame.num_channels
+                )
+            self._place(kind, resampler.push(frame), stamp)
+        else:
+            self._place(kind, [frame], stamp)
+
+    def _place(self, channel: int, frames: List[rtc.AudioFrame], stamp: int) -> None:
+        for frame in frames:
+            samples = _to_mono(frame)
+            start = max(self._cursor[channel], stamp, self._emitted)
+            end = start + len(samples)
+            if end - self._emitted > self._buf.shape[1]:
+                self._buf = np.concatenate(
+                    [self._buf, np.zeros((2, end - self._emitted - self._buf.shape[1]), dtype=np.float32)], axis=1
+                )
+            offset = start - self._emitted
+            self._buf[channel, offset : offset + len(samples)] = samples
+            self._cursor[channel] = end
+            if channel == _AGENT and self._segment_start is None:
+                self._segment_start = start
+            stamp = end
+
+    def _end_segment(self, played: float, interrupted: bool) -> None:
+        if interrupted and self._segment_start is not None:
+            # drop what was queued for playout but never heard
+            cut = max(self._segment_start + int(played * self.sample_rate), self._emitted)
+            if cut < self._cursor[_AGENT]:
+                self._buf[_AGENT, cut - self._emitted : self._cursor[_AGENT] - self._emitted] = 0.0
+                self._cursor[_AGENT] = cut
+        self._segment_start = None
+
+    def _drain(self, container: Any, stream: Any, final: bool) -> None:
+        # the user channel is continuous, so it paces the file; agent audio
+        # ahead of it waits unless the input stalls for too long
+        pending = max(self._cursor) - self._emitted
+        ready = pending if final or pending > self._max_pending else self._cursor[_USER] - self._emitted
+        if ready <= 0 or (not final and ready < self._chunk):
+            return
+        frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(self._buf[:, :ready]), format="fltp", layout="stereo")
+        frame.sample_rate = self.sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        remaining = pending - ready
+        if remaining > 0:
+            self._buf[:, :remaining] = self._buf[:, ready:pending]
+        self._buf[:, max(remaining, 0) : pending] = 0.0
+        self._emitted += ready
+        RECORDING_AUDIO_SECONDS.inc(ready / self.sample_rate)
+
+
+def create_recorder(settings: Any, session_id: str) -> Optional[SessionRecorder]:
+    """Recorder for a new session, or None when recording is disabled."""
+    if not settings.recording_enabled:
+        return None
+    fmt = settings.recording_format.lower()
+    path = os.path.abspath(os.path.join(settings.recording_dir, f"{session_id}.{fmt}"))
+    return SessionRecorder(
+        session_id,
+        path,
+        fmt=fmt,
+        sample_rate=settings.recording_sample_rate,
+        bitrate=settings.recording_bitrate,
+        max_queue=settings.recording_queue_frames,
+    )
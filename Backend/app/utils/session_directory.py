@@ -0,0 +1,445 @@
+"""
+Shared session directory: which node (API or agent worker process) owns a session.
+
+Behind a load balancer a DELETE /session/{id} usually lands on a process that
+does not run the session. Every node registers the sessions it runs here,
+keeps a heartbeat, and polls a per-node mailbox of stop requests; any node can
+look up the owner and drop a stop request in its mailbox. Sessions of a node
+whose heartbeat is older than the TTL are treated as gone.
+
+In worker mode (dispatch.py) the directory also keeps each session's room and
+LiveKit dispatch id, so any API node can report or cancel a dispatch another
+node created. Those records are kept for DISPATCH_RECORD_TTL seconds.
+
+Backends:
+- memory: single process (default), nothing is shared
+- sqlite: one file shared by the processes on one host (e.g. uvicorn --workers)
+- redis: any Redis-protocol server, for multi-host deployments (a local
+  stand-in such as fakeredis works for tests)
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..config import Settings, get_settings
+
+logger = logging.getLogger("voice-agent")
+
+StopHandler = Callable[[str], Awaitable[bool]]
+
+# dispatch records outlive any realistic call; after that status/stop fall back to the owner entry
+DISPATCH_RECORD_TTL = 24 * 3600
+
+
+def default_node_id(settings: Settings) -> str:
+    # one node per process: uvicorn workers on one host each own their sessions
+    return f"{settings.node_name or socket.gethostname()}:{os.getpid()}"
+
+
+class SessionDirectory:
+    """Base directory: owner bookkeeping, heartbeats and stop-request mailboxes."""
+
+    def __init__(
+        self,
+        node_id: str,
+        heartbeat_interval: float = 5.0,
+        ttl: float = 15.0,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.node_id = node_id
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._stop_handler: Optional[StopHandler] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def set_stop_handler(self, cb: StopHandler) -> None:
+        self._stop_handler = cb
+
+    async def start(self) -> None:
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._run(), name="session_directory")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self._drop_node()
+        except Exception:
+            logger.warning("Session directory: could not remove node %s", self.node_id)
+
+    async def register(self, session_id: str, room: str) -> None:
+        await self._put_session(session_id, {"node_id": self.node_id, "room": room, "started_at": time.time()})
+
+    async def unregister(self, session_id: str) -> None:
+        await self._del_session(session_id)
+
+    async def lookup(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Owner entry for a session, or None if unknown or its owner stopped heartbeating."""
+        entry = await self._get_session(session_id)
+        if entry is None:
+            return None
+        if entry["node_id"] != self.node_id and not await self._node_alive(entry["node_id"]):
+            await self._del_session(session_id)
+            return None
+        return {"session_id": session_id, **entry}
+
+    async def put_dispatch(self, session_id: str, room: str, dispatch_id: str) -> None:
+        await self._put_dispatch(session_id, {"room": room, "dispatch_id": dispatch_id, "created_at": time.time()})
+
+    async def get_dispatch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Room and dispatch id of a worker-mode session, whichever node dispatched it."""
+        return await self._get_dispatch(session_id)
+
+    async def del_dispatch(self, session_id: str) -> None:
+        await self._del_dispatch(session_id)
+
+    async def request_stop(self, session_id: str, timeout: float = 5.0) -> bool:
+        """
+        Stop a session wherever it runs. Returns False if no live node owns it;
+        raises TimeoutError if the owner did not act on the request in time.
+        """
+        entry = await self.lookup(session_id)
+        if entry is None:
+            return False
+        if entry["node_id"] == self.node_id:
+            return await self._handle_stop(session_id)
+        await self._push_stop(entry["node_id"], session_id)
+        deadline = time.monotonic() + timeout
+        # the owner unregisters the session once it has stopped it
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval / 2)
+            if await self.lookup(session_id) is None:
+                return True
+        raise TimeoutError(f"node {entry['node_id']} did not stop session {session_id}")
+
+    async def _handle_stop(self, session_id: str) -> bool:
+        stopped = False
+        if self._stop_handler is not None:
+            try:
+                stopped = await self._stop_handler(session_id)
+            except Exception:
+                logger.exception("Session directory: stop handler failed for %s", session_id)
+        # stale entry (session already ended here): drop it either way
+        await self._del_session(session_id)
+        return stopped
+
+    async def _run(self) -> None:
+        last_heartbeat = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for session_id in await self._pop_stops():
+                    await self._handle_stop(session_id)
+                if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                    last_heartbeat = time.monotonic()
+                    await self._heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Session directory loop error")
+
+    # backend primitives ------------------------------------------------
+
+    async def _heartbeat(self) -> None:
+        pass
+
+    async def _node_alive(self, node_id: str) -> bool:
+        raise NotImplementedError
+
+    async def _put_session(self, session_id: str, entry: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def _del_session(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    async def _push_stop(self, node_id: str, session_id: str) -> None:
+        raise NotImplementedError
+
+    async def _pop_stops(self) -> List[str]:
+        return []
+
+    async def _drop_node(self) -> None:
+        pass
+
+    async def _put_dispatch(self, session_id: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def _get_dispatch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def _del_dispatch(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class InProcessSessionDirectory(SessionDirectory):
+    """Single process: every session is local, nothing to share."""
+
+    def __init__(self, node_id: str, **kwargs: Any) -> None:
+        super().__init__(node_id, **kwargs)
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._dispatches: Dict[str, Dict[str, Any]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def _node_alive(self, node_id: str) -> bool:
+        return node_id == self.node_id
+
+    async def _put_session(self, session_id: str, entry: Dict[str, Any]) -> None:
+        self._sessions[session_id] = entry
+
+    async def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(session_id)
+
+    async def _del_session(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    async def _push_stop(self, node_id: str, session_id: str) -> None:
+        pass
+
+    async def _put_dispatch(self, session_id: str, record: Dict[str, Any]) -> None:
+        self._dispatches[session_id] = record
+
+    async def _get_dispatch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = self._dispatches.get(session_id)
+        if record is not None and record["created_at"] < time.time() - DISPATCH_RECORD_TTL:
+            del self._dispatches[session_id]
+            return None
+        return record
+
+    async def _del_dispatch(self, session_id: str) -> None:
+        self._dispatches.pop(session_id, None)
+
+
+class SQLiteSessionDirectory(SessionDirectory):
+    """File-backed directory shared by the processes of one host (WAL mode)."""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, node_id TEXT NOT NULL,"
+        " room TEXT, started_at REAL)",
+        "CREATE INDEX IF NOT EXISTS sessions_node ON sessions (node_id)",
+        "CREATE TABLE IF NOT EXISTS stop_requests (session_id TEXT PRIMARY KEY, node_id TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS dispatches (session_id TEXT PRIMARY KEY, room TEXT NOT NULL,"
+        " dispatch_id TEXT NOT NULL, created_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str, node_id: str, **kwargs: Any) -> None:
+        super().__init__(node_id, **kwargs)
+        self.path = path
+        self._initialized = False
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in self._SCHEMA:
+                    conn.execute(stmt)
+                self._initialized = True
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    async def _run_sql(self, sql: str, params: tuple = ()) -> List[tuple]:
+        # sqlite calls block: keep them off the event loop
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def _heartbeat(self) -> None:
+        now = time.time()
+        await self._run_sql(
+            "INSERT INTO nodes (node_id, heartbeat) VALUES (?, ?)"
+            " ON CONFLICT(node_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+            (self.node_id, now),
+        )
+        # reap nodes that died without cleaning up
+        await self._run_sql(
+            "DELETE FROM sessions WHERE node_id IN (SELECT node_id FROM nodes WHERE heartbeat < ?)",
+            (now - self.ttl,),
+        )
+        await self._run_sql("DELETE FROM nodes WHERE heartbeat < ?", (now - self.ttl,))
+        await self._run_sql("DELETE FROM dispatches WHERE created_at < ?", (now - DISPATCH_RECORD_TTL,))
+
+    async def _node_alive(self, node_id: str) -> bool:
+        rows = await self._run_sql(
+            "SELECT 1 FROM nodes WHERE node_id = ? AND heartbeat >= ?", (node_id, time.time() - self.ttl)
+        )
+        return bool(rows)
+
+    async def _put_session(self, session_id: str, entry: Dict[str, Any]) -> None:
+        await self._run_sql(
+            "INSERT OR REPLACE INTO sessions (session_id, node_id, room, started_at) VALUES (?, ?, ?, ?)",
+            (session_id, entry["node_id"], entry["room"], entry["started_at"]),
+        )
+
+    async def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run_sql(
+            "SELECT node_id, room, started_at FROM sessions WHERE session_id = ?", (session_id,)
+        )
+        if not rows:
+            return None
+        node_id, room, started_at = rows[0]
+        return {"node_id": node_id, "room": room, "started_at": started_at}
+
+    async def _del_session(self, session_id: str) -> None:
+        await self._run_sql("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    async def _push_stop(self, node_id: str, session_id: str) -> None:
+        await self._run_sql(
+            "INSERT OR REPLACE INTO stop_requests (session_id, node_id) VALUES (?, ?)", (session_id, node_id)
+        )
+
+    async def _pop_stops(self) -> List[str]:
+        rows = await self._run_sql(
+            "DELETE FROM stop_requests WHERE node_id = ? RETURNING session_id", (self.node_id,)
+        )
+        return [row[0] for row in rows]
+
+    async def _drop_node(self) -> None:
+        await self._run_sql("DELETE FROM sessions WHERE node_id = ?", (self.node_id,))
+        await self._run_sql("DELETE FROM stop_requests WHERE node_id = ?", (self.node_id,))
+        await self._run_sql("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+
+    async def _put_dispatch(self, session_id: str, record: Dict[str, Any]) -> None:
+        await self._run_sql(
+            "INSERT OR REPLACE INTO dispatches (session_id, room, dispatch_id, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, record["room"], record["dispatch_id"], record["created_at"]),
+        )
+
+    async def _get_dispatch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run_sql(
+            "SELECT room, dispatch_id, created_at FROM dispatches WHERE session_id = ? AND created_at >= ?",
+            (session_id, time.time() - DISPATCH_RECORD_TTL),
+        )
+        if not rows:
+            return None
+        room, dispatch_id, created_at = rows[0]
+        return {"room": room, "dispatch_id": dispatch_id, "created_at": created_at}
+
+    async def _del_dispatch(self, session_id: str) -> None:
+        await self._run_sql("DELETE FROM dispatches WHERE session_id = ?", (session_id,))
+
+
+class RedisSessionDirectory(SessionDirectory):
+    """
+    Redis-protocol directory for multi-host deployments.
+
+    Keys: `<prefix>node:<id>` (expires after the TTL unless refreshed),
+    `<prefix>session:<id>` (owner entry), `<prefix>node-sessions:<id>` (set, for
+    cleanup), `<prefix>stops:<id>` (stop-request mailbox list) and
+    `<prefix>dispatch:<id>` (worker-mode dispatch record, expires on its own).
+    """
+
+    def __init__(self, url: str, node_id: str, prefix: str = "voice:", client: Any = None, **kwargs: Any) -> None:
+        super().__init__(node_id, **kwargs)
+        self._url = url
+        self._prefix = prefix
+        self._client = client
+
+    def _redis(self) -> Any:
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self._url)
+        return self._client
+
+    async def close(self) -> None:
+        await super().close()
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except Exception:
+                pass
+
+    async def _heartbeat(self) -> None:
+        await self._redis().set(f"{self._prefix}node:{self.node_id}", "1", px=int(self.ttl * 1000))
+
+    async def _node_alive(self, node_id: str) -> bool:
+        return bool(await self._redis().exists(f"{self._prefix}node:{node_id}"))
+
+    async def _put_session(self, session_id: str, entry: Dict[str, Any]) -> None:
+        pipe = self._redis().pipeline()
+        pipe.set(f"{self._prefix}session:{session_id}", json.dumps(entry))
+        pipe.sadd(f"{self._prefix}node-sessions:{entry['node_id']}", session_id)
+        await pipe.execute()
+
+    async def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis().get(f"{self._prefix}session:{session_id}")
+        return json.loads(raw) if raw else None
+
+    async def _del_session(self, session_id: str) -> None:
+        entry = await self._get_session(session_id)
+        pipe = self._redis().pipeline()
+        pipe.delete(f"{self._prefix}session:{session_id}")
+        if entry is not None:
+            pipe.srem(f"{self._prefix}node-sessions:{entry['node_id']}", session_id)
+        await pipe.execute()
+
+    async def _push_stop(self, node_id: str, session_id: str) -> None:
+        key = f"{self._prefix}stops:{node_id}"
+        pipe = self._redis().pipeline()
+        pipe.rpush(key, session_id)
+        # a mailbox nobody drains (dead node) goes away on its own
+        pipe.pexpire(key, int(self.ttl * 1000))
+        await pipe.execute()
+
+    async def _pop_stops(self) -> List[str]:
+        items = await self._redis().lpop(f"{self._prefix}stops:{self.node_id}", 100)
+        return [i.decode() if isinstance(i, bytes) else i for i in items or []]
+
+    async def _drop_node(self) -> None:
+        client = self._redis()
+        members = await client.smembers(f"{self._prefix}node-sessions:{self.node_id}")
+        pipe = client.pipeline()
+        for session_id in members:
+            if isinstance(session_id, bytes):
+                session_id = session_id.decode()
+            pipe.delete(f"{self._prefix}session:{session_id}")
+        pipe.delete(
+            f"{self._prefix}node-sessions:{self.node_id}",
+            f"{self._prefix}stops:{self.node_id}",
+            f"{self._prefix}node:{self.node_id}",
+        )
+        await pipe.execute()
+
+    async def _put_dispatch(self, session_id: str, record: Dict[str, Any]) -> None:
+        await self._redis().set(f"{self._prefix}dispatch:{session_id}", json.dumps(record), ex=DISPATCH_RECORD_TTL)
+
+    async def _get_dispatch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis().get(f"{self._prefix}dispatch:{session_id}")
+        return json.loads(raw) if raw else None
+
+    async def _del_dispatch(self, session_id: str) -> None:
+        await self._redis().delete(f"{self._prefix}dispatch:{session_id}")
+
+
+def create_session_directory(settings: Settings | None = None) -> SessionDirectory:
+    settings = settings or get_settings()
+    kind = settings.session_directory.lower()
+    node_id = default_node_id(settings)
+    options = {"heartbeat_interval": settings.node_heartbeat_interval, "ttl": settings.node_ttl}
+    if kind == "redis":
+        if not settings.redis_url:
+            raise RuntimeError("SESSION_DIRECTORY=redis requires REDIS_URL")
+        return RedisSessionDirectory(
+            settings.redis_url, node_id, prefix=settings.session_directory_prefix, **options
+        )
+    if kind == "sqlite":
+        return SQLiteSessionDirectory(settings.session_directory_path, node_id, **options)
+    return InProcessSessionDirectory(node_id, **options)
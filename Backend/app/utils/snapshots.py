@@ -0,0 +1,110 @@
+"""
+Crash-safe session snapshots.
+
+AgentManager periodically writes each session's chat context, instructions,
+voice/user preferences and room binding to a local SQLite file (WAL, one row
+per session, replaced in place) and touches its rows on every tick. A session
+that ends normally deletes its snapshot, so rows that stop being touched
+belong to a process that died. A (re)started process claims such orphans
+(compare-and-swap on the owner column, so two processes never resume the same
+call), rejoins the room if the user is still there, and resumes with the
+restored context.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import SNAPSHOT_BYTES, SNAPSHOT_SECONDS
+
+
+class SnapshotStore:
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS snapshots (session_id TEXT PRIMARY KEY, node_id TEXT NOT NULL,"
+        " room TEXT NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)",
+    )
+
+    def __init__(self, path: str, node_id: str) -> None:
+        self.path = path
+        self.node_id = node_id
+        self._initialized = False
+
+    def _execute(self, sql: str, params: tuple = ()) -> Tuple[List[tuple], int]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in self._SCHEMA:
+                    conn.execute(stmt)
+                self._initialized = True
+            with conn:
+                cur = conn.execute(sql, params)
+                return cur.fetchall(), cur.rowcount
+        finally:
+            conn.close()
+
+    async def _run_sql(self, sql: str, params: tuple = ()) -> Tuple[List[tuple], int]:
+        # sqlite calls block (and fsync): keep them off the event loop
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def save(self, session_id: str, room: str, snapshot: Dict[str, Any], build_seconds: float = 0.0) -> int:
+        """
+        Write (replace) a session's snapshot; returns its size in bytes.
+
+        `build_seconds` is the caller's time spent collecting the snapshot; it
+        is reported with the JSON encoding as the event-loop cost.
+        """
+        started = time.perf_counter()
+        data = json.dumps(snapshot, separators=(",", ":"))
+        encoded = time.perf_counter()
+        await self._run_sql(
+            "INSERT OR REPLACE INTO snapshots (session_id, node_id, room, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+            (session_id, self.node_id, room, time.time(), data),
+        )
+        SNAPSHOT_SECONDS.labels(phase="encode").observe(build_seconds + encoded - started)
+        SNAPSHOT_SECONDS.labels(phase="write").observe(time.perf_counter() - encoded)
+        SNAPSHOT_BYTES.observe(len(data))
+        return len(data)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows, _ = await self._run_sql("SELECT data FROM snapshots WHERE session_id = ?", (session_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    async def delete(self, session_id: str) -> None:
+        await self._run_sql("DELETE FROM snapshots WHERE session_id = ?", (session_id,))
+
+    async def touch(self) -> None:
+        """Mark this process' snapshots as alive (owners that stop touching are presumed dead)."""
+        await self._run_sql("UPDATE snapshots SET updated_at = ? WHERE node_id = ?", (time.time(), self.node_id))
+
+    async def orphans(self, stale_after: float) -> List[Dict[str, Any]]:
+        """Other processes' snapshots not touched for `stale_after` seconds."""
+        rows, _ = await self._run_sql(
+            "SELECT session_id, node_id, room, updated_at FROM snapshots WHERE node_id != ? AND updated_at < ?",
+            (self.node_id, time.time() - stale_after),
+        )
+        return [{"session_id": s, "node_id": n, "room": r, "updated_at": u} for s, n, r, u in rows]
+
+    async def claim(self, session_id: str, previous_owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take over a snapshot; None if it is gone or another process claimed it
+        first. Without `previous_owner` the take-over is unconditional (the
+        caller already holds the session, e.g. a re-dispatched worker job).
+        """
+        if previous_owner is None:
+            sql, params = "UPDATE snapshots SET node_id = ? WHERE session_id = ?", (self.node_id, session_id)
+        else:
+            sql = "UPDATE snapshots SET node_id = ? WHERE session_id = ? AND node_id = ?"
+            params = (self.node_id, session_id, previous_owner)
+        _, claimed = await self._run_sql(sql, params)
+        if claimed != 1:
+            return None
+        return await self.load(session_id)
+
+
+def create_snapshot_store(settings: Any, node_id: str) -> Optional[SnapshotStore]:
+    if not settings.snapshot_enabled:
+        return None
+    return SnapshotStore(settings.snapshot_path, node_id)
@@ -0,0 +1,48 @@
+"""
+Startup-time report: how long the process took to become ready, by phase.
+
+Phases are either "import" (module imports, including provider plugins loaded
+on first use) or "init" (startup hooks, prewarm). The report is logged once
+startup completes (see main.py) and served under `startup` in /diagnostics.
+"""
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import psutil
+
+from .metrics import STARTUP_PHASE_SECONDS
+
+_phases: List[Dict[str, Any]] = []
+_ready_at: Optional[float] = None
+
+
+def record_phase(name: str, kind: str, seconds: float) -> None:
+    _phases.append({"phase": name, "kind": kind, "seconds": round(seconds, 4)})
+    STARTUP_PHASE_SECONDS.labels(phase=name, kind=kind).set(seconds)
+
+
+@contextmanager
+def timed_phase(name: str, kind: str = "init") -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, kind, time.perf_counter() - started)
+
+
+def mark_ready() -> Dict[str, Any]:
+    global _ready_at
+    _ready_at = time.time()
+    return startup_report()
+
+
+def startup_report() -> Dict[str, Any]:
+    created = psutil.Process().create_time()
+    return {
+        "process_to_ready_seconds": round(_ready_at - created, 3) if _ready_at else None,
+        "import_seconds": round(sum(p["seconds"] for p in _phases if p["kind"] == "import"), 4),
+        "init_seconds": round(sum(p["seconds"] for p in _phases if p["kind"] == "init"), 4),
+        "phases": list(_phases),
+    }
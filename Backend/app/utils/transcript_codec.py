@@ -0,0 +1,74 @@
+from __future__ import annotations
+import json
+from typing import Any, Dict, Iterable, Optional
+
+import msgpack
+
+# Websocket subprotocols understood by /ws/transcript/{session_id}.
+# Clients that do not offer any subprotocol get JSON text frames (legacy behaviour).
+SUBPROTOCOL_MSGPACK = "transcript.msgpack.v1"
+SUBPROTOCOL_JSON = "transcript.json.v1"
+
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+
+# Integer codes keep binary frames small; keep in sync with voice-agent.js
+ROLE_CODES: Dict[str, int] = {"user": 0, "agent": 1, "event": 2}
+EVENT_CODES: Dict[str, int] = {
+    "": 0,
+    "speech_started": 1,
+    "speech_ended": 2,
+}
+
+
+def select_codec(offered: Iterable[str], allow_binary: bool = True) -> tuple[str, Optional[str]]:
+    """Pick (codec, subprotocol) from the client's offered subprotocols.
+
+    Returns the subprotocol to echo in the handshake, or None when the client
+    did not offer one we know (plain JSON, no subprotocol header).
+    """
+    offered = list(offered or [])
+    if allow_binary and SUBPROTOCOL_MSGPACK in offered:
+        return CODEC_MSGPACK, SUBPROTOCOL_MSGPACK
+    if SUBPROTOCOL_JSON in offered:
+        return CODEC_JSON, SUBPROTOCOL_JSON
+    return CODEC_JSON, None
+
+
+def encode_json(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+# Payload keys carried positionally by encode_msgpack; any other key goes in the trailing map
+POSITIONAL_KEYS = ("role", "event", "is_final", "text")
+
+
+def encode_msgpack(payload: Dict[str, Any]) -> bytes:
+    """Encode a transcript payload as a msgpack array.
+
+    Layout: [role, event, is_final, text] or [role, event, is_final, text, extra]
+      - role: ROLE_CODES value (unknown roles are sent as their string)
+      - event: EVENT_CODES value (unknown events are sent as their string)
+      - is_final: bool
+      - text: str or nil
+      - extra: map of every other payload key (e.g. "endpointing"), only when
+        there are any, so binary clients get the same data as JSON clients
+    """
+    role = payload.get("role") or "agent"
+    event = payload.get("event") or ""
+    frame = [
+        ROLE_CODES.get(role, role),
+        EVENT_CODES.get(event, event),
+        bool(payload.get("is_final", True)),
+        payload.get("text") or None,
+    ]
+    extra = {key: value for key, value in payload.items() if key not in POSITIONAL_KEYS}
+    if extra:
+        frame.append(extra)
+    return msgpack.packb(frame, use_bin_type=True)
+
+
+def encode(payload: Dict[str, Any], codec: str) -> str | bytes:
+    if codec == CODEC_MSGPACK:
+        return encode_msgpack(payload)
+    return encode_json(payload)
@@ -0,0 +1,529 @@
+"""
+Shared Silero VAD inference pool.
+
+By default every session's Silero VADStream owns a private single-thread
+executor and model (`VAD_EXECUTION=inline`). The pooled modes route inference
+for all sessions through one pool instead:
+
+- `thread`: a shared ThreadPoolExecutor; each session keeps its own model state.
+- `process`: worker processes, each with its own ONNX session. Audio windows
+  are written into a shared-memory slot per stream and only the small
+  (op, slot) control message crosses the pipe, so PCM is never pickled. A slot
+  is pinned to one worker, which keeps that stream's recurrent state.
+- `batch`: windows from all sessions that arrive within a short gather window
+  (bounded by VAD_BATCH_MAX_DELAY) are stacked into one ONNX call, amortising
+  the per-call overhead across sessions.
+
+Per-session latency (queue wait + inference) is tracked for diagnostics and
+exported as a histogram.
+"""
+from __future__ import annotations
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from livekit.plugins import silero
+from livekit.plugins.silero import onnx_model
+
+from ..config import Settings, get_settings
+from .loop_monitor import current_session_id
+from .metrics import VAD_BATCH_SIZE, VAD_INFERENCE_SECONDS, VAD_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger("voice-agent")
+
+# largest Silero window (16 kHz); 8 kHz uses 256 samples
+_MAX_WINDOW = 512
+
+
+class VADSessionStats:
+    __slots__ = ("count", "inference_total", "wait_total", "max_latency")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.inference_total = 0.0
+        self.wait_total = 0.0
+        self.max_latency = 0.0
+
+    def record(self, wait: float, inference: float) -> None:
+        self.count += 1
+        self.wait_total += wait
+        self.inference_total += inference
+        self.max_latency = max(self.max_latency, wait + inference)
+
+    def as_dict(self) -> Dict[str, Any]:
+        n = self.count or 1
+        return {
+            "windows": self.count,
+            "avg_inference_ms": round(self.inference_total / n * 1000, 3),
+            "avg_wait_ms": round(self.wait_total / n * 1000, 3),
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+
+class _SlotExecutor(Executor):
+    """
+    Executor handed to a Silero VADStream in place of its private thread.
+
+    VADStream calls `run_in_executor(executor, model, window)`; we ignore the
+    callable and dispatch the window to the pool slot owned by this stream.
+    """
+
+    def __init__(self, pool: "VADInferencePool", slot: int, session_id: Optional[str]) -> None:
+        self._pool = pool
+        self._slot = slot
+        self._session_id = session_id
+        self._closed = False
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return self._pool._submit(self._slot, self._session_id, args[0])
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._slot, self._session_id)
+
+
+class VADInferencePool:
+    def __init__(self, max_slots: int = 256) -> None:
+        self._max_slots = max_slots
+        self._free_slots: List[int] = list(range(max_slots - 1, -1, -1))
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, VADSessionStats] = {}
+        # stats of finished sessions, kept for a while for diagnostics
+        self._finished: "OrderedDict[str, VADSessionStats]" = OrderedDict()
+
+    mode = "pool"
+
+    def executor_for(self, model: onnx_model.OnnxModel, session_id: Optional[str]) -> Executor:
+        with self._lock:
+            if not self._free_slots:
+                raise RuntimeError("VAD pool has no free slots; raise VAD_POOL_MAX_SLOTS")
+            slot = self._free_slots.pop()
+            if session_id is not None:
+                self._sessions.setdefault(session_id, VADSessionStats())
+        self._open_slot(slot, model)
+        return _SlotExecutor(self, slot, session_id)
+
+    def _release(self, slot: int, session_id: Optional[str]) -> None:
+        self._close_slot(slot)
+        with self._lock:
+            self._free_slots.append(slot)
+            if session_id is not None and session_id in self._sessions:
+                self._finished[session_id] = self._sessions.pop(session_id)
+                while len(self._finished) > 100:
+                    self._finished.popitem(last=False)
+
+    def _record(self, session_id: Optional[str], wait: float, inference: float) -> None:
+        VAD_QUEUE_WAIT_SECONDS.labels(mode=self.mode).observe(wait)
+        VAD_INFERENCE_SECONDS.labels(mode=self.mode).observe(inference)
+        if session_id is None:
+            return
+        stats = self._sessions.get(session_id)
+        if stats is not None:
+            stats.record(wait, inference)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "slots_in_use": self._max_slots - len(self._free_slots),
+                "max_slots": self._max_slots,
+                "sessions": {sid: s.as_dict() for sid, s in self._sessions.items()},
+                "recent_finished": {sid: s.as_dict() for sid, s in self._finished.items()},
+            }
+
+    # backend hooks
+    def _open_slot(self, slot: int, model: onnx_model.OnnxModel) -> None:
+        raise NotImplementedError
+
+    def _close_slot(self, slot: int) -> None:
+        raise NotImplementedError
+
+    def _submit(self, slot: int, session_id: Optional[str], window: np.ndarray) -> Future:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ThreadVADPool(VADInferencePool):
+    mode = "thread"
+
+    def __init__(self, workers: int = 2, max_slots: int = 256) -> None:
+        super().__init__(max_slots)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vad")
+        self._models: Dict[int, onnx_model.OnnxModel] = {}
+
+    def _open_slot(self, slot: int, model: onnx_model.OnnxModel) -> None:
+        self._models[slot] = model
+
+    def _close_slot(self, slot: int) -> None:
+        self._models.pop(slot, None)
+
+    def _submit(self, slot: int, session_id: Optional[str], window: np.ndarray) -> Future:
+        model = self._models[slot]
+        submitted = time.perf_counter()
+
+        def run() -> float:
+            started = time.perf_counter()
+            p = model(window)
+            self._record(session_id, started - submitted, time.perf_counter() - started)
+            return p
+
+        return self._executor.submit(run)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _process_worker(conn: Any, shm_name: str, max_slots: int, force_cpu: bool) -> None:
+    """Worker process: owns one ONNX session and the models of its pinned slots."""
+    shm = SharedMemory(name=shm_name)
+    inputs = np.ndarray((max_slots, _MAX_WINDOW), dtype=np.float32, buffer=shm.buf)
+    outputs = np.ndarray((max_slots,), dtype=np.float32, buffer=shm.buf, offset=inputs.nbytes)
+    try:
+        session = onnx_model.new_inference_session(force_cpu)
+        models: Dict[int, onnx_model.OnnxModel] = {}
+        while True:
+            msg = conn.recv()
+            op, slot = msg[0], msg[1]
+            if op == "infer":
+                started = time.perf_counter()
+                try:
+                    model = models.get(slot)
+                    if model is None:
+                        model = models[slot] = onnx_model.OnnxModel(onnx_session=session, sample_rate=msg[2])
+                    outputs[slot] = model(inputs[slot, : model.window_size_samples])
+                    conn.send((slot, time.perf_counter() - started, None))
+                except Exception as e:
+                    conn.send((slot, time.perf_counter() - started, repr(e)))
+            elif op == "reset":
+                models.pop(slot, None)
+            elif op == "stop":
+                break
+    finally:
+        del inputs, outputs
+        shm.close()
+
+
+class _WorkerHandle:
+    def __init__(self, process: Any, conn: Any) -> None:
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.reader: Optional[threading.Thread] = None
+
+
+class ProcessVADPool(VADInferencePool):
+    mode = "process"
+
+    def __init__(self, workers: int = 2, max_slots: int = 256, force_cpu: bool = True) -> None:
+        super().__init__(max_slots)
+        self._shm = SharedMemory(create=True, size=max_slots * _MAX_WINDOW * 4 + max_slots * 4)
+        self._inputs = np.ndarray((max_slots, _MAX_WINDOW), dtype=np.float32, buffer=self._shm.buf)
+        self._outputs = np.ndarray(
+            (max_slots,), dtype=np.float32, buffer=self._shm.buf, offset=self._inputs.nbytes
+        )
+        self._sample_rates: Dict[int, int] = {}
+        # one outstanding request per slot: (future, session_id, submitted_at)
+        self._pending: Dict[int, tuple[Future, Optional[str], float]] = {}
+        self._workers: List[_WorkerHandle] = []
+        # spawn: forking a process that runs an event loop and native threads is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_process_worker,
+                args=(child, self._shm.name, max_slots, force_cpu),
+                name=f"vad-worker-{i}",
+                daemon=True,
+            )
+            proc.start()
+            handle = _WorkerHandle(proc, parent)
+            handle.reader = threading.Thread(
+                target=self._read_results, args=(handle,), name=f"vad-reader-{i}", daemon=True
+            )
+            handle.reader.start()
+            self._workers.append(handle)
+
+    def _worker(self, slot: int) -> _WorkerHandle:
+        return self._workers[slot % len(self._workers)]
+
+    def _send(self, slot: int, msg: tuple) -> None:
+        worker = self._worker(slot)
+        with worker.send_lock:
+            worker.conn.send(msg)
+
+    def _open_slot(self, slot: int, model: onnx_model.OnnxModel) -> None:
+        self._sample_rates[slot] = model.sample_rate
+
+    def _close_slot(self, slot: int) -> None:
+        self._sample_rates.pop(slot, None)
+        try:
+            self._send(slot, ("reset", slot))
+        except (OSError, EOFError):
+            pass
+
+    def _submit(self, slot: int, session_id: Optional[str], window: np.ndarray) -> Future:
+        fut: Future = Future()
+        self._inputs[slot, : len(window)] = window
+        self._pending[slot] = (fut, session_id, time.perf_counter())
+        try:
+            self._send(slot, ("infer", slot, self._sample_rates[slot]))
+        except (OSError, EOFError) as e:
+            self._pending.pop(slot, None)
+            fut.set_exception(RuntimeError(f"VAD worker unavailable: {e}"))
+        return fut
+
+    def _read_results(self, worker: _WorkerHandle) -> None:
+        while True:
+            try:
+                slot, inference, error = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            entry = self._pending.pop(slot, None)
+            if entry is None:
+                continue
+            fut, session_id, submitted = entry
+            if error is not None:
+                fut.set_exception(RuntimeError(f"VAD inference failed: {error}"))
+                continue
+            total = time.perf_counter() - submitted
+            self._record(session_id, max(0.0, total - inference), inference)
+            fut.set_result(float(self._outputs[slot]))
+        # worker died: fail whatever it still owed so streams don't hang
+        for slot, (fut, _, _) in list(self._pending.items()):
+            if self._worker(slot) is worker and not fut.done():
+                self._pending.pop(slot, None)
+                fut.set_exception(RuntimeError("VAD worker exited"))
+
+    def close(self) -> None:
+        for worker in self._workers:
+            try:
+                worker.conn.send(("stop", -1))
+            except (OSError, EOFError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=2)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        del self._inputs, self._outputs
+        self._shm.close()
+        self._shm.unlink()
+
+
+class _BatchSlot:
+    """Per-stream model state for batched inference (mirrors silero's OnnxModel)."""
+
+    __slots__ = ("sample_rate", "window", "context", "rnn_state")
+
+    def __init__(self, model: onnx_model.OnnxModel) -> None:
+        self.sample_rate = model.sample_rate
+        self.window = model.window_size_samples
+        self.context = np.zeros((model.context_size,), dtype=np.float32)
+        # OnnxModel feeds a constant zero state (it never writes stateN back), so we
+        # do the same to keep batched probabilities identical to the other modes
+        self.rnn_state = np.zeros((2, 128), dtype=np.float32)
+
+
+class _BatchItem:
+    __slots__ = ("slot", "session_id", "window", "future", "submitted")
+
+    def __init__(self, slot: int, session_id: Optional[str], window: np.ndarray) -> None:
+        self.slot = slot
+        self.session_id = session_id
+        # the stream reuses its buffer only after our result, but copy to stay safe
+        self.window = window.copy()
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+
+
+class BatchedVADPool(VADInferencePool):
+    """
+    Cross-session batched inference.
+
+    Worker threads take whatever windows are queued, waiting at most
+    `max_delay` after the oldest one for more to arrive (or until `max_batch`
+    are queued), then run them as a single ONNX call and route each
+    probability back to its stream. While one thread runs a batch the next
+    batch accumulates, so under load batches fill without waiting.
+    """
+
+    mode = "batch"
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_slots: int = 256,
+        max_batch: int = 32,
+        max_delay: float = 0.004,
+        force_cpu: bool = True,
+    ) -> None:
+        super().__init__(max_slots)
+        self._session = onnx_model.new_inference_session(force_cpu)
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._slots: Dict[int, _BatchSlot] = {}
+        self._queue: List[_BatchItem] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"vad-batch-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _open_slot(self, slot: int, model: onnx_model.OnnxModel) -> None:
+        self._slots[slot] = _BatchSlot(model)
+
+    def _close_slot(self, slot: int) -> None:
+        self._slots.pop(slot, None)
+
+    def _submit(self, slot: int, session_id: Optional[str], window: np.ndarray) -> Future:
+        item = _BatchItem(slot, session_id, window)
+        with self._cond:
+            self._queue.append(item)
+            if len(self._queue) == 1 or len(self._queue) >= self._max_batch:
+                self._cond.notify()
+        return item.future
+
+    def _take_batch(self) -> Optional[List[_BatchItem]]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            deadline = self._queue[0].submitted + self._max_delay
+            while len(self._queue) < self._max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+            batch, self._queue = self._queue[: self._max_batch], self._queue[self._max_batch :]
+            if self._queue:
+                self._cond.notify()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            # windows differ in size per sample rate; run one call per rate
+            by_rate: Dict[int, List[tuple[_BatchItem, _BatchSlot]]] = {}
+            for item in batch:
+                state = self._slots.get(item.slot)
+                if state is None:
+                    item.future.set_exception(RuntimeError("VAD slot released"))
+                    continue
+                by_rate.setdefault(state.sample_rate, []).append((item, state))
+            for sample_rate, group in by_rate.items():
+                self._infer(sample_rate, group)
+
+    def _infer(self, sample_rate: int, group: List[tuple[_BatchItem, _BatchSlot]]) -> None:
+        started = time.perf_counter()
+        n = len(group)
+        ctx = group[0][1].context.shape[0]
+        window = group[0][1].window
+        inputs = np.empty((n, ctx + window), dtype=np.float32)
+        states = np.empty((2, n, 128), dtype=np.float32)
+        for i, (item, state) in enumerate(group):
+            inputs[i, :ctx] = state.context
+            inputs[i, ctx:] = item.window[:window]
+            states[:, i, :] = state.rnn_state
+        try:
+            out, _ = self._session.run(
+                None, {"input": inputs, "state": states, "sr": np.array(sample_rate, dtype=np.int64)}
+            )
+        except Exception as e:
+            for item, _ in group:
+                item.future.set_exception(e)
+            return
+        inference = time.perf_counter() - started
+        VAD_BATCH_SIZE.observe(n)
+        for i, (item, state) in enumerate(group):
+            state.context = inputs[i, -ctx:].copy()
+            self._record(item.session_id, started - item.submitted, inference)
+            item.future.set_result(float(out[i, 0]))
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            pending, self._queue = self._queue, []
+            self._cond.notify_all()
+        for item in pending:
+            item.future.set_exception(RuntimeError("VAD pool closed"))
+
+
+class PooledSileroVAD(silero.VAD):
+    """Silero VAD whose streams run inference on a shared VADInferencePool."""
+
+    _pool: VADInferencePool
+
+    def stream(self) -> silero.VADStream:
+        stream = super().stream()
+        # swap the stream's private single-thread executor for a pool slot
+        # (relies on VADStream._executor/_model, pinned via livekit-plugins-silero)
+        stream._executor.shutdown(wait=False)
+        stream._executor = self._pool.executor_for(stream._model, current_session_id.get())
+        return stream
+
+
+_pool: Optional[VADInferencePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_vad_pool(settings: Settings | None = None) -> Optional[VADInferencePool]:
+    """Process-wide pool for the configured VAD_EXECUTION mode (None for inline)."""
+    global _pool
+    settings = settings or get_settings()
+    mode = settings.vad_execution.lower()
+    if mode == "inline":
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if mode == "process":
+                _pool = ProcessVADPool(settings.vad_pool_workers, settings.vad_pool_max_slots)
+            elif mode == "thread":
+                _pool = ThreadVADPool(settings.vad_pool_workers, settings.vad_pool_max_slots)
+            elif mode == "batch":
+                _pool = BatchedVADPool(
+                    settings.vad_pool_workers,
+                    settings.vad_pool_max_slots,
+                    max_batch=settings.vad_batch_max_size,
+                    max_delay=settings.vad_batch_max_delay_ms / 1000,
+                )
+            else:
+                raise ValueError(f"Unknown VAD_EXECUTION mode: {settings.vad_execution}")
+            logger.info("VAD inference pool started (mode=%s, workers=%s)", mode, settings.vad_pool_workers)
+        return _pool
+
+
+def close_vad_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def load_vad(settings: Settings | None = None) -> silero.VAD:
+    settings = settings or get_settings()
+    kwargs = dict(
+        min_speech_duration=settings.vad_min_speech_duration,
+        min_silence_duration=settings.vad_min_silence_duration,
+        padding_duration=settings.vad_padding_duration,
+    )
+    pool = get_vad_pool(settings)
+    if pool is None:
+        return silero.VAD.load(**kwargs)
+    vad = PooledSileroVAD.load(**kwargs)
+    vad._pool = pool
+    return vad
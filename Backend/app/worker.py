@@ -0,0 +1,119 @@
+"""
+Agent worker for SESSION_DISPATCH=worker.
+
+Runs agent sessions as LiveKit Agents jobs instead of inside the API process,
+so API nodes and CPU-heavy agent nodes scale independently:
+
+    cd Backend
+    python -m app.worker start
+
+The worker registers under AGENT_NAME and only receives jobs explicitly
+dispatched by POST /session. It reports its load to LiveKit and stops taking
+jobs above WORKER_LOAD_THRESHOLD; each job runs in its own process. Transcripts
+reach the API's websockets through the transcript bus and stop requests arrive
+through the session directory, so TRANSCRIPT_BUS=redis and SESSION_DIRECTORY=redis
+(or sqlite on a single host) are required when the API runs elsewhere.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+
+import psutil
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli
+
+from .config import get_settings
+from .agent import AgentManager
+from .utils.providers import import_providers, prewarm
+from .utils.pubsub import create_transcript_bus
+from .utils.session_directory import create_session_directory
+from .utils.snapshots import create_snapshot_store
+
+logger = logging.getLogger("voice-agent")
+
+
+def _worker_load(worker) -> float:
+    """Worker load for job acceptance: the worse of host CPU and job slots (MAX_SESSIONS)."""
+    settings = get_settings()
+    # host-wide: job processes are children of the worker, not the worker itself
+    load = psutil.cpu_percent(interval=None) / 100.0
+    if settings.max_sessions > 0:
+        load = max(load, len(worker.active_jobs) / settings.max_sessions)
+    return load
+
+
+def _prewarm(proc: JobProcess) -> None:
+    # runs once per job process before it accepts a job: the first call does not pay for imports/model load
+    prewarm(get_settings())
+
+
+async def entrypoint(ctx: JobContext) -> None:
+    settings = get_settings()
+    job = json.loads(ctx.job.metadata or "{}")
+
+    transcript_bus = create_transcript_bus(settings)
+    await transcript_bus.start()
+    manager = AgentManager()
+    manager.set_transcript_broadcaster(transcript_bus.publish)
+    # the job process owns the session: API nodes forward DELETE /session here
+    session_directory = create_session_directory(settings)
+    await session_directory.start()
+    manager.set_session_directory(session_directory)
+    snapshot_store = create_snapshot_store(settings, session_directory.node_id)
+    resume = None
+    if snapshot_store is not None:
+        manager.set_snapshot_store(snapshot_store)
+        if job.get("session_id"):
+            # a job re-dispatched after its worker died resumes from the last snapshot
+            resume = await snapshot_store.claim(job["session_id"])
+
+    session_id = await manager.start_session(
+        room_name=ctx.room.name,
+        instructions=job.get("instructions") or settings.system_prompt,
+        user_id=job.get("user_id"),
+        user_preferences=job.get("user_preferences"),
+        session_id=job.get("session_id"),
+        room=ctx.room,
+        connect=ctx.connect,
+        resume=resume,
+    )
+    logger.info(f"Job {ctx.job.id} running session {session_id}")
+    snapshot_task = None
+    if snapshot_store is not None:
+        snapshot_task = asyncio.create_task(
+            manager.run_snapshots(settings.snapshot_interval, recover=False, max_age=settings.snapshot_max_age)
+        )
+
+    async def _on_shutdown(reason: str) -> None:
+        if snapshot_task is not None:
+            snapshot_task.cancel()
+        await manager.stop_session(session_id)
+        await session_directory.close()
+        await transcript_bus.close()
+
+    ctx.add_shutdown_callback(_on_shutdown)
+    await manager.wait_session(session_id)
+
+
+def main() -> None:
+    settings = get_settings()
+    # plugins must be registered in the worker's main process too (e.g. for `download-files`)
+    import_providers(settings)
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=_prewarm,
+            agent_name=settings.agent_name,
+            load_fnc=_worker_load,
+            load_threshold=settings.worker_load_threshold,
+            # SIGTERM: stop taking jobs, let running ones finish up to the deadline
+            drain_timeout=int(settings.drain_timeout),
+            ws_url=settings.livekit_url,
+            api_key=settings.livekit_api_key,
+            api_secret=settings.livekit_api_secret,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+from app.utils import loop_monitor
+from app.utils.metrics import LOOP_LAG_HIST
+
+
+def test_lag_sampler_reports_a_blocked_loop(monkeypatch):
+    # the sampler that runs when the watchdog is disabled still feeds /ready and /metrics
+    monkeypatch.setattr(loop_monitor, "_sampler", None)
+    observed = LOOP_LAG_HIST._sum.get()
+
+    async def run():
+        sampler = loop_monitor.start_loop_lag_sampler(tick=0.02)
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        await sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(run())
+    assert loop_monitor.get_loop_watchdog() is None
+    assert loop_monitor.get_loop_lag_sampler() is sampler
+    assert loop_monitor.recent_loop_lag() >= 0.15
+    assert LOOP_LAG_HIST._sum.get() - observed >= 0.15
@@ -0,0 +1,101 @@
+import asyncio
+
+import fakeredis
+from fakeredis.aioredis import FakeRedis
+
+from app.utils.pubsub import RedisTranscriptBus
+
+
+class _Inbox:
+    """Deliver callback that collects (session_id, payload) pairs."""
+
+    def __init__(self) -> None:
+        self.items = []
+        self._arrived = asyncio.Event()
+
+    async def __call__(self, session_id: str, payload: dict) -> None:
+        self.items.append((session_id, payload))
+        self._arrived.set()
+
+    async def wait(self, count: int, timeout: float = 5.0) -> None:
+        async def _until():
+            while len(self.items) < count:
+                self._arrived.clear()
+                await self._arrived.wait()
+
+        await asyncio.wait_for(_until(), timeout)
+
+
+async def _bus(server: fakeredis.FakeServer) -> tuple[RedisTranscriptBus, _Inbox]:
+    # one client per bus on a shared server, as two workers connecting to one Redis
+    bus = RedisTranscriptBus("redis://stand-in", client=FakeRedis(server=server))
+    inbox = _Inbox()
+    bus.set_deliver(inbox)
+    await bus.start()
+    return bus, inbox
+
+
+def test_delivers_across_instances():
+    async def run():
+        server = fakeredis.FakeServer()
+        agent, agent_inbox = await _bus(server)
+        api, api_inbox = await _bus(server)
+        try:
+            await api.subscribe("s1")
+            await agent.publish("s1", {"role": "user", "text": "hello"})
+            await agent.publish("s2", {"role": "user", "text": "not subscribed"})
+            await api_inbox.wait(1)
+            await asyncio.sleep(0.2)
+            assert api_inbox.items == [("s1", {"role": "user", "text": "hello"})]
+            # publishing does not deliver locally: only subscribers receive
+            assert agent_inbox.items == []
+        finally:
+            await agent.close()
+            await api.close()
+
+    asyncio.run(run())
+
+
+def test_subscriptions_are_reference_counted():
+    async def run():
+        server = fakeredis.FakeServer()
+        publisher, _ = await _bus(server)
+        bus, inbox = await _bus(server)
+        try:
+            await bus.subscribe("s1")
+            await bus.subscribe("s1")
+            assert list(bus._pubsub.channels) == [b"transcript:s1"]
+
+            # one socket of two left: the channel stays subscribed
+            await bus.unsubscribe("s1")
+            await publisher.publish("s1", {"text": "still here"})
+            await inbox.wait(1)
+
+            await bus.unsubscribe("s1")
+            assert b"transcript:s1" in bus._pubsub.pending_unsubscribe_channels
+            await publisher.publish("s1", {"text": "gone"})
+            await asyncio.sleep(0.3)
+            assert [payload["text"] for _, payload in inbox.items] == ["still here"]
+
+            # unsubscribing a session with no subscribers is a no-op
+            await bus.unsubscribe("s1")
+            assert bus._subs == {}
+        finally:
+            await publisher.close()
+            await bus.close()
+
+    asyncio.run(run())
+
+
+def test_close_stops_the_reader():
+    async def run():
+        bus, _ = await _bus(fakeredis.FakeServer())
+        await bus.subscribe("s1")
+        reader = bus._reader
+        await asyncio.sleep(0.1)
+        assert not reader.done()
+        await asyncio.wait_for(bus.close(), 5.0)
+        assert reader.done()
+        assert bus._reader is None and bus._pubsub is None
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import numpy as np
+from livekit import rtc
+
+from app.utils.recorder import SessionRecorder
+
+
+def _frame(sample_rate: int = 24000, samples: int = 480) -> rtc.AudioFrame:
+    data = (np.sin(np.arange(samples) / 8.0) * 8000).astype(np.int16).tobytes()
+    return rtc.AudioFrame(data, sample_rate, 1, samples)
+
+
+def _start(recorder: SessionRecorder) -> None:
+    # attach() without an AgentSession: just the encoder thread
+    recorder._thread = threading.Thread(target=recorder._encode_thread, daemon=True)
+    recorder._thread.start()
+
+
+def _close(recorder: SessionRecorder, timeout: float = 10.0) -> dict:
+    # on a daemon thread, so a hung aclose() fails the test instead of blocking the run
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(asyncio.run(recorder.aclose())), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "aclose() did not return"
+    return result
+
+
+def test_records_and_closes(tmp_path):
+    recorder = SessionRecorder("s-ok", str(tmp_path / "s-ok.ogg"))
+    _start(recorder)
+    for _ in range(100):
+        recorder._tee_user(_frame())
+    stats = _close(recorder)
+    assert not stats["failed"]
+    assert stats["duration_seconds"] > 1.5
+    assert stats["bytes"] > 0
+
+
+def test_failed_final_flush_does_not_hang_aclose(tmp_path, monkeypatch):
+    recorder = SessionRecorder("s-fail", str(tmp_path / "s-fail.ogg"))
+    drain = recorder._drain
+
+    def failing_drain(container, stream, final):
+        if final:
+            raise RuntimeError("encoder flush failed")
+        drain(container, stream, final)
+
+    monkeypatch.setattr(recorder, "_drain", failing_drain)
+    _start(recorder)
+    for _ in range(10):
+        recorder._tee_user(_frame())
+    # the sentinel has been consumed when the flush raises: aclose() must still return
+    stats = _close(recorder)
+    assert stats["failed"]
@@ -0,0 +1,104 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.utils.session_directory import RedisSessionDirectory, SQLiteSessionDirectory
+
+# short intervals so heartbeats, mailboxes and expiry play out within a test
+TIMINGS = {"heartbeat_interval": 0.1, "ttl": 0.5, "poll_interval": 0.05}
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_directory(request, tmp_path):
+    """Factory of directories for different nodes sharing one backend (a file, or one fake server)."""
+    server = fakeredis.FakeServer()
+
+    def make(node_id):
+        if request.param == "sqlite":
+            return SQLiteSessionDirectory(str(tmp_path / "sessions.db"), node_id, **TIMINGS)
+        return RedisSessionDirectory("redis://stand-in", node_id, client=FakeRedis(server=server), **TIMINGS)
+
+    return make
+
+
+async def _crash(directory):
+    # stop heartbeating and polling without the cleanup close() does
+    directory._task.cancel()
+    try:
+        await directory._task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_stop_is_forwarded_to_owner(make_directory):
+    async def run():
+        owner, other = make_directory("owner"), make_directory("other")
+        stopped = []
+
+        async def stop(session_id):
+            stopped.append(session_id)
+            return True
+
+        owner.set_stop_handler(stop)
+        await owner.start()
+        await other.start()
+        try:
+            await owner.register("s1", "room-1")
+            entry = await other.lookup("s1")
+            assert entry["node_id"] == "owner" and entry["room"] == "room-1"
+
+            assert await other.request_stop("s1", timeout=5.0)
+            assert stopped == ["s1"]
+            assert await other.lookup("s1") is None
+            # nobody owns it any more
+            assert not await other.request_stop("s1")
+        finally:
+            await owner.close()
+            await other.close()
+
+    asyncio.run(run())
+
+
+def test_dead_owner_expires(make_directory):
+    async def run():
+        owner, other = make_directory("owner"), make_directory("other")
+        await owner.start()
+        await other.start()
+        try:
+            await owner.register("s1", "room-1")
+            await _crash(owner)
+            assert (await other.lookup("s1"))["node_id"] == "owner"
+
+            await asyncio.sleep(TIMINGS["ttl"] * 2)
+            assert await other.lookup("s1") is None
+            assert not await other.request_stop("s1")
+        finally:
+            await other.close()
+
+    asyncio.run(run())
+
+
+def test_close_drops_the_node(make_directory):
+    async def run():
+        owner, other = make_directory("owner"), make_directory("other")
+        await owner.start()
+        await other.start()
+        try:
+            await owner.register("s1", "room-1")
+            await owner.register("s2", "room-2")
+            await _crash(owner)
+            # a stop request left in the mailbox
+            await other._push_stop("owner", "s1")
+
+            await owner._drop_node()
+            assert await other._get_session("s1") is None
+            assert await other._get_session("s2") is None
+            assert not await other._node_alive("owner")
+            # a process restarting under the same node id finds an empty mailbox
+            assert await make_directory("owner")._pop_stops() == []
+        finally:
+            await other.close()
+
+    asyncio.run(run())
@@ -96,7 +96,27 @@ REST_FRAMEWORK = {
 
 ALLOW_INGEST_TOKEN = os.getenv("ALLOW_INGEST_TOKEN", "super-secret-token")
 
+# Cache (Django cache framework): local memory by default; set CACHE_BACKEND/CACHE_LOCATION for a shared one,
+# e.g. django.core.cache.backends.redis.RedisCache with redis://127.0.0.1:6379/1
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# Seconds a cached user context (validate-session / profile payload) is kept; edits invalidate it sooner
+USER_CONTEXT_CACHE_TTL = int(os.getenv("USER_CONTEXT_CACHE_TTL", "300"))
+
+# Transcript archive (conversation/archive.py): sessions that started more than ARCHIVE_RETENTION_DAYS ago are
+# moved to gzip files under ARCHIVE_DIR by `manage.py archive_sessions`; reads keep ARCHIVE_CACHE_SESSIONS
+# decompressed transcripts in memory (per process)
+ARCHIVE_DIR = BASE_DIR / os.getenv("ARCHIVE_DIR", "archive")  # relative to this project directory unless absolute
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+ARCHIVE_CACHE_SESSIONS = int(os.getenv("ARCHIVE_CACHE_SESSIONS", "32"))
+
 # Session Configuration
+# django.contrib.sessions.backends.cached_db serves session reads from the cache above (writes still go to the DB)
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.db")
 SESSION_COOKIE_AGE = int(os.getenv("SESSION_COOKIE_AGE", "1209600"))  # 14 days
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access
 SESSION_COOKIE_SECURE = not DEBUG  # HTTPS only in production
@@ -1,6 +1,11 @@
+import uuid
+
 from django.contrib import admin
+from django.contrib.admin.utils import unquote
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserPreferences, Session, Utterance
+from .models import User, UserPreferences, Session, TranscriptSegment, Utterance
+from .search import filter_utterances, has_terms
+from . import user_context
 
 
 @admin.register(User)
@@ -31,6 +36,16 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        user_context.invalidate(obj.pk)
+
+    def user_change_password(self, request, id, form_url=""):
+        response = super().user_change_password(request, id, form_url)
+        if request.method == "POST":
+            user_context.invalidate(unquote(id))
+        return response
+
 
 @admin.register(UserPreferences)
 class UserPreferencesAdmin(admin.ModelAdmin):
@@ -52,16 +67,49 @@ class UserPreferencesAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        user_context.invalidate(obj.user_id)
+
 
 @admin.register(Session)
 class SessionAdmin(admin.ModelAdmin):
-    list_display = ("id", "room", "user_id", "started_at", "ended_at")
+    list_display = ("id", "room", "user_id", "started_at", "ended_at", "utterance_count", "last_activity_at", "storage")
+    list_filter = ("storage",)
     search_fields = ("id", "room", "user_id")
-    readonly_fields = ("started_at",)
+    readonly_fields = (
+        "started_at", "utterance_count", "final_count", "last_message", "last_activity_at", "duration_seconds",
+        "storage", "archive_file", "archive_offset", "archive_length",
+    )
 
 
 @admin.register(Utterance)
 class UtteranceAdmin(admin.ModelAdmin):
     list_display = ("id", "session", "role", "is_final", "created_at", "event")
-    search_fields = ("session__id", "text")
-    readonly_fields = ("created_at",)
+    search_fields = ("session__id",)
+    search_help_text = "Session id, or words from the utterance text (full-text index)"
+    readonly_fields = ("created_at", "fingerprint", "occurrence")
+
+    def get_search_results(self, request, queryset, search_term):
+        # a session id matches exactly; anything else goes through the full-text index instead of LIKE
+        try:
+            return queryset.filter(session_id=uuid.UUID(search_term.strip())), False
+        except ValueError:
+            pass
+        if not has_terms(search_term):
+            return queryset, False
+        return filter_utterances(queryset, search_term), False
+
+
+@admin.register(TranscriptSegment)
+class TranscriptSegmentAdmin(admin.ModelAdmin):
+    """Packed transcript segments are written by pack_transcripts only."""
+    list_display = ("session", "index", "count", "first_seq", "last_seq", "first_at", "last_at", "codec")
+    search_fields = ("session__id",)
+    exclude = ("data",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
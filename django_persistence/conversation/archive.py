@@ -0,0 +1,133 @@
+"""
+Cold tier: archived transcripts on local disk.
+
+`archive_sessions` moves the transcripts of sessions older than the
+retention threshold out of the database into append-only files under
+settings.ARCHIVE_DIR. Each run writes one `sessions-<timestamp>.jsonl.gz`
+file: one gzip member per session, holding a session line followed by the
+session's utterances as JSON lines (the segment encoding), so `zcat` reads
+a whole file as plain JSONL. The Session row stays as a stub (metadata,
+owner and summary, so history lists are unchanged) with the member's file,
+offset and length; its utterance rows and segments are deleted and its
+utterances keep search entries (search.py), so archived sessions stay
+searchable.
+
+Reads (`load`) seek straight to the member and keep the most recently used
+ones decompressed in an LRU cache of settings.ARCHIVE_CACHE_SESSIONS
+entries. `restore_session` brings a transcript back into utterance rows.
+Archive files are never rewritten; deleting a session leaves its member in
+place.
+"""
+import gzip
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Session, Utterance
+from . import search, segments
+
+GZIP_LEVEL = 9
+
+
+def _root() -> Path:
+    return Path(settings.ARCHIVE_DIR)
+
+
+def _session_line(session: Session) -> bytes:
+    record = {
+        "id": session.id.hex,
+        "room": session.room,
+        "user_id": session.user_id,
+        "user_account_id": session.user_account_id,
+        "started_at": session.started_at.isoformat() if session.started_at else None,
+        "ended_at": session.ended_at.isoformat() if session.ended_at else None,
+    }
+    return json.dumps({"session": record}, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def archive_sessions(sessions: Iterable[Session]) -> Tuple[str, int, int]:
+    """
+    Archive the transcripts of `sessions` (rows or packed) into one new file.
+    Pass them with utterances and segments prefetched to read them in a few queries.
+
+    The file is written and fsynced before the database changes, and each
+    session is switched to its stub in its own transaction under a row lock.
+    Returns (file name, sessions archived, utterances archived).
+    """
+    root = _root()
+    root.mkdir(parents=True, exist_ok=True)
+    name = f"sessions-{timezone.now():%Y%m%dT%H%M%S%f}.jsonl.gz"
+    members = []
+    with open(root / name, "wb") as archive_file:
+        for session in sessions:
+            utterances = segments.transcript(session)
+            raw = _session_line(session)
+            if utterances:
+                raw += b"\n" + segments.encode(utterances)
+            member = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+            rows = len(session.utterances.all())
+            members.append((session, rows, archive_file.tell(), len(member), utterances))
+            archive_file.write(member)
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+
+    archived = utterance_count = 0
+    for session, rows, offset, length, utterances in members:
+        with transaction.atomic():
+            current = Session.objects.select_for_update().get(pk=session.pk)
+            # skipped if it changed meanwhile (packed, archived, late rows); its member is simply never read
+            if current.storage != session.storage or current.utterances.count() != rows:
+                continue
+            current.utterances.all().delete()
+            current.segments.all().delete()
+            # entries index the member's utterances (a packed session's late rows included)
+            search.remove_entries(current)
+            search.add_entries(current, utterances)
+            current.storage = Session.STORAGE_ARCHIVE
+            current.archive_file = name
+            current.archive_offset = offset
+            current.archive_length = length
+            current.save(update_fields=["storage", "archive_file", "archive_offset", "archive_length"])
+        archived += 1
+        utterance_count += len(utterances)
+    if not archived:
+        (root / name).unlink()
+    return name, archived, utterance_count
+
+
+@lru_cache(maxsize=settings.ARCHIVE_CACHE_SESSIONS)
+def _read(name: str, offset: int, length: int) -> bytes:
+    with open(_root() / name, "rb") as archive_file:
+        archive_file.seek(offset)
+        member = archive_file.read(length)
+    raw = gzip.decompress(member)
+    # drop the session line; the rest is the segment encoding of the utterances
+    _, _, utterances = raw.partition(b"\n")
+    return utterances
+
+
+def load(session: Session) -> List[Utterance]:
+    """An archived session's utterances in history order (instances not backed by rows)."""
+    return segments.decode(_read(session.archive_file, session.archive_offset, session.archive_length), session)
+
+
+def restore_session(session: Session) -> int:
+    """Move an archived transcript back into utterance rows; returns how many."""
+    with transaction.atomic():
+        session = Session.objects.select_for_update().get(pk=session.pk)
+        if session.storage != Session.STORAGE_ARCHIVE:
+            return 0
+        utterances = load(session)
+        segments.insert_rows(utterances)
+        search.remove_entries(session)
+        session.storage = Session.STORAGE_ROWS
+        session.archive_file = ""
+        session.archive_offset = session.archive_length = None
+        session.save(update_fields=["storage", "archive_file", "archive_offset", "archive_length"])
+    return len(utterances)
@@ -0,0 +1,32 @@
+"""
+Content fingerprints for final conversation turns.
+
+A turn is identified within its session by (fingerprint, occurrence): the
+hash of its role and normalized text, and how many earlier turns of the
+session share that hash. Ingest and sessions/save number occurrences
+independently (ingest in seq order, save in message order), so the same
+turn delivered by both paths gets the same key and the
+(session, fingerprint, occurrence) unique constraint lets the database drop
+the second copy, while a phrase repeated later in the conversation is a
+new occurrence and is kept.
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Optional
+
+# length of Utterance.fingerprint (hex SHA-1)
+FINGERPRINT_LENGTH = 40
+
+
+def normalize_text(text: str) -> str:
+    """Case-, width- and whitespace-insensitive form of a transcript line."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+
+def fingerprint(role: str, text: str) -> Optional[str]:
+    """Fingerprint of a turn, or None when it has no text to identify it by."""
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    return hashlib.sha1(f"{role}\x1f{normalized}".encode()).hexdigest()
@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from conversation.archive import archive_sessions, restore_session
+from conversation.models import Session
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the transcripts of ended sessions older than the retention threshold into gzip JSONL files "
+        "under ARCHIVE_DIR, leaving the session row as a stub; or restore archived sessions to utterance rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=float,
+            default=settings.ARCHIVE_RETENTION_DAYS,
+            help=f"Only sessions started at least this many days ago (default: ARCHIVE_RETENTION_DAYS, "
+                 f"{settings.ARCHIVE_RETENTION_DAYS:g})",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Sessions per archive file (default: 500)")
+        parser.add_argument("--limit", type=int, default=None, help="At most this many sessions per run")
+        parser.add_argument("--session", action="append", default=[], help="Only this session id (repeatable)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+        parser.add_argument("--restore", action="store_true", help="Restore archived sessions to utterance rows")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep running, archiving every this many seconds (instead of once, e.g. from cron)",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options["restore"] and options["interval"]:
+            raise CommandError("--restore runs once")
+        while True:
+            self._run(options)
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def _run(self, options):
+        if options["restore"]:
+            sessions = Session.objects.filter(storage=Session.STORAGE_ARCHIVE)
+        else:
+            cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+            sessions = Session.objects.filter(
+                storage__in=[Session.STORAGE_ROWS, Session.STORAGE_SEGMENTS],
+                ended_at__isnull=False,
+                started_at__lte=cutoff,
+            )
+        if options["session"]:
+            sessions = sessions.filter(id__in=options["session"])
+        ids = list(sessions.order_by("started_at", "id").values_list("id", flat=True)[: options["limit"]])
+
+        if options["dry_run"]:
+            verb = "restore" if options["restore"] else "archive"
+            self.stdout.write(f"Would {verb} {len(ids)} sessions")
+            return
+
+        if options["restore"]:
+            utterances = 0
+            for session_id in ids:
+                count = restore_session(Session(pk=session_id))
+                utterances += count
+                self.stdout.write(f"{session_id}: {count} utterances")
+            self.stdout.write(self.style.SUCCESS(f"Restored {utterances} utterances in {len(ids)} sessions"))
+            return
+
+        done = utterances = 0
+        for start in range(0, len(ids), options["batch_size"]):
+            batch = (
+                Session.objects.filter(id__in=ids[start:start + options["batch_size"]])
+                .order_by("started_at", "id")
+                .prefetch_related("utterances", "segments")
+            )
+            name, archived, count = archive_sessions(batch)
+            done += archived
+            utterances += count
+            if archived:
+                self.stdout.write(f"{name}: {archived} sessions, {count} utterances")
+        self.stdout.write(self.style.SUCCESS(f"Archived {utterances} utterances in {done} sessions"))
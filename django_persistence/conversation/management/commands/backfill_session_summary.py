@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from conversation.models import Session
+from conversation.summary import recompute
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized session summary (utterance_count, final_count, last_message, "
+        "last_activity_at, duration_seconds) from the utterance table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Sessions per transaction (default: 500)")
+        parser.add_argument(
+            "--only-empty",
+            action="store_true",
+            help="Only sessions whose summary was never filled (utterance_count = 0)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        sessions = Session.objects.all()
+        if options["only_empty"]:
+            sessions = sessions.filter(utterance_count=0)
+
+        # walk primary keys in slices so each transaction (and its locks) stays short
+        total = sessions.count()
+        updated = 0
+        last_pk = None
+        while True:
+            page = sessions.order_by("pk")
+            if last_pk is not None:
+                page = page.filter(pk__gt=last_pk)
+            ids = list(page.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += recompute(Session.objects.filter(pk__in=ids), batch_size)
+            last_pk = ids[-1]
+            self.stdout.write(f"{updated}/{total} sessions")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled summary of {updated} sessions"))
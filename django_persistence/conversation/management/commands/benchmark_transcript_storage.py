@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from conversation.fingerprint import fingerprint
+from conversation.models import Session, TranscriptSearchEntry, TranscriptSegment, Utterance
+from conversation.search import ENTRY_FTS_TABLE, FTS_TABLE
+from conversation.segments import DEFAULT_CODEC, SEGMENT_SIZE, pack_session
+from conversation.serializers import SessionHistoryDetailSerializer
+
+WORDS = (
+    "i would like to fly from paris to tokyo next week can you find a hotel near the station "
+    "what is the weather like in march sure let me check that for you the cheapest flight leaves at nine"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the row-per-utterance and packed-segment transcript layouts on synthetic sessions: "
+        "table size, index size and detail-view read time. Runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=20, help="Synthetic sessions (default: 20)")
+        parser.add_argument("--utterances", type=int, default=500, help="Utterances per session (default: 500)")
+        parser.add_argument(
+            "--segment-size", type=int, default=SEGMENT_SIZE, help=f"Utterances per segment (default: {SEGMENT_SIZE})"
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Detail reads per session and layout (default: 5)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            before = self._sizes()
+            ids = self._seed(options["sessions"], options["utterances"])
+            rows = self._sizes()
+            rows_read = self._read_ms(ids, options["repeat"])
+            for session_id in ids:
+                pack_session(Session(pk=session_id), options["segment_size"])
+            packed = self._sizes()
+            packed_read = self._read_ms(ids, options["repeat"])
+            transaction.set_rollback(True)
+
+        total = options["sessions"] * options["utterances"]
+        self.stdout.write(
+            f"{options['sessions']} sessions x {options['utterances']} utterances ({total} rows), "
+            f"segments of {options['segment_size']} ({DEFAULT_CODEC}), {connection.vendor}"
+        )
+        self.stdout.write(f"{'layout':<10}{'table KiB':>12}{'index KiB':>12}{'search KiB':>12}{'detail ms':>12}")
+        for name, sizes, read in (("rows", rows, rows_read), ("segments", packed, packed_read)):
+            delta = [(after - start) / 1024 for after, start in zip(sizes, before)]
+            self.stdout.write(f"{name:<10}{delta[0]:>12.1f}{delta[1]:>12.1f}{delta[2]:>12.1f}{read:>12.2f}")
+
+    def _seed(self, sessions: int, per_session: int):
+        rng = random.Random(0)
+        start = timezone.now() - timedelta(days=30)
+        ids = []
+        for _ in range(sessions):
+            session = Session.objects.create(room="benchmark", ended_at=start)
+            ids.append(session.id)
+            utterances = []
+            for seq in range(per_session):
+                # a voice call: partial transcripts, then the final turn, then an event
+                kind = seq % 5
+                role = "user" if (seq // 5) % 2 == 0 else "agent"
+                text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+                if kind == 4:
+                    role, text = "event", ""
+                u = Utterance(
+                    session=session,
+                    seq=seq,
+                    role=role,
+                    text=text,
+                    event="speech_stopped" if role == "event" else "",
+                    is_final=kind == 3 or role == "event",
+                    source_ts=start + timedelta(seconds=seq),
+                )
+                if u.is_final and role != "event":
+                    u.fingerprint = fingerprint(role, text)
+                    u.occurrence = 0
+                utterances.append(u)
+            Utterance.objects.bulk_create(utterances, batch_size=500)
+        return ids
+
+    def _read_ms(self, ids, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            for session_id in ids:
+                began = time.perf_counter()
+                session = Session.objects.prefetch_related("utterances").get(pk=session_id)
+                SessionHistoryDetailSerializer(session).data
+                timings.append((time.perf_counter() - began) * 1000)
+        return statistics.median(timings)
+
+    def _sizes(self):
+        """Bytes of (tables, btree indexes, full-text index) of both layouts (search entries included)."""
+        tables = [Utterance._meta.db_table, TranscriptSegment._meta.db_table, TranscriptSearchEntry._meta.db_table]
+        fts = (FTS_TABLE, ENTRY_FTS_TABLE)
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE tbl_name IN (%s, %s, %s)) "
+                    "OR name LIKE %s OR name LIKE %s GROUP BY name",
+                    [*tables, *(f"{name}%" for name in fts)],
+                )
+                sizes = dict(cursor.fetchall())
+                table = sum(sizes.get(name, 0) for name in tables)
+                search = sum(size for name, size in sizes.items() if name.startswith(fts))
+                return table, sum(sizes.values()) - table - search, search
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT SUM(pg_table_size(t::regclass)), SUM(pg_indexes_size(t::regclass)) FROM unnest(%s) t",
+                    [tables],
+                )
+                table, indexes = cursor.fetchone()
+                # the GIN full-text indexes are among the tables' indexes
+                cursor.execute(
+                    "SELECT COALESCE(pg_relation_size(to_regclass('utterance_search_idx')), 0)"
+                    " + COALESCE(pg_relation_size(to_regclass('search_entry_search_idx')), 0)"
+                )
+                search = cursor.fetchone()[0]
+                return int(table), int(indexes) - search, search
+        return 0, 0, 0
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from conversation.models import Session
+from conversation.segments import DEFAULT_CODEC, SEGMENT_SIZE, pack_session, unpack_session
+
+
+class Command(BaseCommand):
+    help = (
+        "Pack finalized transcripts into compressed segments (one row per SEGMENT_SIZE utterances "
+        "instead of one per utterance), or unpack them back into utterance rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ended-before-hours",
+            type=float,
+            default=24,
+            help="Only sessions that ended at least this many hours ago (default: 24)",
+        )
+        parser.add_argument(
+            "--segment-size", type=int, default=SEGMENT_SIZE, help=f"Utterances per segment (default: {SEGMENT_SIZE})"
+        )
+        parser.add_argument(
+            "--codec", choices=["zstd", "zlib"], default=DEFAULT_CODEC, help=f"Compression (default: {DEFAULT_CODEC})"
+        )
+        parser.add_argument("--limit", type=int, default=None, help="At most this many sessions")
+        parser.add_argument("--session", action="append", default=[], help="Only this session id (repeatable)")
+        parser.add_argument("--unpack", action="store_true", help="Restore packed sessions to utterance rows")
+
+    def handle(self, *args, **options):
+        if options["segment_size"] < 1:
+            raise CommandError("--segment-size must be at least 1")
+        if options["codec"] == "zstd" and DEFAULT_CODEC != "zstd":
+            raise CommandError("zstd needs the zstandard package (pip install zstandard)")
+
+        if options["unpack"]:
+            sessions = Session.objects.filter(storage=Session.STORAGE_SEGMENTS)
+        else:
+            cutoff = timezone.now() - timedelta(hours=options["ended_before_hours"])
+            sessions = Session.objects.filter(storage=Session.STORAGE_ROWS, ended_at__lte=cutoff)
+        if options["session"]:
+            sessions = sessions.filter(id__in=options["session"])
+        ids = list(sessions.order_by("ended_at", "id").values_list("id", flat=True)[: options["limit"]])
+
+        done = utterances = 0
+        for session_id in ids:
+            # one transaction per session, so a long run never holds locks for long
+            session = Session(pk=session_id)
+            if options["unpack"]:
+                count = unpack_session(session)
+            else:
+                count = pack_session(session, options["segment_size"], options["codec"])
+            done += 1
+            utterances += count
+            self.stdout.write(f"{session_id}: {count} utterances")
+        verb = "Unpacked" if options["unpack"] else "Packed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {utterances} utterances in {done} sessions"))
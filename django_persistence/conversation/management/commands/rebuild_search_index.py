@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from conversation.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the transcript full-text index from the utterance and search entry tables "
+        "(SQLite FTS5; run after VACUUM or a restore). PostgreSQL's generated column needs no rebuild."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Database alias (default: default)")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            self.stdout.write(f"Nothing to rebuild on {connection.vendor}")
+            return
+        rebuild_index(connection)
+        self.stdout.write(self.style.SUCCESS("Rebuilt the transcript search index"))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0002_userpreferences_user_session_user_account_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='utterance',
+            options={'ordering': [models.OrderBy(models.F('seq'), nulls_last=True), 'created_at']},
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='source_ts',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='utterance',
+            constraint=models.UniqueConstraint(fields=('session', 'seq'), name='utterance_session_seq_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0003_utterance_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='final_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='last_message',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='utterance_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0004_session_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['-started_at', '-id'], name='session_started_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utterance',
+            index=models.Index(fields=['-created_at', '-id'], name='utterance_created_id_idx'),
+        ),
+    ]
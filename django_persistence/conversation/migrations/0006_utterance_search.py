@@ -0,0 +1,59 @@
+from django.db import migrations
+
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS conversation_utterance_fts USING fts5("
+    "text, content='conversation_utterance', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_ai AFTER INSERT ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(rowid, text) VALUES (new.rowid, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_ad AFTER DELETE ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_au AFTER UPDATE OF text ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+    "INSERT INTO conversation_utterance_fts(rowid, text) VALUES (new.rowid, new.text); END",
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts) VALUES ('rebuild')",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS conversation_utterance_fts_ai",
+    "DROP TRIGGER IF EXISTS conversation_utterance_fts_ad",
+    "DROP TRIGGER IF EXISTS conversation_utterance_fts_au",
+    "DROP TABLE IF EXISTS conversation_utterance_fts",
+]
+POSTGRES_SETUP = [
+    "ALTER TABLE conversation_utterance ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS utterance_search_idx ON conversation_utterance USING GIN (search_vector)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS utterance_search_idx",
+    "ALTER TABLE conversation_utterance DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            cursor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_SETUP, "postgresql": POSTGRES_SETUP})
+
+
+def backwards(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_TEARDOWN, "postgresql": POSTGRES_TEARDOWN})
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index on utterance text: an FTS5 table kept in sync by triggers
+    on SQLite, a generated tsvector column with a GIN index on PostgreSQL.
+    The index lives outside the model state (see conversation/search.py).
+    """
+
+    dependencies = [
+        ('conversation', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:17
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import F
+
+TURN_ROLES = ("user", "agent")
+BATCH_SIZE = 1000
+# the full-text index of 0006; SQLite drops its triggers when it rebuilds the table for the constraint
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS conversation_utterance_fts USING fts5("
+    "text, content='conversation_utterance', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_ai AFTER INSERT ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(rowid, text) VALUES (new.rowid, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_ad AFTER DELETE ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_utterance_fts_au AFTER UPDATE OF text ON conversation_utterance BEGIN "
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+    "INSERT INTO conversation_utterance_fts(rowid, text) VALUES (new.rowid, new.text); END",
+    "INSERT INTO conversation_utterance_fts(conversation_utterance_fts) VALUES ('rebuild')",
+]
+
+
+def fingerprint(role, text):
+    # conversation.fingerprint as of this migration: SHA-1 of role and NFKC, whitespace- and case-folded text
+    normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+    if not normalized:
+        return None
+    return hashlib.sha1(f"{role}\x1f{normalized}".encode()).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    # number each session's final turns in history order, as ingest and sessions/save now do
+    Utterance = apps.get_model("conversation", "Utterance")
+    turns = (
+        Utterance.objects.filter(is_final=True, role__in=TURN_ROLES)
+        .exclude(text="")
+        .order_by("session_id", F("seq").asc(nulls_last=True), "created_at", "id")
+        .only("id", "session_id", "role", "text")
+    )
+    counts = {}
+    session_id = None
+    batch = []
+    for u in turns.iterator(chunk_size=BATCH_SIZE):
+        if u.session_id != session_id:
+            session_id, counts = u.session_id, {}
+        u.fingerprint = fingerprint(u.role, u.text)
+        if u.fingerprint is None:
+            continue
+        u.occurrence = counts.get(u.fingerprint, 0)
+        counts[u.fingerprint] = u.occurrence + 1
+        batch.append(u)
+        if len(batch) >= BATCH_SIZE:
+            Utterance.objects.bulk_update(batch, ["fingerprint", "occurrence"])
+            batch = []
+    if batch:
+        Utterance.objects.bulk_update(batch, ["fingerprint", "occurrence"])
+
+
+def restore_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for sql in SQLITE_SETUP:
+                cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0006_utterance_search'),
+    ]
+
+    operations = [
+        # (reverse) removing the fields and constraint rebuilds the table too
+        migrations.RunPython(migrations.RunPython.noop, restore_search_index),
+        migrations.AddField(
+            model_name='utterance',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='occurrence',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='utterance',
+            constraint=models.UniqueConstraint(fields=('session', 'fingerprint', 'occurrence'), name='utterance_fingerprint_unique'),
+        ),
+        migrations.RunPython(restore_search_index, migrations.RunPython.noop),
+    ]
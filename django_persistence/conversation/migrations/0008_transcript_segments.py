@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# full-text index of the search entries, like utterance text's (0006)
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS conversation_search_entry_fts USING fts5("
+    "text, content='conversation_transcriptsearchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS conversation_search_entry_fts_ai AFTER INSERT ON conversation_transcriptsearchentry BEGIN "
+    "INSERT INTO conversation_search_entry_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_search_entry_fts_ad AFTER DELETE ON conversation_transcriptsearchentry BEGIN "
+    "INSERT INTO conversation_search_entry_fts(conversation_search_entry_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_search_entry_fts_au AFTER UPDATE OF text ON conversation_transcriptsearchentry BEGIN "
+    "INSERT INTO conversation_search_entry_fts(conversation_search_entry_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO conversation_search_entry_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS conversation_search_entry_fts_ai",
+    "DROP TRIGGER IF EXISTS conversation_search_entry_fts_ad",
+    "DROP TRIGGER IF EXISTS conversation_search_entry_fts_au",
+    "DROP TABLE IF EXISTS conversation_search_entry_fts",
+]
+POSTGRES_SETUP = [
+    "ALTER TABLE conversation_transcriptsearchentry ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS search_entry_search_idx ON conversation_transcriptsearchentry USING GIN (search_vector)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS search_entry_search_idx",
+    "ALTER TABLE conversation_transcriptsearchentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            cursor.execute(sql)
+
+
+def add_entry_index(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_SETUP, "postgresql": POSTGRES_SETUP})
+
+
+def remove_entry_index(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_TEARDOWN, "postgresql": POSTGRES_TEARDOWN})
+
+
+class Migration(migrations.Migration):
+    """
+    Packed transcript segments, and search entries that keep packed
+    utterances in the full-text index (see conversation/search.py).
+    """
+
+    dependencies = [
+        ('conversation', '0007_utterance_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='storage',
+            field=models.CharField(choices=[('rows', 'Rows'), ('segments', 'Segments')], default='rows', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('first_seq', models.BigIntegerField(blank=True, null=True)),
+                ('last_seq', models.BigIntegerField(blank=True, null=True)),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('codec', models.CharField(max_length=8)),
+                ('data', models.BinaryField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='conversation.session')),
+            ],
+            options={
+                'ordering': ['index'],
+                'constraints': [models.UniqueConstraint(fields=('session', 'index'), name='segment_session_index_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TranscriptSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('is_final', models.BooleanField()),
+                ('text', models.TextField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='conversation.session')),
+            ],
+        ),
+        migrations.RunPython(add_entry_index, remove_entry_index),
+    ]
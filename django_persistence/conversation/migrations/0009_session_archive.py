@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0008_transcript_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='archive_file',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='archive_length',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='archive_offset',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='storage',
+            field=models.CharField(choices=[('rows', 'Rows'), ('segments', 'Segments'), ('archive', 'Archive')], default='rows', max_length=16),
+        ),
+    ]
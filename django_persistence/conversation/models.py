@@ -103,15 +103,44 @@ class Session(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(blank=True, null=True)
     metadata = models.JSONField(blank=True, null=True)
+    # summary maintained on ingest (see summary.py) so list views do not aggregate utterances
+    utterance_count = models.PositiveIntegerField(default=0)
+    final_count = models.PositiveIntegerField(default=0)
+    last_message = models.CharField(max_length=200, blank=True)
+    last_activity_at = models.DateTimeField(blank=True, null=True)
+    duration_seconds = models.FloatField(blank=True, null=True)
+    # where the transcript lives: one Utterance row per event, packed TranscriptSegments (see segments.py),
+    # or a member of an archive file on disk (see archive.py)
+    STORAGE_ROWS = "rows"
+    STORAGE_SEGMENTS = "segments"
+    STORAGE_ARCHIVE = "archive"
+    STORAGE_CHOICES = (
+        (STORAGE_ROWS, "Rows"),
+        (STORAGE_SEGMENTS, "Segments"),
+        (STORAGE_ARCHIVE, "Archive"),
+    )
+    storage = models.CharField(max_length=16, choices=STORAGE_CHOICES, default=STORAGE_ROWS)
+    # archived sessions only: file under settings.ARCHIVE_DIR, and byte offset and length of the session's member
+    archive_file = models.CharField(max_length=255, blank=True)
+    archive_offset = models.BigIntegerField(blank=True, null=True)
+    archive_length = models.BigIntegerField(blank=True, null=True)
     
     class Meta:
         indexes = [
             models.Index(fields=['user_account', '-started_at']),
+            # keyset pagination of /api/sessions
+            models.Index(fields=['-started_at', '-id'], name='session_started_id_idx'),
         ]
 
     def __str__(self) -> str:
         return f"Session({self.id}) room={self.room} user={self.user_id}"
 
+    @property
+    def transcript(self):
+        """All utterances in history order, whichever storage holds them."""
+        from .segments import transcript
+        return transcript(self)
+
 
 class Utterance(models.Model):
     ROLE_CHOICES = (
@@ -125,10 +154,70 @@ class Utterance(models.Model):
     text = models.TextField(blank=True)
     event = models.CharField(max_length=64, blank=True)
     is_final = models.BooleanField(default=True)
+    # client-assigned per-session sequence number and event time (ingest); re-delivery of a seq is a no-op
+    seq = models.BigIntegerField(blank=True, null=True)
+    source_ts = models.DateTimeField(blank=True, null=True)
+    # final turns only: hash of role + normalized text, and its repeat count within the session
+    # (see conversation/fingerprint.py); ingest and sessions/save skip turns the other path already stored
+    fingerprint = models.CharField(max_length=40, blank=True, null=True)
+    occurrence = models.PositiveIntegerField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["created_at"]
+        # created_at is receive time; rows without a seq (older clients, saved sessions) sort after
+        ordering = [models.F("seq").asc(nulls_last=True), "created_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["session", "seq"], name="utterance_session_seq_unique"),
+            models.UniqueConstraint(
+                fields=["session", "fingerprint", "occurrence"], name="utterance_fingerprint_unique"
+            ),
+        ]
+        indexes = [
+            # keyset pagination of /api/utterances
+            models.Index(fields=["-created_at", "-id"], name="utterance_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Utterance({self.role}, final={self.is_final})"
+
+
+class TranscriptSegment(models.Model):
+    """
+    A run of a packed session's utterances: compressed JSON lines plus the
+    seq/time bounds used to pick segments without decoding them.
+    """
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="segments")
+    index = models.PositiveIntegerField()
+    count = models.PositiveIntegerField()
+    # bounds of the segment's utterances (first/last_seq are null for a segment of unsequenced ones)
+    first_seq = models.BigIntegerField(blank=True, null=True)
+    last_seq = models.BigIntegerField(blank=True, null=True)
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    codec = models.CharField(max_length=8)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ["index"]
+        constraints = [
+            models.UniqueConstraint(fields=["session", "index"], name="segment_session_index_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"TranscriptSegment({self.session_id}#{self.index}, {self.count} utterances)"
+
+
+class TranscriptSearchEntry(models.Model):
+    """
+    Search-only text of a packed or archived utterance, indexed like utterance
+    rows (see search.py), so those sessions stay searchable. A hit is read
+    back from the session's segments or archive member by `position`.
+    """
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="search_entries")
+    # index of the utterance in the packed transcript (segments in order, or the archive member)
+    position = models.PositiveIntegerField()
+    is_final = models.BooleanField()
+    text = models.TextField()
+
+    def __str__(self) -> str:
+        return f"TranscriptSearchEntry({self.session_id}#{self.position})"
@@ -0,0 +1,218 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a WHERE on the ordering columns of the last row seen
+instead of OFFSET, so a deep page costs the same index seek as the first one.
+Cursors are opaque (base64 JSON of the boundary row's ordering values and the
+direction). Totals are optional: `count=exact`, `count=approx` (planner
+estimate on PostgreSQL, exact elsewhere) or `count=none`.
+"""
+import base64
+import datetime
+import json
+import uuid
+from typing import Any, List, Optional, Sequence
+from urllib.parse import urlencode
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+COUNT_MODES = ("exact", "approx", "none")
+
+
+def approximate_count(queryset) -> int:
+    """Planner row estimate on PostgreSQL (no scan); exact count on other databases."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _cursor_value(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    # numbers stay numbers (compared as such in SQL); UUIDs and the rest become strings
+    return value if isinstance(value, (int, float)) else str(value)
+
+
+def _from_cursor(value: Any, like: Any) -> Any:
+    """A cursor value back in the type of `like` (datetimes and UUIDs travel as strings)."""
+    if isinstance(like, datetime.datetime):
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None:
+            raise ValidationError({"cursor": "Invalid cursor"})
+        return parsed
+    if isinstance(like, uuid.UUID):
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            raise ValidationError({"cursor": "Invalid cursor"})
+    return value
+
+
+def encode_cursor(values: Sequence[Any], reverse: bool = False) -> str:
+    raw = json.dumps({"v": [_cursor_value(v) for v in values], "r": reverse})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return list(data["v"]), bool(data.get("r"))
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+
+def _after(ordering: Sequence[str], values: Sequence[Any], reverse: bool) -> Q:
+    """Rows strictly after `values` in `ordering` (or before it when `reverse`)."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        descending = field.startswith("-") != reverse
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ordering (e.g. ("-started_at", "-id")).
+
+    Query parameters: `limit`, `cursor` (from a previous response's `next` or
+    `previous`) and `count`. Responses keep the {"count", "next", "previous",
+    "results"} shape; `count` is null with `count=none`.
+    """
+    ordering: Sequence[str] = ("-created_at", "-id")
+    default_limit = 20
+    max_limit = 100
+    default_count = "approx"
+
+    def __init__(self, ordering: Optional[Sequence[str]] = None, default_count: Optional[str] = None) -> None:
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        if default_count is not None:
+            self.default_count = default_count
+
+    def paginate_queryset(self, queryset, request, view=None) -> List[Any]:
+        count_mode, cursor = self._parse(request)
+        self.count = None
+        if count_mode == "exact":
+            self.count = queryset.count()
+        elif count_mode == "approx":
+            self.count = approximate_count(queryset)
+
+        reverse = False
+        page_qs = queryset
+        if cursor:
+            values, reverse = cursor
+            page_qs = page_qs.filter(_after(self.ordering, values, reverse))
+        order = [f[1:] if f.startswith("-") else f"-{f}" for f in self.ordering] if reverse else list(self.ordering)
+        # one extra row tells whether there is a page beyond this one
+        rows = list(page_qs.order_by(*order)[: self.limit + 1])
+        return self._page(rows, bool(cursor), reverse)
+
+    def paginate_list(self, items: Sequence[Any], request) -> List[Any]:
+        """Same paging over objects already in memory, sorted in `ordering` (e.g. decoded segments)."""
+        count_mode, cursor = self._parse(request)
+        self.count = len(items) if count_mode != "none" else None
+        reverse = False
+        rows = list(items)
+        if cursor:
+            values, reverse = cursor
+            rows = [row for row in rows if self._row_after(row, values, reverse)]
+        if reverse:
+            rows.reverse()
+        return self._page(rows[: self.limit + 1], bool(cursor), reverse)
+
+    def _parse(self, request):
+        self.request = request
+        params = request.query_params
+        try:
+            limit = int(params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer"})
+        self.limit = min(max(limit, 1), self.max_limit) if limit >= 1 else self.default_limit
+        count_mode = params.get("count", self.default_count)
+        if count_mode not in COUNT_MODES:
+            raise ValidationError({"count": f"Must be one of {', '.join(COUNT_MODES)}"})
+        cursor = params.get("cursor")
+        if not cursor:
+            return count_mode, None
+        values, reverse = decode_cursor(cursor)
+        if len(values) != len(self.ordering):
+            raise ValidationError({"cursor": "Invalid cursor"})
+        return count_mode, (values, reverse)
+
+    def _page(self, rows: List[Any], has_cursor: bool, reverse: bool) -> List[Any]:
+        more = len(rows) > self.limit
+        rows = rows[: self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if more or reverse:
+                self.next_cursor = encode_cursor(self._values(rows[-1]))
+            if has_cursor and (more or not reverse):
+                self.previous_cursor = encode_cursor(self._values(rows[0]), reverse=True)
+        return rows
+
+    def _row_after(self, row, values: Sequence[Any], reverse: bool) -> bool:
+        """Python counterpart of `_after` for one in-memory row."""
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            mine = getattr(row, name)
+            theirs = _from_cursor(value, mine)
+            if mine == theirs:
+                continue
+            descending = field.startswith("-") != reverse
+            return mine < theirs if descending else mine > theirs
+        return False
+
+    def _values(self, row) -> List[Any]:
+        return [getattr(row, field.lstrip("-")) for field in self.ordering]
+
+    def _link(self, cursor: Optional[str]) -> Optional[str]:
+        if cursor is None:
+            return None
+        params = self.request.query_params.copy()
+        params["cursor"] = cursor
+        params.pop("offset", None)
+        return f"{self.request.path}?{urlencode(sorted(params.items()))}"
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({
+            "count": self.count,
+            "next": self._link(self.next_cursor),
+            "previous": self._link(self.previous_cursor),
+            "results": data,
+        })
+
+
+class SessionPagination(KeysetPagination):
+    ordering = ("-started_at", "-id")
+
+
+class UtterancePagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class TranscriptPagination(KeysetPagination):
+    """One session's utterances in history order; the queryset must be annotated with `position`."""
+    ordering = ("position", "created_at", "id")
+    default_limit = 100
+    max_limit = 500
+    default_count = "none"
@@ -0,0 +1,258 @@
+"""
+Full-text search over utterance text.
+
+The index is maintained by the database itself, so every write path (ingest,
+bulk_create, sessions/save, admin edits) keeps it current:
+
+- SQLite: an external-content FTS5 table (`conversation_utterance_fts`) kept
+  in sync by triggers on the utterance table. Rebuild it with
+  `python manage.py rebuild_search_index` after a VACUUM (which may renumber
+  rowids).
+- PostgreSQL: a generated `tsvector` column (`search_vector`) with a GIN index.
+
+Both are created by migrations (0006 for utterances, 0008 for search
+entries), which keep their own copy of the DDL.
+
+Packed and archived sessions (segments.py, archive.py) have no utterance rows;
+each of their utterances with text keeps a TranscriptSearchEntry (its text and
+position in the packed transcript), indexed the same way. `search` queries both
+indexes at once and reads entry hits back from the packed transcript, so hits
+are the same whichever storage holds a transcript.
+
+Other databases fall back to an unindexed `icontains` scan.
+
+Queries are plain words; every word must match. On PostgreSQL the
+websearch syntax ("quoted phrase", -word, or) is also understood.
+"""
+import html
+import re
+from typing import Any, Dict, List, Optional
+
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .models import TranscriptSearchEntry, Utterance
+
+FTS_TABLE = "conversation_utterance_fts"
+ENTRY_FTS_TABLE = "conversation_search_entry_fts"
+ENTRY_TABLE = TranscriptSearchEntry._meta.db_table
+# text search configuration: no stemming, like FTS5's unicode61 tokenizer
+SEARCH_CONFIG = "simple"
+# words of context around the match in a snippet
+SNIPPET_WORDS = 16
+
+# private-use markers around highlighted terms; the text is escaped before they become <mark> tags
+_START, _STOP = "\ue000", "\ue001"
+
+
+def _execute(connection, statements: List[str]) -> None:
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_index(connection) -> None:
+    """Re-read every utterance and entry into the index (SQLite); PostgreSQL's generated columns need no rebuild."""
+    if connection.vendor == "sqlite":
+        _execute(connection, [f"INSERT INTO {fts}({fts}) VALUES ('rebuild')" for fts in (FTS_TABLE, ENTRY_FTS_TABLE)])
+
+
+def add_entries(session, utterances: List[Utterance]) -> None:
+    """
+    Search entries for a packed or archived transcript (its rows leave the
+    index): `utterances` in packed order, so an entry's position finds it again.
+    """
+    TranscriptSearchEntry.objects.bulk_create(
+        [
+            TranscriptSearchEntry(session_id=session.pk, position=position, is_final=u.is_final, text=u.text)
+            for position, u in enumerate(utterances)
+            if u.text
+        ],
+        batch_size=1000,
+    )
+
+
+def remove_entries(session) -> None:
+    """Drop a session's search entries (its utterances are back in rows, or are being re-indexed)."""
+    TranscriptSearchEntry.objects.filter(session_id=session.pk).delete()
+
+
+def _entry_hits(entry_ids: List[int], using: str) -> Dict[int, Utterance]:
+    """The utterances behind search entries, read back from their sessions' segments or archive members."""
+    from .segments import at_positions
+
+    entries = TranscriptSearchEntry.objects.using(using).select_related("session").filter(pk__in=entry_ids)
+    by_session: Dict[Any, List[TranscriptSearchEntry]] = {}
+    for entry in entries:
+        by_session.setdefault(entry.session_id, []).append(entry)
+    hits = {}
+    for session_entries in by_session.values():
+        utterances = at_positions(session_entries[0].session, [entry.position for entry in session_entries])
+        for entry in session_entries:
+            if entry.position in utterances:
+                hits[entry.pk] = utterances[entry.position]
+    return hits
+
+
+def _fts_query(query: str) -> str:
+    # each word as a quoted FTS5 string, so user input is never parsed as query syntax
+    return " ".join('"{}"'.format(word) for word in re.findall(r"\w+", query))
+
+
+def has_terms(query: str) -> bool:
+    return bool(re.search(r"\w", query or ""))
+
+
+def highlight(snippet: str) -> str:
+    """HTML-escape a snippet and wrap the matched terms in <mark>."""
+    return html.escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def filter_utterances(queryset, query: str):
+    """Narrow an Utterance queryset to rows matching `query`, through the index where there is one."""
+    connection = connections[queryset.db]
+    if connection.vendor == "sqlite":
+        match = _fts_query(query)
+        if not match:
+            return queryset.none()
+        ids = RawSQL(
+            f"SELECT u.id FROM {FTS_TABLE} f JOIN conversation_utterance u ON u.rowid = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        )
+        return queryset.filter(id__in=ids)
+    if connection.vendor == "postgresql":
+        return queryset.filter(RawSQL(
+            f"search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', %s)", [query], output_field=BooleanField()
+        ))
+    for word in re.findall(r"\w+", query):
+        queryset = queryset.filter(text__icontains=word)
+    return queryset
+
+
+def search(
+    user,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    session_id: Optional[str] = None,
+    final_only: bool = False,
+    using: str = "default",
+) -> List[Utterance]:
+    """
+    Utterances of `user`'s sessions matching `query`, best match first.
+
+    Returns up to `limit` utterances with their session loaded and the
+    highlighted match in `.snippet`.
+    """
+    connection = connections[using]
+    session_key = None
+    if session_id is not None:
+        session_key = Utterance._meta.get_field("session").target_field.get_db_prep_value(session_id, connection)
+
+    def where(alias: str):
+        filters = ["s.user_account_id = %s"]
+        params: List[Any] = [user.pk]
+        if session_key is not None:
+            filters.append(f"{alias}.session_id = %s")
+            params.append(session_key)
+        if final_only:
+            filters.append(f"{alias}.is_final")
+        return " AND ".join(filters), params
+
+    where_u, params_u = where("u")
+    where_e, params_e = where("e")
+    # hits are utterance rows (id) or search entries of packed/archived sessions (entry_id)
+    if connection.vendor == "sqlite":
+        match = _fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT id, entry_id, snip FROM ("
+            f"SELECT u.id AS id, NULL AS entry_id, snippet({FTS_TABLE}, 0, %s, %s, '…', %s) AS snip, "
+            "f.rank AS score "
+            f"FROM {FTS_TABLE} f "
+            "JOIN conversation_utterance u ON u.rowid = f.rowid "
+            "JOIN conversation_session s ON s.id = u.session_id "
+            f"WHERE {FTS_TABLE} MATCH %s AND {where_u} "
+            "UNION ALL "
+            f"SELECT NULL, e.id, snippet({ENTRY_FTS_TABLE}, 0, %s, %s, '…', %s), g.rank "
+            f"FROM {ENTRY_FTS_TABLE} g "
+            f"JOIN {ENTRY_TABLE} e ON e.id = g.rowid "
+            "JOIN conversation_session s ON s.id = e.session_id "
+            f"WHERE {ENTRY_FTS_TABLE} MATCH %s AND {where_e}"
+            ") ORDER BY score, id, entry_id LIMIT %s OFFSET %s"
+        )
+        snippet = [_START, _STOP, SNIPPET_WORDS]
+        params = [*snippet, match, *params_u, *snippet, match, *params_e, limit, offset]
+    elif connection.vendor == "postgresql":
+        # rank and page first; headlines are then built for the page's rows only
+        options = f"StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}"
+        sql = (
+            f"SELECT id, entry_id, ts_headline('{SEARCH_CONFIG}', text, q, %s) FROM ("
+            "SELECT u.id AS id, NULL::bigint AS entry_id, u.text AS text, q, ts_rank_cd(u.search_vector, q) AS score "
+            "FROM conversation_utterance u "
+            "JOIN conversation_session s ON s.id = u.session_id, "
+            f"websearch_to_tsquery('{SEARCH_CONFIG}', %s) q "
+            f"WHERE u.search_vector @@ q AND {where_u} "
+            "UNION ALL "
+            "SELECT NULL::uuid, e.id, e.text, q, ts_rank_cd(e.search_vector, q) "
+            f"FROM {ENTRY_TABLE} e "
+            "JOIN conversation_session s ON s.id = e.session_id, "
+            f"websearch_to_tsquery('{SEARCH_CONFIG}', %s) q "
+            f"WHERE e.search_vector @@ q AND {where_e} "
+            "ORDER BY score DESC, id, entry_id LIMIT %s OFFSET %s"
+            ") hit ORDER BY score DESC, id, entry_id"
+        )
+        params = [options, query, *params_u, query, *params_e, limit, offset]
+    else:
+        return _search_unindexed(user, query, limit, offset, session_id, final_only, using)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    id_field = Utterance._meta.pk
+    utterances = Utterance.objects.using(using).select_related("session").in_bulk(
+        [id_field.to_python(uid) for uid, entry_id, _ in rows if uid is not None]
+    )
+    entries = _entry_hits([entry_id for uid, entry_id, _ in rows if entry_id is not None], using)
+    hits = []
+    for uid, entry_id, snippet in rows:
+        utterance = utterances.get(id_field.to_python(uid)) if uid is not None else entries.get(entry_id)
+        if utterance is None:
+            # moved between storages since the query ran
+            continue
+        utterance.snippet = highlight(snippet or "")
+        hits.append(utterance)
+    return hits
+
+
+def _search_unindexed(user, query, limit, offset, session_id, final_only, using):
+    words = re.findall(r"\w+", query)
+    candidates = []
+    for model in (Utterance, TranscriptSearchEntry):
+        rows = model.objects.using(using).filter(session__user_account=user)
+        if session_id is not None:
+            rows = rows.filter(session_id=session_id)
+        if final_only:
+            rows = rows.filter(is_final=True)
+        for word in words:
+            rows = rows.filter(text__icontains=word)
+        candidates.append(rows)
+    utterances = candidates[0].select_related("session").order_by("-created_at", "-id")
+    hits = list(utterances[offset:offset + limit])
+    if len(hits) < limit:
+        # entries (packed/archived sessions, all older than live rows in practice) follow the rows
+        skip = max(offset - utterances.count(), 0)
+        entry_ids = list(
+            candidates[1].order_by("-session__started_at", "-position").values_list("pk", flat=True)[
+                skip:skip + limit - len(hits)
+            ]
+        )
+        entries = _entry_hits(entry_ids, using)
+        hits.extend(entries[pk] for pk in entry_ids if pk in entries)
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    for utterance in hits:
+        utterance.snippet = highlight(pattern.sub(lambda m: f"{_START}{m.group(0)}{_STOP}", utterance.text))
+    return hits
@@ -0,0 +1,260 @@
+"""
+Packed transcript storage.
+
+A finalized session's utterances can be moved out of the row-per-utterance
+table into TranscriptSegment blobs: runs of SEGMENT_SIZE utterances in
+history order, encoded as JSON lines and compressed (zstd when the
+`zstandard` package is installed, zlib otherwise). Each segment row keeps
+its seq and time bounds, so ranged reads decode only the segments they
+need. Session.storage records which layout holds a session's transcript;
+`transcript()` and `ranged()` read any of them (archived sessions too, see
+archive.py), so the history endpoints serve all with the same contract.
+
+Packing replaces the utterances' full-text index rows with search entries
+(search.py), so packed sessions stay searchable. sessions/save and ingest
+leave packed and archived sessions alone (their transcript is final).
+"""
+import datetime
+import json
+import uuid
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .models import Session, TranscriptSegment, Utterance
+from . import search
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# utterances per segment
+SEGMENT_SIZE = 256
+# transcript position of utterances without a seq (after every sequenced one)
+UNSEQUENCED_POSITION = 2 ** 62
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+FIELDS = ("seq", "role", "text", "event", "is_final", "fingerprint", "occurrence")
+
+
+def compress(raw: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if codec == "zlib":
+        return zlib.compress(raw, ZLIB_LEVEL)
+    raise ValueError(f"Unknown segment codec: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd segment found but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(bytes(data))
+    if codec == "zlib":
+        return zlib.decompress(bytes(data))
+    raise ValueError(f"Unknown segment codec: {codec}")
+
+
+def _time(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def encode(utterances: Iterable[Utterance]) -> bytes:
+    lines = []
+    for u in utterances:
+        record = {field: getattr(u, field) for field in FIELDS}
+        record["id"] = u.id.hex
+        record["source_ts"] = _time(u.source_ts)
+        record["created_at"] = _time(u.created_at)
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines).encode()
+
+
+def decode(raw: bytes, session: Session) -> List[Utterance]:
+    """Utterance instances for a segment's lines (not backed by rows), attached to `session`."""
+    # one parse for the whole segment, and Model.from_db's positional fast path instead of keyword init
+    records = json.loads("[" + raw.decode().replace("\n", ",") + "]") if raw else []
+    attnames = [f.attname for f in Utterance._meta.concrete_fields]
+    utterances = []
+    for record in records:
+        record["id"] = uuid.UUID(record["id"])
+        record["session_id"] = session.pk
+        record["source_ts"] = _parse_time(record["source_ts"])
+        record["created_at"] = _parse_time(record["created_at"])
+        u = Utterance.from_db(None, attnames, [record[name] for name in attnames])
+        u._state.fields_cache["session"] = session
+        utterances.append(u)
+    return utterances
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+
+def history_key(u: Utterance):
+    # Utterance.Meta.ordering: seq (nulls last), then created_at
+    return (u.seq is None, u.seq or 0, u.created_at, str(u.id))
+
+
+def _moment(u: Utterance) -> datetime.datetime:
+    return u.source_ts or u.created_at
+
+
+def pack_session(session: Session, segment_size: int = SEGMENT_SIZE, codec: str = DEFAULT_CODEC) -> int:
+    """
+    Move a session's utterance rows into segments; returns how many were packed.
+
+    Runs in one transaction and locks the session row, so a concurrent pack
+    or unpack of the same session waits.
+    """
+    with transaction.atomic():
+        session = Session.objects.select_for_update().get(pk=session.pk)
+        if session.storage != Session.STORAGE_ROWS:
+            return 0
+        utterances = list(session.utterances.all())
+        segments = []
+        # sequenced and unsequenced utterances go to separate segments, so seq bounds stay meaningful
+        runs = [[u for u in utterances if u.seq is not None], [u for u in utterances if u.seq is None]]
+        for run in runs:
+            for start in range(0, len(run), segment_size):
+                chunk = run[start:start + segment_size]
+                moments = [_moment(u) for u in chunk]
+                segments.append(TranscriptSegment(
+                    session=session,
+                    index=len(segments),
+                    count=len(chunk),
+                    first_seq=chunk[0].seq,
+                    last_seq=chunk[-1].seq,
+                    first_at=min(moments),
+                    last_at=max(moments),
+                    codec=codec,
+                    data=compress(encode(chunk), codec),
+                ))
+        TranscriptSegment.objects.bulk_create(segments)
+        # in segment order, so search entry positions index into load(session)
+        search.add_entries(session, runs[0] + runs[1])
+        session.utterances.all().delete()
+        session.storage = Session.STORAGE_SEGMENTS
+        session.save(update_fields=["storage"])
+    return len(utterances)
+
+
+def unpack_session(session: Session) -> int:
+    """Restore a packed session's utterance rows (ids and timestamps included); returns how many."""
+    with transaction.atomic():
+        session = Session.objects.select_for_update().get(pk=session.pk)
+        if session.storage != Session.STORAGE_SEGMENTS:
+            return 0
+        utterances = load(session)
+        insert_rows(utterances)
+        search.remove_entries(session)
+        session.segments.all().delete()
+        session.storage = Session.STORAGE_ROWS
+        session.save(update_fields=["storage"])
+    return len(utterances)
+
+
+def insert_rows(utterances: List[Utterance]) -> None:
+    """Store decoded utterances as rows again, with their original ids and timestamps."""
+    created_at = {u.id: u.created_at for u in utterances}
+    Utterance.objects.bulk_create(utterances)
+    # created_at is auto_now_add, so the insert stamped it with now: put the original back
+    for u in utterances:
+        u.created_at = created_at[u.id]
+    Utterance.objects.bulk_update(utterances, ["created_at"])
+
+
+def load(session: Session, segments: Optional[Iterable[TranscriptSegment]] = None) -> List[Utterance]:
+    """Decoded utterances of `segments` (default: all of the session's), in history order."""
+    if segments is None:
+        segments = session.segments.all()
+    utterances = []
+    for segment in segments:
+        utterances.extend(decode(decompress(segment.data, segment.codec), session))
+    return utterances
+
+
+def at_positions(session: Session, positions: Iterable[int]) -> Dict[int, Utterance]:
+    """
+    A packed or archived session's utterances at the given positions of its
+    packed transcript (search entries); only the segments holding them are decoded.
+    """
+    positions = set(positions)
+    if session.storage == Session.STORAGE_ARCHIVE:
+        from . import archive
+        utterances = archive.load(session)
+        return {p: utterances[p] for p in positions if p < len(utterances)}
+    # segment index -> position of its first utterance, for the segments holding a wanted position
+    starts, start = {}, 0
+    for index, count in session.segments.values_list("index", "count"):
+        if any(start <= p < start + count for p in positions):
+            starts[index] = start
+        start += count
+    found = {}
+    for segment in session.segments.filter(index__in=list(starts)):
+        for i, u in enumerate(decode(decompress(segment.data, segment.codec), session)):
+            if starts[segment.index] + i in positions:
+                found[starts[segment.index] + i] = u
+    return found
+
+
+def transcript(session: Session) -> List[Utterance]:
+    """All of a session's utterances in history order, from rows, segments or the archive."""
+    rows = list(session.utterances.all())
+    if session.storage == Session.STORAGE_ROWS:
+        return rows
+    if session.storage == Session.STORAGE_ARCHIVE:
+        from . import archive
+        packed = archive.load(session)
+    else:
+        packed = load(session)
+    # rows added after packing (e.g. through the admin) are merged in
+    return sorted(packed + rows, key=history_key)
+
+
+def ranged(
+    session: Session,
+    from_seq: Optional[int] = None,
+    to_seq: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> List[Utterance]:
+    """
+    A packed or archived session's utterances within the given bounds, in
+    history order, annotated with `position` and `at` like
+    history_utterances_view's queryset. Only the segments whose bounds overlap
+    the range are decoded; an archived transcript is read whole (and cached).
+    """
+    if session.storage == Session.STORAGE_ARCHIVE:
+        utterances = transcript(session)
+    else:
+        segments = session.segments.all()
+        if from_seq is not None:
+            segments = segments.filter(last_seq__gte=from_seq)
+        if to_seq is not None:
+            segments = segments.filter(first_seq__lte=to_seq)
+        if since is not None:
+            segments = segments.filter(last_at__gte=since)
+        if until is not None:
+            segments = segments.filter(first_at__lte=until)
+        utterances = sorted(load(session, segments) + list(session.utterances.all()), key=history_key)
+    selected = []
+    for u in utterances:
+        u.position = UNSEQUENCED_POSITION if u.seq is None else u.seq
+        u.at = _moment(u)
+        if from_seq is not None and (u.seq is None or u.seq < from_seq):
+            continue
+        if to_seq is not None and (u.seq is None or u.seq > to_seq):
+            continue
+        if since is not None and u.at < since:
+            continue
+        if until is not None and u.at > until:
+            continue
+        selected.append(u)
+    return selected
+
@@ -7,12 +7,13 @@ from .models import Session, Utterance, User, UserPreferences
 class UtteranceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Utterance
-        fields = ["id", "session", "role", "text", "event", "is_final", "created_at"]
+        fields = ["id", "session", "seq", "role", "text", "event", "is_final", "source_ts", "created_at"]
         read_only_fields = ["id", "created_at"]
 
 
 class SessionSerializer(serializers.ModelSerializer):
-    utterances = UtteranceSerializer(many=True, read_only=True)
+    # rows or packed segments, whichever holds the transcript
+    utterances = UtteranceSerializer(many=True, read_only=True, source="transcript")
 
     class Meta:
         model = Session
@@ -20,6 +21,18 @@ class SessionSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "started_at", "utterances"]
 
 
+class SessionListSerializer(serializers.ModelSerializer):
+    """Session list rows: the session and its summary, without utterances."""
+
+    class Meta:
+        model = Session
+        fields = [
+            "id", "room", "user_id", "system_prompt", "started_at", "ended_at", "metadata",
+            "utterance_count", "final_count", "last_message", "last_activity_at", "duration_seconds",
+        ]
+        read_only_fields = fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user profile responses."""
     class Meta:
@@ -132,24 +145,47 @@ class PasswordChangeSerializer(serializers.Serializer):
 
 
 class SessionHistoryListSerializer(serializers.ModelSerializer):
-    """Serializer for session history list with utterance count."""
-    utterance_count = serializers.SerializerMethodField()
+    """Serializer for session history list (summary fields are maintained on ingest)."""
     
     class Meta:
         model = Session
-        fields = ["id", "room", "started_at", "ended_at", "system_prompt", "utterance_count"]
-        read_only_fields = ["id", "started_at", "ended_at"]
-    
-    def get_utterance_count(self, obj):
-        """Return the count of utterances for this session."""
-        return obj.utterances.count()
+        fields = [
+            "id", "room", "started_at", "ended_at", "system_prompt",
+            "utterance_count", "final_count", "last_message", "last_activity_at", "duration_seconds",
+        ]
+        read_only_fields = fields
 
 
 class SessionHistoryDetailSerializer(serializers.ModelSerializer):
     """Serializer for session detail with all utterances."""
-    utterances = UtteranceSerializer(many=True, read_only=True)
+    utterances = UtteranceSerializer(many=True, read_only=True, source="transcript")
     
     class Meta:
         model = Session
         fields = ["id", "room", "started_at", "ended_at", "system_prompt", "metadata", "utterances"]
         read_only_fields = ["id", "started_at", "ended_at", "utterances"]
+
+
+class SessionHistoryHeaderSerializer(serializers.ModelSerializer):
+    """Serializer for a session's header: metadata and summary, no utterances."""
+    
+    class Meta:
+        model = Session
+        fields = [
+            "id", "room", "started_at", "ended_at", "system_prompt", "metadata",
+            "utterance_count", "final_count", "last_message", "last_activity_at", "duration_seconds",
+        ]
+        read_only_fields = fields
+
+
+class TranscriptSearchHitSerializer(serializers.ModelSerializer):
+    """Serializer for a transcript search hit: the matching utterance, its session and a highlighted snippet."""
+    session_id = serializers.UUIDField(read_only=True)
+    room = serializers.CharField(source="session.room", read_only=True)
+    session_started_at = serializers.DateTimeField(source="session.started_at", read_only=True)
+    snippet = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = Utterance
+        fields = ["id", "session_id", "room", "session_started_at", "seq", "role", "is_final", "created_at", "snippet"]
+        read_only_fields = fields
@@ -0,0 +1,104 @@
+"""
+Denormalized per-session summary: Session.utterance_count, final_count,
+last_message, last_activity_at and duration_seconds.
+
+Ingest and sessions/save update the summary in the same transaction as the
+utterances they insert, so list views read it straight off the session row
+instead of aggregating utterances. `recompute` rebuilds it from the
+utterance table (backfill_session_summary command, repairs).
+"""
+from typing import Dict, Iterable
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Session, Utterance
+
+# characters of the last final turn kept in Session.last_message
+PREVIEW_LENGTH = 200
+# roles that make up the conversation (the rest are events like speech_started)
+TURN_ROLES = ("user", "agent")
+
+SUMMARY_FIELDS = ["utterance_count", "final_count", "last_message", "last_activity_at", "duration_seconds"]
+
+
+def session_duration(session):
+    end = session.ended_at or session.last_activity_at
+    if end is None or session.started_at is None:
+        return None
+    return max(0.0, (end - session.started_at).total_seconds())
+
+
+def apply_utterances(sessions: Dict, utterances: Iterable[Utterance], now) -> None:
+    """
+    Fold newly inserted utterances into their sessions' summary.
+
+    `sessions` maps session id to the Session rows the caller locked and read
+    (select_for_update), and `utterances` are the rows actually inserted;
+    counts are incremented in the database (F expressions), so writers that
+    do not lock the session do not lose updates either. Saved with one bulk
+    UPDATE.
+    """
+    counts: Dict = {}
+    # history order, so the preview is the latest turn even if a batch arrives out of order
+    for u in sorted(utterances, key=lambda u: (u.seq is None, u.seq or 0)):
+        session = sessions[u.session_id]
+        total, finals = counts.get(u.session_id, (0, 0))
+        if u.is_final and u.role in TURN_ROLES:
+            finals += 1
+            if u.text:
+                session.last_message = u.text[:PREVIEW_LENGTH]
+        counts[u.session_id] = (total + 1, finals)
+        at = u.source_ts or now
+        if session.last_activity_at is None or at > session.last_activity_at:
+            session.last_activity_at = at
+    if not counts:
+        return
+    touched = []
+    for session_id, (total, finals) in counts.items():
+        session = sessions[session_id]
+        session.duration_seconds = session_duration(session)
+        session.utterance_count = F("utterance_count") + total
+        session.final_count = F("final_count") + finals
+        touched.append(session)
+    Session.objects.bulk_update(touched, SUMMARY_FIELDS)
+
+
+def recompute(queryset, batch_size: int = 500) -> int:
+    """
+    Rebuild the summary of the given sessions from their utterances; returns how many were updated.
+
+    Packed sessions (segments.py) are skipped: their rows are gone, and their
+    summary was final when they were packed.
+    """
+    turns = Q(utterances__is_final=True, utterances__role__in=TURN_ROLES)
+    # last final turn in history order (seq, then created_at; rows without seq come last)
+    last_turn = (
+        Utterance.objects.filter(session=OuterRef("pk"), is_final=True, role__in=TURN_ROLES)
+        .exclude(text="")
+        .order_by(F("seq").desc(nulls_first=True), "-created_at")
+        .values("text")[:1]
+    )
+    annotated = queryset.filter(storage=Session.STORAGE_ROWS).order_by().annotate(
+        _count=Count("utterances"),
+        _finals=Count("utterances", filter=turns),
+        _last_at=Max(Coalesce("utterances__source_ts", "utterances__created_at")),
+        _last_text=Subquery(last_turn),
+    )
+    updated = 0
+    batch = []
+    for session in annotated.iterator(chunk_size=batch_size):
+        session.utterance_count = session._count
+        session.final_count = session._finals
+        session.last_message = (session._last_text or "")[:PREVIEW_LENGTH]
+        session.last_activity_at = session._last_at
+        session.duration_seconds = session_duration(session)
+        batch.append(session)
+        if len(batch) >= batch_size:
+            Session.objects.bulk_update(batch, SUMMARY_FIELDS)
+            updated += len(batch)
+            batch = []
+    if batch:
+        Session.objects.bulk_update(batch, SUMMARY_FIELDS)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,65 @@
+import json
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+
+from . import views
+from .models import Session, Utterance
+
+INGEST_HEADERS = {"HTTP_X_INGEST_TOKEN": "super-secret-token"}
+
+
+def _events(count, start=0):
+    return [
+        {"seq": i, "ts": 1700000000 + i, "role": ("user", "agent", "event")[i % 3],
+         "text": f"turn {i}" if i % 3 != 2 else "", "is_final": i % 4 != 0}
+        for i in range(start, start + count)
+    ]
+
+
+class IngestSummaryTests(TestCase):
+    def setUp(self):
+        self.session_id = str(uuid.uuid4())
+
+    def ingest(self, events):
+        body = {"session": {"id": self.session_id, "room": "r"}, "events": events}
+        response = self.client.post("/api/ingest", data=json.dumps(body), content_type="application/json", **INGEST_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertSummary(self):
+        session = Session.objects.get(pk=self.session_id)
+        rows = Utterance.objects.filter(session=session)
+        self.assertEqual(session.utterance_count, rows.count())
+        self.assertEqual(session.final_count, rows.filter(is_final=True, role__in=("user", "agent")).count())
+        last = rows.filter(is_final=True, role__in=("user", "agent")).exclude(text="").order_by("-seq").first()
+        self.assertEqual(session.last_message, last.text)
+        return session
+
+    def test_replayed_batch_is_counted_once(self):
+        events = _events(30)
+        self.ingest(events)
+        result = self.ingest(events)
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["duplicates"], 30)
+        self.assertEqual(self.assertSummary().utterance_count, 30)
+
+    def test_concurrent_redelivery_is_counted_once(self):
+        self.ingest(_events(10))
+        batch = _events(20, start=10)
+        number_turns = views._number_turns
+        raced = []
+
+        def deliver_first(utterances):
+            # the same batch commits between this commit's duplicate check and its insert
+            if not raced:
+                raced.append(True)
+                self.ingest(batch)
+            return number_turns(utterances)
+
+        with mock.patch.object(views, "_number_turns", side_effect=deliver_first):
+            result = self.ingest(batch)
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["duplicates"], 20)
+        self.assertEqual(self.assertSummary().utterance_count, 30)
@@ -4,6 +4,7 @@ from .views import (
     SessionViewSet, 
     UtteranceViewSet, 
     IngestView,
+    BulkIngestView,
     register_view,
     login_view,
     logout_view,
@@ -13,6 +14,9 @@ from .views import (
     change_password_view,
     history_list_view,
     history_detail_view,
+    history_header_view,
+    history_utterances_view,
+    history_search_view,
     validate_session_view,
     save_session_view
 )
@@ -24,6 +28,7 @@ router.register(r'utterances', UtteranceViewSet, basename='utterance')
 urlpatterns = [
     path('', include(router.urls)),
     path('ingest', IngestView.as_view()),
+    path('ingest/bulk', BulkIngestView.as_view()),
     # Authentication endpoints
     path('auth/register', register_view, name='auth-register'),
     path('auth/login', login_view, name='auth-login'),
@@ -35,7 +40,10 @@ urlpatterns = [
     path('users/change-password', change_password_view, name='change-password'),
     # Conversation history endpoints
     path('users/history', history_list_view, name='history-list'),
+    path('users/history/search', history_search_view, name='history-search'),
     path('users/history/<uuid:session_id>', history_detail_view, name='history-detail'),
+    path('users/history/<uuid:session_id>/header', history_header_view, name='history-header'),
+    path('users/history/<uuid:session_id>/utterances', history_utterances_view, name='history-utterances'),
     path('users/sessions/save', save_session_view, name='save-session'),
     # Internal endpoints (for FastAPI backend)
     path('internal/validate-session', validate_session_view, name='validate-session'),
@@ -0,0 +1,80 @@
+"""
+Cached per-user context: the payloads of /api/internal/validate-session and
+GET /api/users/profile.
+
+Entries live in the Django cache (settings.CACHES, local memory unless
+configured) for USER_CONTEXT_CACHE_TTL seconds and are dropped whenever the
+user, their preferences or their password change (`invalidate`). With a
+cached session engine, validating a session cookie then needs no database
+query at all. Local-memory caches are per process: run a shared backend
+(Redis, Memcached) when several workers serve the API, or stale entries live
+until the TTL.
+"""
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+from .models import UserPreferences
+from .serializers import UserProfileSerializer
+
+CACHE_KEY = "conversation:user-context:{}"
+
+
+def _key(user_id) -> str:
+    return CACHE_KEY.format(user_id)
+
+
+def build(user) -> Dict[str, Any]:
+    """Context of `user` from the database (creating default preferences if missing)."""
+    preferences, _ = UserPreferences.objects.get_or_create(user=user)
+    user.preferences = preferences
+    return {
+        # sessions logged in before a password change carry another hash and are not served from cache
+        "auth_hash": user.get_session_auth_hash(),
+        "validate": {
+            "valid": True,
+            "user_id": str(user.id),
+            "email": user.email,
+            "display_name": user.display_name,
+            "preferences": {
+                "preferred_voice": preferences.preferred_voice,
+                "preferred_language": preferences.preferred_language,
+                "favorite_topics": preferences.favorite_topics,
+                "system_prompt_override": preferences.system_prompt_override,
+            },
+        },
+        "profile": UserProfileSerializer(user).data,
+    }
+
+
+def for_user(user) -> Dict[str, Any]:
+    """Cached context of an authenticated user, built and stored on a miss."""
+    context = cache.get(_key(user.pk))
+    if context is None:
+        context = build(user)
+        cache.set(_key(user.pk), context, settings.USER_CONTEXT_CACHE_TTL)
+    return context
+
+
+def for_session(session) -> Optional[Dict[str, Any]]:
+    """
+    Cached context of the user logged in to `session`, or None on a miss.
+
+    Reads only the session (the cache, with a cached session engine) and the
+    context entry; the entry is used only if the session's auth hash still
+    matches the user's.
+    """
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    context = cache.get(_key(user_id))
+    if context is None or not constant_time_compare(session.get(HASH_SESSION_KEY, ""), context["auth_hash"]):
+        return None
+    return context
+
+
+def invalidate(user_id) -> None:
+    cache.delete(_key(user_id))
@@ -1,95 +1,387 @@
-from typing import List
+import datetime
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
 from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import authenticate, get_user, login, logout
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import Session, Utterance, User, UserPreferences
+from .pagination import SessionPagination, TranscriptPagination, UtterancePagination
+from . import segments, user_context
+from .fingerprint import fingerprint
+from .search import has_terms, search as search_transcripts
+from .summary import TURN_ROLES, apply_utterances, recompute, session_duration
 from .serializers import (
     SessionSerializer, 
+    SessionListSerializer,
     UtteranceSerializer, 
     UserSerializer, 
     RegisterSerializer, 
     LoginSerializer,
-    UserProfileSerializer,
     UserProfileUpdateSerializer,
     UserPreferencesSerializer,
     PasswordChangeSerializer,
     SessionHistoryListSerializer,
-    SessionHistoryDetailSerializer
+    SessionHistoryDetailSerializer,
+    SessionHistoryHeaderSerializer,
+    TranscriptSearchHitSerializer,
 )
 
 
+# Bulk ingest: utterances per INSERT statement, and events per transaction for streamed NDJSON bodies
+BULK_INGEST_BATCH_SIZE = 500
+BULK_INGEST_CHUNK_EVENTS = 5000
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+# transcript search page size, and how deep offset paging may go
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 1000
+
+
 class SessionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Session.objects.all().order_by("-started_at")
+    queryset = Session.objects.all().order_by("-started_at", "-id")
     serializer_class = SessionSerializer
+    pagination_class = SessionPagination
+
+    def get_serializer_class(self):
+        # list pages carry the summary columns, not every utterance of every session
+        if self.action == "list":
+            return SessionListSerializer
+        return SessionSerializer
 
 
 class UtteranceViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Utterance.objects.select_related("session").all().order_by("-created_at")
+    queryset = Utterance.objects.all().order_by("-created_at", "-id")
     serializer_class = UtteranceSerializer
+    pagination_class = UtterancePagination
+
+
+def _ingest_authorized(request) -> bool:
+    token = request.headers.get("X-INGEST-TOKEN")
+    return bool(token) and token == getattr(settings, "ALLOW_INGEST_TOKEN", "")
+
+
+def _ingest_error(record) -> Optional[str]:
+    """Validation error for one {"session": ..., "events": [...]} record, or None."""
+    if not isinstance(record, dict):
+        return "Record must be an object"
+    sess = record.get("session") or {}
+    if not sess:
+        return "Missing session"
+    if not sess.get("id"):
+        return "Missing session id"
+    try:
+        uuid.UUID(str(sess["id"]))
+    except ValueError:
+        return "Invalid session id"
+    events = record.get("events") or []
+    if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        return "events must be a list of objects"
+    for e in events:
+        seq = e.get("seq")
+        if seq is not None and (isinstance(seq, bool) or not isinstance(seq, int) or seq < 0):
+            return "seq must be a non-negative integer"
+    return None
+
+
+def _source_time(value):
+    """Aware datetime for a client timestamp in epoch seconds, or None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def _ingest_records(records: List[dict]) -> Dict[str, int]:
+    """
+    Group commit for validated ingest records (any number of sessions).
+
+    The missing sessions are created with one insert and every session of the
+    commit is then locked and read with one query; metadata/ended_at changes
+    are applied with one bulk update, all utterances inserted with one bulk
+    insert and the session summaries advanced, from the rows actually
+    inserted, with one more bulk update, all in a single transaction.
+    Records for the same session are merged in order.
+
+    Events carrying a `seq` already stored for their session (client retries,
+    replays) are skipped: one range query per commit finds them, and the
+    (session, seq) unique constraint covers concurrent deliveries. Final
+    turns already stored by sessions/save are skipped by fingerprint.
+    """
+    now = timezone.now()
+    sessions: Dict[uuid.UUID, dict] = {}
+    pending: List[tuple] = []
+    seen = set()
+    duplicates = 0
+    for record in records:
+        sess = record["session"]
+        session_id = uuid.UUID(str(sess["id"]))
+        merged = sessions.setdefault(
+            session_id, {"session": sess, "metadata": None, "ended_at": None, "seq_range": None}
+        )
+        if sess.get("metadata"):
+            merged["metadata"] = {**(merged["metadata"] or {}), **sess["metadata"]}
+        if sess.get("ended_at") and merged["ended_at"] is None:
+            merged["ended_at"] = _source_time(sess["ended_at"]) or now
+        for e in record.get("events") or []:
+            seq = e.get("seq")
+            if seq is not None:
+                if (session_id, seq) in seen:
+                    duplicates += 1
+                    continue
+                seen.add((session_id, seq))
+                lo, hi = merged["seq_range"] or (seq, seq)
+                merged["seq_range"] = (min(lo, seq), max(hi, seq))
+            pending.append((session_id, e))
+
+    with transaction.atomic():
+        # create the missing sessions, then lock every session of the commit (in pk order, so
+        # concurrent commits cannot deadlock) and work from the rows as stored, whoever created them
+        known = set(Session.objects.filter(pk__in=list(sessions)).values_list("pk", flat=True))
+        new_sessions = []
+        for session_id, merged in sessions.items():
+            if session_id not in known:
+                sess = merged["session"]
+                new_sessions.append(
+                    Session(
+                        id=session_id,
+                        room=sess.get("room", "unknown"),
+                        user_id=sess.get("user_id"),
+                        system_prompt=sess.get("system_prompt", ""),
+                        metadata=merged["metadata"],
+                        ended_at=merged["ended_at"],
+                    )
+                )
+        if new_sessions:
+            # a concurrent request may have created the same session: keep its row
+            Session.objects.bulk_create(new_sessions, ignore_conflicts=True)
+        existing = Session.objects.select_for_update().order_by("pk").in_bulk(list(sessions))
+
+        changed = []
+        for session_id, merged in sessions.items():
+            session = existing[session_id]
+            # metadata can arrive after the session row exists (e.g. recording path/stats): merge keys
+            dirty = False
+            if merged["metadata"]:
+                metadata = {**(session.metadata or {}), **merged["metadata"]}
+                if metadata != session.metadata:
+                    session.metadata = metadata
+                    dirty = True
+            if merged["ended_at"] and not session.ended_at:
+                session.ended_at = merged["ended_at"]
+                session.duration_seconds = session_duration(session)
+                dirty = True
+            if dirty:
+                changed.append(session)
+        if changed:
+            Session.objects.bulk_update(changed, ["metadata", "ended_at", "duration_seconds"])
+
+        # re-delivered events
+        stored = Q(pk__in=[])
+        for session_id, merged in sessions.items():
+            if merged["seq_range"]:
+                lo, hi = merged["seq_range"]
+                stored |= Q(session_id=session_id, seq__gte=lo, seq__lte=hi)
+        stored_seqs = set(Utterance.objects.filter(stored).values_list("session_id", "seq"))
+
+        # packed and archived sessions (segments.py, archive.py) are finalized: late or replayed events are not stored
+        packed = {session_id for session_id, session in existing.items() if session.storage != Session.STORAGE_ROWS}
+        utterances = []
+        for session_id, e in pending:
+            if session_id in packed:
+                duplicates += 1
+                continue
+            if e.get("seq") is not None and (session_id, e["seq"]) in stored_seqs:
+                duplicates += 1
+                continue
+            utterances.append(
+                Utterance(
+                    session_id=session_id,
+                    seq=e.get("seq"),
+                    role=e.get("role") or "event",
+                    text=e.get("text", ""),
+                    event=e.get("event", ""),
+                    is_final=bool(e.get("is_final", True)),
+                    source_ts=_source_time(e.get("ts")),
+                )
+            )
+        utterances, turn_duplicates = _number_turns(utterances)
+        duplicates += turn_duplicates
+        if utterances:
+            # ignore_conflicts: a concurrent delivery of the same seq or turn wins, this one is a no-op;
+            # only the rows actually inserted (their ids read back) go into the summary
+            Utterance.objects.bulk_create(utterances, batch_size=BULK_INGEST_BATCH_SIZE, ignore_conflicts=True)
+            inserted = set()
+            for start in range(0, len(utterances), BULK_INGEST_BATCH_SIZE):
+                batch = [u.pk for u in utterances[start:start + BULK_INGEST_BATCH_SIZE]]
+                inserted.update(Utterance.objects.filter(pk__in=batch).values_list("pk", flat=True))
+            duplicates += len(utterances) - len(inserted)
+            utterances = [u for u in utterances if u.pk in inserted]
+            apply_utterances(existing, utterances, now)
+
+    return {"sessions": len(sessions), "created": len(utterances), "duplicates": duplicates}
+
+
+def _number_turns(utterances: List[Utterance]) -> Tuple[List[Utterance], int]:
+    """
+    Fingerprint the final turns among new ingest utterances and number their occurrences.
+
+    Occurrences count earlier turns with the same fingerprint in seq order,
+    read from stored rows with one indexed query. Returns the utterances to
+    insert, without turns whose key is already stored (sessions/save got
+    there first), and how many were dropped.
+    """
+    turns = []
+    for u in utterances:
+        if u.is_final and u.role in TURN_ROLES:
+            u.fingerprint = fingerprint(u.role, u.text)
+            if u.fingerprint:
+                turns.append(u)
+    if not turns:
+        return utterances, 0
+    stored = Utterance.objects.filter(
+        session_id__in={u.session_id for u in turns},
+        fingerprint__in={u.fingerprint for u in turns},
+    ).values_list("session_id", "fingerprint", "occurrence", "seq")
+    taken = set()
+    seqs: Dict[tuple, List[int]] = {}
+    last: Dict[tuple, int] = {}
+    for session_id, fp, occurrence, seq in stored:
+        taken.add((session_id, fp, occurrence))
+        last[(session_id, fp)] = max(last.get((session_id, fp), -1), occurrence)
+        if seq is not None:
+            seqs.setdefault((session_id, fp), []).append(seq)
+
+    dropped = set()
+    for u in sorted(turns, key=lambda u: (u.seq is None, u.seq or 0)):
+        key = (u.session_id, u.fingerprint)
+        if u.seq is None:
+            # no seq to place it by: append after every known occurrence
+            u.occurrence = last.get(key, -1) + 1
+        else:
+            earlier = seqs.setdefault(key, [])
+            u.occurrence = sum(1 for seq in earlier if seq < u.seq)
+            earlier.append(u.seq)
+        if (u.session_id, u.fingerprint, u.occurrence) in taken:
+            dropped.add(id(u))
+            continue
+        taken.add((u.session_id, u.fingerprint, u.occurrence))
+        last[key] = max(last.get(key, -1), u.occurrence)
+    return [u for u in utterances if id(u) not in dropped], len(dropped)
 
 
 class IngestView(APIView):
     """
     POST /api/ingest
     Body: {
-      "session": { "id": "uuid", "room": "name", "user_id": "...", "system_prompt": "..." },
-      "events": [ { "role": "user|agent|event", "text": "...", "event": "speech_started|...", "is_final": true } ]
+      "session": { "id": "uuid", "room": "name", "user_id": "...", "system_prompt": "...", "metadata": {...} },
+      "events": [ { "seq": 0, "ts": 1700000000.0, "role": "user|agent|event", "text": "...",
+                    "event": "speech_started|...", "is_final": true } ]
     }
+    `seq` (per-session sequence number) and `ts` (event time, epoch seconds) are
+    optional; an event whose seq is already stored is skipped, so retries are safe.
     Security: header X-INGEST-TOKEN must match settings.ALLOW_INGEST_TOKEN
     """
     # Use header token for auth instead of DRF's default IsAuthenticatedOrReadOnly
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, *args, **kwargs):
-        token = request.headers.get("X-INGEST-TOKEN")
-        if not token or token != getattr(settings, "ALLOW_INGEST_TOKEN", ""):
+        if not _ingest_authorized(request):
             return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
         payload = request.data or {}
-        sess = payload.get("session") or {}
-        events: List[dict] = payload.get("events") or []
-
-        if not sess:
-            return Response({"detail": "Missing session"}, status=status.HTTP_400_BAD_REQUEST)
-
-        session_id = sess.get("id")
-        if not session_id:
-            return Response({"detail": "Missing session id"}, status=status.HTTP_400_BAD_REQUEST)
+        error = _ingest_error(payload)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        session, _ = Session.objects.get_or_create(
-            id=session_id,
-            defaults={
-                "room": sess.get("room", "unknown"),
-                "user_id": sess.get("user_id"),
-                "system_prompt": sess.get("system_prompt", ""),
-                "metadata": sess.get("metadata"),
-            },
+        result = _ingest_records([payload])
+        return Response(
+            {"created": result["created"], "duplicates": result["duplicates"]}, status=status.HTTP_200_OK
         )
 
-        created = []
-        for e in events:
-            role = e.get("role")
-            text = e.get("text", "")
-            event = e.get("event", "")
-            is_final = bool(e.get("is_final", True))
-            created.append(
-                Utterance(session=session, role=role or "event", text=text, event=event, is_final=is_final)
-            )
 
-        if created:
-            Utterance.objects.bulk_create(created)
-        # Update end time if provided
-        if sess.get("ended_at") and not session.ended_at:
-            session.ended_at = timezone.now()
-            session.save(update_fields=["ended_at"])
+class BulkIngestView(APIView):
+    """
+    POST /api/ingest/bulk
+    Body (application/json): { "records": [ { "session": {...}, "events": [...] }, ... ] }
+    Body (application/x-ndjson): one { "session": {...}, "events": [...] } record per line
+
+    Records use the /api/ingest format and may cover any number of sessions.
+    A JSON body is committed as one transaction. An NDJSON body is read as a
+    stream and committed every BULK_INGEST_CHUNK_EVENTS events, so batch size
+    is not bounded by memory. Invalid records are skipped and reported.
+    Security: header X-INGEST-TOKEN must match settings.ALLOW_INGEST_TOKEN
+    """
+    permission_classes = [permissions.AllowAny]
 
-        return Response({"created": len(created)}, status=status.HTTP_200_OK)
+    def post(self, request, *args, **kwargs):
+        if not _ingest_authorized(request):
+            return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        content_type = (request.content_type or "").split(";")[0].strip()
+        if content_type in NDJSON_CONTENT_TYPES:
+            lines = (line for line in request.stream or ())
+            records = self._ndjson_records(lines)
+        else:
+            payload = request.data or {}
+            records = enumerate(payload.get("records") or [], start=1) if isinstance(payload, dict) else ()
+
+        totals = {"sessions": 0, "created": 0, "duplicates": 0, "rejected": 0}
+        errors = []
+        chunk: List[dict] = []
+        chunk_events = 0
+        for number, record in records:
+            error = record if isinstance(record, str) else _ingest_error(record)
+            if error:
+                totals["rejected"] += 1
+                if len(errors) < 20:
+                    errors.append({"record": number, "detail": error})
+                continue
+            chunk.append(record)
+            chunk_events += len(record.get("events") or [])
+            if content_type in NDJSON_CONTENT_TYPES and chunk_events >= BULK_INGEST_CHUNK_EVENTS:
+                self._commit(chunk, totals)
+                chunk, chunk_events = [], 0
+        if chunk:
+            self._commit(chunk, totals)
+
+        if errors:
+            totals["errors"] = errors
+        return Response(totals, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _ndjson_records(lines):
+        """(line number, record) pairs; a string in place of the record is a parse error."""
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, "Invalid JSON"
+
+    @staticmethod
+    def _commit(chunk: List[dict], totals: Dict[str, int]) -> None:
+        result = _ingest_records(chunk)
+        # a session split across chunks is counted once per chunk
+        totals["sessions"] += result["sessions"]
+        totals["created"] += result["created"]
+        totals["duplicates"] += result["duplicates"]
 
 
 # Authentication Endpoints
@@ -194,20 +486,17 @@ def profile_view(request):
     Requires authentication via session cookie.
     Returns 401 if not authenticated.
     """
-    # Ensure UserPreferences exists for the user
-    UserPreferences.objects.get_or_create(user=request.user)
-    
     if request.method == 'GET':
-        serializer = UserProfileSerializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Served from the cached user context (creates default preferences on a miss)
+        return Response(user_context.for_user(request.user)["profile"], status=status.HTTP_200_OK)
     
     elif request.method == 'PATCH':
         serializer = UserProfileUpdateSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            user_context.invalidate(request.user.pk)
             # Return updated profile with preferences
-            profile_serializer = UserProfileSerializer(request.user)
-            return Response(profile_serializer.data, status=status.HTTP_200_OK)
+            return Response(user_context.for_user(request.user)["profile"], status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -229,6 +518,7 @@ def preferences_view(request):
     serializer = UserPreferencesSerializer(preferences, data=request.data, partial=False)
     if serializer.is_valid():
         serializer.save()
+        user_context.invalidate(request.user.pk)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -263,6 +553,7 @@ def change_password_view(request):
     # Hash and store new password
     request.user.set_password(new_password)
     request.user.save()
+    user_context.invalidate(request.user.pk)
     
     return Response(
         {"message": "Password changed successfully"},
@@ -280,65 +571,29 @@ def history_list_view(request):
     Retrieve authenticated user's conversation history.
     Query sessions filtered by user foreign key.
     Order by started_at descending.
-    Include pagination (limit, offset).
-    Return session metadata with utterance count.
+    Keyset pagination on (started_at, id): each page is one index seek, however deep.
+    Return session metadata with its summary.
     
     Query params:
-    - limit: Number of results to return (default: 20)
-    - offset: Number of results to skip (default: 0)
+    - limit: Number of results to return (default: 20, max: 100)
+    - cursor: Opaque cursor from a previous response's next/previous URL
+    - count: exact (default) | approx | none
     
     Requires authentication via session cookie.
     Returns 401 if not authenticated.
     """
-    # Get pagination parameters
+    sessions = Session.objects.filter(user_account=request.user)
+    paginator = SessionPagination(default_count="exact")
     try:
-        limit = int(request.GET.get('limit', 20))
-        offset = int(request.GET.get('offset', 0))
-    except ValueError:
+        page = paginator.paginate_queryset(sessions, request)
+    except ValidationError:
         return Response(
             {"detail": "Invalid pagination parameters"},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Ensure limit is reasonable
-    if limit > 100:
-        limit = 100
-    if limit < 1:
-        limit = 20
-    if offset < 0:
-        offset = 0
-    
-    # Query sessions filtered by user foreign key, ordered by started_at descending
-    sessions = Session.objects.filter(
-        user_account=request.user
-    ).order_by('-started_at').prefetch_related('utterances')
-    
-    # Get total count
-    total_count = sessions.count()
-    
-    # Apply pagination
-    paginated_sessions = sessions[offset:offset + limit]
-    
-    # Serialize the results
-    serializer = SessionHistoryListSerializer(paginated_sessions, many=True)
-    
-    # Build pagination response
-    next_url = None
-    previous_url = None
-    
-    if offset + limit < total_count:
-        next_url = f"/api/users/history?limit={limit}&offset={offset + limit}"
-    
-    if offset > 0:
-        previous_offset = max(0, offset - limit)
-        previous_url = f"/api/users/history?limit={limit}&offset={previous_offset}"
-    
-    return Response({
-        "count": total_count,
-        "next": next_url,
-        "previous": previous_url,
-        "results": serializer.data
-    }, status=status.HTTP_200_OK)
+    serializer = SessionHistoryListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -350,7 +605,7 @@ def history_detail_view(request, session_id):
     Verify session belongs to authenticated user.
     Return session metadata and all utterances.
     Return 404 if session not found or doesn't belong to user.
-    Order utterances by created_at.
+    Order utterances by seq (then created_at).
     
     Requires authentication via session cookie.
     Returns 401 if not authenticated.
@@ -367,15 +622,179 @@ def history_detail_view(request, session_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Serialize the session with all utterances (ordered by created_at via model Meta)
+    # Serialize the session with all utterances (ordered by seq via model Meta)
     serializer = SessionHistoryDetailSerializer(session)
     
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def history_header_view(request, session_id):
+    """
+    GET /api/users/history/{session_id}/header
+    Session metadata and summary without utterances (one indexed lookup),
+    so a transcript page can render before its utterances load.
+    Return 404 if session not found or doesn't belong to user.
+    """
+    try:
+        session = Session.objects.get(id=session_id, user_account=request.user)
+    except Session.DoesNotExist:
+        return Response(
+            {"detail": "Session not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(SessionHistoryHeaderSerializer(session).data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def history_utterances_view(request, session_id):
+    """
+    GET /api/users/history/{session_id}/utterances
+    A range of a session's utterances in history order (seq, then created_at),
+    paginated with a cursor. Packed sessions are read from the segments whose
+    bounds overlap the range.
+    
+    Query params:
+    - limit: Number of utterances to return (default: 100, max: 500)
+    - cursor: Opaque cursor from a previous response's next/previous URL
+    - from_seq / to_seq: Inclusive sequence number range
+    - since / until: Inclusive event time range (ISO 8601; source time, else receive time)
+    - final: true to return final utterances only
+    - role: Comma-separated roles to return (user, agent, event)
+    
+    Return 404 if session not found or doesn't belong to user.
+    """
+    session = Session.objects.filter(id=session_id, user_account=request.user).first()
+    if session is None:
+        return Response(
+            {"detail": "Session not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    params = request.query_params
+    bounds = {}
+    try:
+        for param in ("from_seq", "to_seq"):
+            if params.get(param) is not None:
+                bounds[param] = int(params[param])
+        for param in ("since", "until"):
+            if params.get(param):
+                bounds[param] = parse_datetime(params[param])
+                if bounds[param] is None:
+                    raise ValueError(param)
+    except ValueError:
+        return Response(
+            {"detail": "Invalid range parameters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    final_only = params.get("final", "").lower() in ("1", "true", "yes")
+    roles = [r.strip() for r in params["role"].split(",") if r.strip()] if params.get("role") else None
+
+    paginator = TranscriptPagination()
+    try:
+        if session.storage != Session.STORAGE_ROWS:
+            # packed or archived transcript: decode the part covering the range, page in memory
+            utterances = [
+                u for u in segments.ranged(session, **bounds)
+                if (not final_only or u.is_final) and (roles is None or u.role in roles)
+            ]
+            page = paginator.paginate_list(utterances, request)
+        else:
+            utterances = Utterance.objects.filter(session_id=session_id).annotate(
+                # rows without a seq sort after the sequenced ones (as in the model's ordering)
+                position=Coalesce("seq", Value(segments.UNSEQUENCED_POSITION), output_field=BigIntegerField()),
+                at=Coalesce("source_ts", "created_at"),
+            )
+            for param, lookup in (
+                ("from_seq", "seq__gte"), ("to_seq", "seq__lte"), ("since", "at__gte"), ("until", "at__lte"),
+            ):
+                if param in bounds:
+                    utterances = utterances.filter(**{lookup: bounds[param]})
+            if final_only:
+                utterances = utterances.filter(is_final=True)
+            if roles is not None:
+                utterances = utterances.filter(role__in=roles)
+            page = paginator.paginate_queryset(utterances, request)
+    except ValidationError:
+        return Response(
+            {"detail": "Invalid pagination parameters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return paginator.get_paginated_response(UtteranceSerializer(page, many=True).data)
+
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def history_search_view(request):
+    """
+    GET /api/users/history/search
+    Full-text search over the authenticated user's transcripts, best match first.
+    Served from the full-text index (conversation/search.py), so the cost
+    follows the number of matches, not the size of the utterance table.
+    
+    Query params:
+    - q: Search words (all must match)
+    - limit: Number of hits to return (default: 20, max: 50)
+    - offset: Number of hits to skip (max: 1000)
+    - session: Only search this session (UUID)
+    - final: true to search final utterances only
+    
+    Return 400 if q has no words or parameters are invalid.
+    """
+    params = request.query_params
+    query = params.get("q", "").strip()
+    if not has_terms(query):
+        return Response(
+            {"detail": "Search query is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(params.get("limit", SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        offset = int(params.get("offset", 0))
+        session_id = uuid.UUID(params["session"]) if params.get("session") else None
+    except ValueError:
+        return Response(
+            {"detail": "Invalid search parameters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 0 <= offset <= SEARCH_MAX_OFFSET:
+        return Response(
+            {"detail": "Invalid search parameters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # one extra hit tells whether there is a next page
+    hits = search_transcripts(
+        request.user,
+        query,
+        limit + 1,
+        offset,
+        session_id=session_id,
+        final_only=params.get("final", "").lower() in ("1", "true", "yes"),
+    )
+    more = len(hits) > limit
+    hits = hits[:limit]
+
+    def link(new_offset):
+        page_params = params.copy()
+        page_params["offset"] = new_offset
+        page_params["limit"] = limit
+        return f"{request.path}?{urlencode(sorted(page_params.items()))}"
+
+    return Response({
+        "count": None,
+        "next": link(offset + limit) if more and offset + limit <= SEARCH_MAX_OFFSET else None,
+        "previous": link(max(offset - limit, 0)) if offset > 0 else None,
+        "results": TranscriptSearchHitSerializer(hits, many=True).data,
+    })
+
 # Internal Endpoints (for FastAPI backend)
 
 @api_view(['POST'])
+@authentication_classes([])
 @permission_classes([permissions.AllowAny])
 def validate_session_view(request):
     """
@@ -391,28 +810,17 @@ def validate_session_view(request):
     
     This endpoint is called by the FastAPI backend to validate user sessions
     and retrieve user preferences for authenticated voice conversations.
+    The answer comes from the cached user context (conversation/user_context.py)
+    when there is one; the session is read directly rather than through DRF
+    session authentication, which would demand a CSRF token from FastAPI.
     """
-    if request.user.is_authenticated:
-        # Get user preferences (create if doesn't exist)
-        preferences, created = UserPreferences.objects.get_or_create(user=request.user)
-        
-        # Build preferences dict
-        preferences_data = {
-            'preferred_voice': preferences.preferred_voice,
-            'preferred_language': preferences.preferred_language,
-            'favorite_topics': preferences.favorite_topics,
-            'system_prompt_override': preferences.system_prompt_override,
-        }
-        
-        return Response({
-            'valid': True,
-            'user_id': str(request.user.id),
-            'email': request.user.email,
-            'display_name': request.user.display_name,
-            'preferences': preferences_data
-        }, status=status.HTTP_200_OK)
-    
-    return Response({'valid': False}, status=status.HTTP_401_UNAUTHORIZED)
+    context = user_context.for_session(request.session)
+    if context is None:
+        user = get_user(request)
+        if not user.is_authenticated:
+            return Response({'valid': False}, status=status.HTTP_401_UNAUTHORIZED)
+        context = user_context.for_user(user)
+    return Response(context["validate"], status=status.HTTP_200_OK)
 
 
 @csrf_exempt
@@ -451,45 +859,59 @@ def save_session_view(request):
         # Get session and verify it's not already associated with another user
         session = Session.objects.get(id=session_id)
         
-        # Associate with current user if not already set
-        if not session.user_account:
-            session.user_account = request.user
-            session.ended_at = timezone.now()
-            session.save()
-        elif session.user_account != request.user:
-            return Response(
-                {"detail": "Session belongs to another user"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        # Create final utterances from message sequence if needed
-        # (This ensures we have the complete conversation even if
-        # some messages weren't captured via the ingest endpoint)
-        existing_utterances = set(
-            session.utterances.filter(is_final=True)
-            .values_list('text', 'role')
-        )
-        
-        new_utterances = []
-        for msg in messages:
-            msg_tuple = (msg.get('text'), msg.get('role'))
-            if msg_tuple not in existing_utterances:
+        with transaction.atomic():
+            # Associate with current user if not already set
+            if not session.user_account:
+                session.user_account = request.user
+                session.ended_at = timezone.now()
+                session.save()
+            elif session.user_account != request.user:
+                return Response(
+                    {"detail": "Session belongs to another user"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            # Create final utterances from message sequence if needed
+            # (This ensures we have the complete conversation even if
+            # some messages weren't captured via the ingest endpoint).
+            # Turns are keyed by fingerprint and occurrence; the unique
+            # constraint skips the ones already stored, without reading them.
+            occurrences: Dict[str, int] = {}
+            new_utterances = []
+            # a packed or archived transcript is final: nothing to add
+            if session.storage != Session.STORAGE_ROWS:
+                messages = []
+            for msg in messages:
+                role = msg.get('role', 'user')
+                text = msg.get('text') or ''
+                fp = fingerprint(role, text)
+                if fp is None:
+                    continue
+                occurrence = occurrences.get(fp, 0)
+                occurrences[fp] = occurrence + 1
                 new_utterances.append(
                     Utterance(
                         session=session,
-                        role=msg.get('role', 'user'),
-                        text=msg.get('text', ''),
+                        role=role,
+                        text=text,
                         is_final=True,
-                        created_at=timezone.datetime.fromtimestamp(
+                        fingerprint=fp,
+                        occurrence=occurrence,
+                        created_at=datetime.datetime.fromtimestamp(
                             msg.get('timestamp', 0) / 1000,
-                            tz=timezone.utc
+                            tz=datetime.timezone.utc
                         ) if msg.get('timestamp') else timezone.now()
                     )
                 )
-        
-        if new_utterances:
-            Utterance.objects.bulk_create(new_utterances)
-        
+
+            if new_utterances:
+                Utterance.objects.bulk_create(
+                    new_utterances, batch_size=BULK_INGEST_BATCH_SIZE, ignore_conflicts=True
+                )
+            # ended_at and possibly utterances changed: rebuild this session's summary
+            recompute(Session.objects.filter(pk=session.pk))
+            session.refresh_from_db()
+
         # Return session metadata
         serializer = SessionHistoryListSerializer(session)
         return Response(serializer.data, status=status.HTTP_200_OK)
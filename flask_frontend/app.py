@@ -1,7 +1,8 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, session as flask_session
+from flask import Flask, render_template, redirect, url_for, request, jsonify, session as flask_session
 from dotenv import load_dotenv
 import requests
+from urllib.parse import parse_qs, urlparse
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
@@ -430,7 +431,26 @@ def history():
         # If Django is unreachable, show empty history
         pass
     
-    return render_template("history.html", user=user, sessions=sessions, total_count=total_count, has_more=has_more)
+    # Transcript search (?q=...) via Django /api/users/history/search
+    search_query = request.args.get("q", "").strip()
+    hits = []
+    if search_query:
+        try:
+            response = requests.get(
+                f"{DJANGO_API_URL}/users/history/search",
+                params={"q": search_query, "final": "true"},
+                cookies=cookies,
+                timeout=10
+            )
+            if response.status_code == 200:
+                hits = response.json().get("results", [])
+        except requests.exceptions.RequestException:
+            pass
+    
+    return render_template(
+        "history.html", user=user, sessions=sessions, total_count=total_count, has_more=has_more,
+        search_query=search_query, hits=hits
+    )
 
 
 @app.route("/history/<session_id>")
@@ -453,17 +473,21 @@ def history_detail(session_id):
         # If Django is unreachable, redirect to login
         return redirect(url_for("login"))
     
-    # Fetch session details from Django /api/users/history/{session_id}
+    # Fetch the session header and the first page of its transcript; the rest loads on demand
     try:
         cookies = request.cookies
         response = requests.get(
-            f"{DJANGO_API_URL}/users/history/{session_id}",
+            f"{DJANGO_API_URL}/users/history/{session_id}/header",
             cookies=cookies,
             timeout=10
         )
         if response.status_code == 200:
             session_data = response.json()
-            return render_template("history_detail.html", user=user, session=session_data)
+            page = _fetch_transcript_page(session_id, cookies)
+            session_data["utterances"] = page.get("results", [])
+            return render_template(
+                "history_detail.html", user=user, session=session_data, next_cursor=page.get("next_cursor")
+            )
         elif response.status_code == 404:
             # Session not found or doesn't belong to user
             return render_template("error.html", 
@@ -484,6 +508,41 @@ def history_detail(session_id):
                              error_message=f"Unable to connect to the history service: {str(e)}"), 503
 
 
+# final user/agent turns per transcript page
+TRANSCRIPT_PAGE_SIZE = 100
+
+
+def _fetch_transcript_page(session_id, cookies, cursor=None):
+    """One page of a session's final turns from Django, with the cursor for the next page (or None)."""
+    params = {"final": "true", "role": "user,agent", "limit": TRANSCRIPT_PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    response = requests.get(
+        f"{DJANGO_API_URL}/users/history/{session_id}/utterances",
+        params=params,
+        cookies=cookies,
+        timeout=10
+    )
+    if response.status_code != 200:
+        return {"results": [], "next_cursor": None, "status": response.status_code}
+    data = response.json()
+    next_url = data.get("next")
+    next_cursor = parse_qs(urlparse(next_url).query).get("cursor", [None])[0] if next_url else None
+    return {"results": data.get("results", []), "next_cursor": next_cursor, "status": 200}
+
+
+@app.route("/history/<session_id>/utterances")
+def history_utterances(session_id):
+    # Next transcript page for the "Load more" button on the transcript page
+    try:
+        page = _fetch_transcript_page(session_id, request.cookies, request.args.get("cursor"))
+    except requests.exceptions.RequestException:
+        return jsonify({"detail": "History service unavailable"}), 503
+    if page["status"] != 200:
+        return jsonify({"detail": "Unable to load messages"}), page["status"]
+    return jsonify({"results": page["results"], "next_cursor": page["next_cursor"]})
+
+
 @app.route("/chat")
 def chat():
     # Check authentication status - REQUIRED for chat access
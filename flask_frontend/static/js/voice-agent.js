@@ -35,6 +35,95 @@
 
   const APP_CONFIG = readAppConfig();
 
+  // Transcript websocket subprotocols (see Backend/app/utils/transcript_codec.py)
+  const WS_SUBPROTOCOL_MSGPACK = 'transcript.msgpack.v1';
+  const WS_SUBPROTOCOL_JSON = 'transcript.json.v1';
+  const WS_ROLE_NAMES = ['user', 'agent', 'event'];
+  const WS_EVENT_NAMES = ['', 'speech_started', 'speech_ended'];
+  const utf8Decoder = new TextDecoder('utf-8');
+
+  // Minimal MessagePack decoder covering the types the backend emits
+  function decodeMsgpack(buffer) {
+    const bytes = new Uint8Array(buffer);
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let pos = 0;
+
+    function readStr(len) {
+      const s = utf8Decoder.decode(bytes.subarray(pos, pos + len));
+      pos += len;
+      return s;
+    }
+    function readBin(len) {
+      const b = bytes.slice(pos, pos + len);
+      pos += len;
+      return b;
+    }
+    function readArray(len) {
+      const arr = new Array(len);
+      for (let i = 0; i < len; i++) arr[i] = read();
+      return arr;
+    }
+    function readMap(len) {
+      const obj = {};
+      for (let i = 0; i < len; i++) {
+        const key = read();
+        obj[key] = read();
+      }
+      return obj;
+    }
+    function read() {
+      const b = bytes[pos++];
+      if (b <= 0x7f) return b;
+      if (b >= 0xe0) return b - 0x100;
+      if ((b & 0xf0) === 0x80) return readMap(b & 0x0f);
+      if ((b & 0xf0) === 0x90) return readArray(b & 0x0f);
+      if ((b & 0xe0) === 0xa0) return readStr(b & 0x1f);
+      let v;
+      switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xc4: v = bytes[pos]; pos += 1; return readBin(v);
+        case 0xc5: v = view.getUint16(pos); pos += 2; return readBin(v);
+        case 0xc6: v = view.getUint32(pos); pos += 4; return readBin(v);
+        case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+        case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+        case 0xcc: v = bytes[pos]; pos += 1; return v;
+        case 0xcd: v = view.getUint16(pos); pos += 2; return v;
+        case 0xce: v = view.getUint32(pos); pos += 4; return v;
+        case 0xcf: v = Number(view.getBigUint64(pos)); pos += 8; return v;
+        case 0xd0: v = view.getInt8(pos); pos += 1; return v;
+        case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+        case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+        case 0xd3: v = Number(view.getBigInt64(pos)); pos += 8; return v;
+        case 0xd9: v = bytes[pos]; pos += 1; return readStr(v);
+        case 0xda: v = view.getUint16(pos); pos += 2; return readStr(v);
+        case 0xdb: v = view.getUint32(pos); pos += 4; return readStr(v);
+        case 0xdc: v = view.getUint16(pos); pos += 2; return readArray(v);
+        case 0xdd: v = view.getUint32(pos); pos += 4; return readArray(v);
+        case 0xde: v = view.getUint16(pos); pos += 2; return readMap(v);
+        case 0xdf: v = view.getUint32(pos); pos += 4; return readMap(v);
+        default: throw new Error('Unsupported msgpack type 0x' + b.toString(16));
+      }
+    }
+    return read();
+  }
+
+  // Decode a transcript frame into the same shape as the JSON payload
+  function decodeTranscriptFrame(data) {
+    if (typeof data === 'string') return JSON.parse(data);
+    const [role, event, isFinal, text, extra] = decodeMsgpack(data);
+    // extra: every other payload key (trailing map, omitted when empty)
+    const payload = Object.assign({}, extra, {
+      role: typeof role === 'number' ? WS_ROLE_NAMES[role] : role,
+      is_final: isFinal
+    });
+    const eventName = typeof event === 'number' ? WS_EVENT_NAMES[event] : event;
+    if (eventName) payload.event = eventName;
+    if (text != null) payload.text = text;
+    return payload;
+  }
+
   async function saveCurrentSession() {
     // 6.1: Handle empty session (no messages)
     // Check messageSequence length before saving
@@ -348,13 +437,16 @@
         reject(new Error('WebSocket connection timed out after 3 seconds'));
       }, 3000);
       
-      ws = new WebSocket(url);
+      // Offer compact binary frames first; server falls back to JSON if unsupported
+      ws = new WebSocket(url, [WS_SUBPROTOCOL_MSGPACK, WS_SUBPROTOCOL_JSON]);
+      ws.binaryType = 'arraybuffer';
       console.log('WebSocket object created, waiting for connection...');
       
       ws.onopen = () => {
         console.log('=== WebSocket Connection SUCCESSFUL ===');
         console.log('WebSocket readyState:', ws.readyState, '(OPEN)');
         console.log('Session ID:', sessId);
+        console.log('Negotiated subprotocol:', ws.protocol || '(none, JSON)');
         clearTimeout(connectionTimeout);
         
         // Update agent status to show WebSocket connected
@@ -397,7 +489,7 @@
       
       ws.onmessage = (ev) => {
         try {
-          const payload = JSON.parse(ev.data);
+          const payload = decodeTranscriptFrame(ev.data);
           
           // Determine if message is final
           // If 'final' field is explicitly set, use it